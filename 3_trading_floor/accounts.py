@@ -1,10 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+from typing import Callable, Iterator, Literal, TypeVar
+import copy
 import json
 import os
+import weakref
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+from contextlib import contextmanager
+from market import get_share_prices, price_snapshot_id
+from clock import now
+from database import VersionConflictError
+from storage import Storage, get_storage
 from logger import log_risk, log_audit
 
 load_dotenv(override=True)
@@ -16,6 +21,17 @@ MAX_ORDER_SIZE = 1000
 DAILY_TRADE_LIMIT = 20
 MAX_SINGLE_TRADE_FRACTION = float(os.getenv("MAX_SINGLE_TRADE_FRACTION", "0.3"))
 
+CONFLICT_RETRIES = 5
+HISTORY_PAGE_SIZE = 500
+
+T = TypeVar("T")
+
+# Latest report of each account name, per storage, with the (version, price snapshot) and any prices
+# it was built from; a storage's reports go with it, such as those of a finished backtest
+_report_cache: "weakref.WeakKeyDictionary[Storage, dict[str, tuple[tuple[int, str], dict | None, str]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 
 class Transaction(BaseModel):
@@ -32,150 +48,386 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class Order(BaseModel):
+    side: Literal["buy", "sell"]
+    symbol: str
+    quantity: int
+    rationale: str
+
+
 class Account(BaseModel):
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
-    transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    trade_day: str = ""
+    trade_count: int = 0
+    net_invested: float = 0.0
+    realized_pnl: float = 0.0
+    average_costs: dict[str, float] = {}
+    version: int = 0
+    epoch: int = 0
+
+    # History is only read from storage when first used; None means not loaded yet
+    _transactions: list[Transaction] | None = PrivateAttr(default=None)
+    _portfolio_value_time_series: list[tuple[str, float]] | None = PrivateAttr(default=None)
+    _storage: Storage = PrivateAttr(default=None)
+
+    def __init__(self, transactions: list | None = None, portfolio_value_time_series: list | None = None, storage: Storage | None = None, **fields):
+        super().__init__(**fields)
+        self._storage = storage or get_storage()
+        if transactions is not None:
+            self._transactions = [Transaction.model_validate(t) for t in transactions]
+        if portfolio_value_time_series is not None:
+            self._portfolio_value_time_series = [tuple(point) for point in portfolio_value_time_series]
+
+    @property
+    def storage(self) -> Storage:
+        """ The storage the account is read from and saved to. """
+        return self._storage
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        if self._transactions is None:
+            self._transactions = [Transaction(**row) for row in self._storage.read_transactions(self.name)]
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions: list[Transaction]):
+        self._transactions = transactions
+
+    @property
+    def portfolio_value_time_series(self) -> list[tuple[str, float]]:
+        if self._portfolio_value_time_series is None:
+            self._portfolio_value_time_series = [(when, value) for _, when, value in self._storage.read_portfolio_values(self.name)]
+        return self._portfolio_value_time_series
+
+    @portfolio_value_time_series.setter
+    def portfolio_value_time_series(self, points: list[tuple[str, float]]):
+        self._portfolio_value_time_series = points
+
+    def iter_transactions(self, since: str | None = None, limit: int | None = None, page_size: int = HISTORY_PAGE_SIZE) -> Iterator[Transaction]:
+        """ Iterate over transactions oldest first, optionally from a timestamp on, reading them from storage a page at a time. """
+        after_id = 0
+        while limit is None or limit > 0:
+            size = page_size if limit is None else min(page_size, limit)
+            page = self._storage.read_transactions(self.name, since=since, after_id=after_id, limit=size)
+            for row in page:
+                yield Transaction(**row)
+            if len(page) < size:
+                return
+            after_id = page[-1]["id"]
+            if limit is not None:
+                limit -= len(page)
+
+    def iter_portfolio_values(self, since: str | None = None, limit: int | None = None, page_size: int = HISTORY_PAGE_SIZE) -> Iterator[tuple[str, float]]:
+        """ Iterate over the portfolio value time series oldest first, reading it from storage a page at a time. """
+        after_id = 0
+        while limit is None or limit > 0:
+            size = page_size if limit is None else min(page_size, limit)
+            page = self._storage.read_portfolio_values(self.name, since=since, after_id=after_id, limit=size)
+            for _, when, value in page:
+                yield when, value
+            if len(page) < size:
+                return
+            after_id = page[-1][0]
+            if limit is not None:
+                limit -= len(page)
 
     @classmethod
-    def get(cls, name: str):
-        fields = read_account(name.lower())
+    def get(cls, name: str, storage: Storage | None = None):
+        """ Load the account from storage, by default the process-wide one, creating it if it is new. """
+        storage = storage or get_storage()
+        fields = storage.read_account(name.lower())
         if not fields:
-            fields = {
-                "name": name.lower(),
-                "balance": INITIAL_BALANCE,
-                "strategy": "",
-                "holdings": {},
-                "transactions": [],
-                "portfolio_value_time_series": []
-            }
-            write_account(name, fields)
-        return cls(**fields)
-    
-    
-    def save(self):
-        write_account(self.name.lower(), self.model_dump())
+            with storage.transaction():
+                # Read again under the write lock: another process may have opened it since, and only one may
+                fields = storage.read_account(name.lower())
+                if not fields:
+                    fields = {
+                        "name": name.lower(),
+                        "balance": INITIAL_BALANCE,
+                        "strategy": "",
+                        "holdings": {},
+                        "transactions": [],
+                        "portfolio_value_time_series": []
+                    }
+                    storage.start_epoch(name, fields, "open", now().strftime("%Y-%m-%d %H:%M:%S"))
+        return cls(**fields, storage=storage)
+
+    @classmethod
+    def as_of(cls, name: str, when: str | None = None, event_id: int | None = None, storage: Storage | None = None) -> "Account":
+        """
+        Rebuild the account as it was at a time (YYYY-MM-DD HH:MM:SS) or just after an event,
+        from the nearest snapshot before it and the events in between.
+
+        The copy is for inspection: its history is empty and it must not be traded or saved.
+        """
+        storage = storage or get_storage()
+        snapshot = storage.read_account_snapshot(name, until_id=event_id, until=when)
+        if snapshot is None:
+            raise ValueError(f"Account {name} has no recorded state at that point.")
+        snapshot_id, state = snapshot
+        account = cls(**state, transactions=[], portfolio_value_time_series=[], storage=storage)
+        for event in storage.read_account_events(name, after_id=snapshot_id, until_id=event_id, until=when):
+            account._apply(event["type"], event["data"])
+        return account
+
+    @classmethod
+    def run_with_retry(cls, name: str, operation: Callable[["Account"], T], retries: int = CONFLICT_RETRIES, storage: Storage | None = None) -> T:
+        """
+        Load the account and apply ``operation`` to it. If another process saved the
+        account in the meantime, reload it and run the operation again on the fresh copy.
+        """
+        for attempt in range(retries + 1):
+            account = cls.get(name, storage)
+            try:
+                return operation(account)
+            except VersionConflictError:
+                if attempt == retries:
+                    raise
 
-    def reset(self, strategy: str):
-        self.balance = INITIAL_BALANCE
-        self.strategy = strategy
-        self.holdings = {}
-        self.transactions = []
-        self.portfolio_value_time_series = []
-        self.save()
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Persist every change made in the block, including log and audit rows, in one transaction.
+
+        If anything in the block raises, nothing is written and the account's
+        fields are put back as they were. Raises VersionConflictError if the
+        account was saved elsewhere since it was loaded.
+        """
+        saved = {field: copy.copy(value) for field, value in self.__dict__.items()}
+        saved_history = {field: copy.copy(value) for field, value in self.__pydantic_private__.items() if field != "_storage"}
+        try:
+            with self._storage.transaction():
+                self._storage.claim_account_version(self.name, self.version)
+                self.version += 1
+                yield self
+        except BaseException:
+            self.__dict__.update(saved)
+            self.__pydantic_private__.update(saved_history)
+            raise
+
+    def _record(self, type: str, data: dict):
+        """Persist the scalar state along with the event that changed it."""
+        self._storage.write_event(self.name, self._state(), type, data, now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def _apply(self, type: str, data: dict):
+        """Replay a recorded event onto the account's state."""
+        if type == "fill":
+            self._apply_fill(data["symbol"], data["quantity"], data["price"], data["timestamp"])
+        elif type == "deposit":
+            self.balance += data["amount"]
+        elif type == "withdraw":
+            self.balance -= data["amount"]
+        elif type == "strategy":
+            self.strategy = data["strategy"]
+
+    def reset(self, strategy: str, balance: float = INITIAL_BALANCE):
+        """ Start the account afresh in a new epoch; the history of earlier epochs is kept but no longer read. """
+        with self.unit_of_work():
+            self.epoch += 1
+            self.balance = balance
+            self.strategy = strategy
+            self.holdings = {}
+            self.transactions = []
+            self.portfolio_value_time_series = []
+            # No trades yet today in the new epoch; a blank day would be backfilled from the old one's
+            self.trade_day = now().strftime("%Y-%m-%d")
+            self.trade_count = 0
+            self.net_invested = 0.0
+            self.realized_pnl = 0.0
+            self.average_costs = {}
+            self._storage.start_epoch(self.name, self.model_dump(), "reset", now().strftime("%Y-%m-%d %H:%M:%S"))
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+        with self.unit_of_work():
+            self.balance += amount
+            self._record("deposit", {"amount": amount})
         print(f"Deposited ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def withdraw(self, amount: float):
         """ Withdraw funds from the account, ensuring it doesn't go negative. """
         if amount > self.balance:
             raise ValueError("Insufficient funds for withdrawal.")
-        self.balance -= amount
+        with self.unit_of_work():
+            self.balance -= amount
+            self._record("withdraw", {"amount": amount})
         print(f"Withdrew ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def _trades_today(self) -> int:
         """Return the number of trades executed today."""
-        today = datetime.now().strftime("%Y-%m-%d")
-        return sum(1 for t in self.transactions if t.timestamp.startswith(today))
+        today = now().strftime("%Y-%m-%d")
+        return self.trade_count if self.trade_day == today else 0
 
-    def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Buy shares of a stock if sufficient funds are available. """
+    def _count_trade(self, timestamp: str):
+        """Add a trade to the daily counter, starting a new count on a new day."""
+        day = timestamp[:10]
+        if self.trade_day != day:
+            self.trade_day = day
+            self.trade_count = 0
+        self.trade_count += 1
+
+    def _update_cost_basis(self, symbol: str, quantity: int, price: float):
+        """Fold a fill into net invested capital, the symbol's average cost and realized P&L."""
+        self.net_invested += quantity * price
+        held_before = self.holdings.get(symbol, 0) - quantity
+        if quantity > 0:
+            average_cost = self.average_costs.get(symbol, 0.0)
+            self.average_costs[symbol] = (average_cost * held_before + price * quantity) / (held_before + quantity)
+        else:
+            self.realized_pnl += (price - self.average_costs.get(symbol, 0.0)) * -quantity
+        if not self.holdings.get(symbol):
+            self.average_costs.pop(symbol, None)
+
+    def _state(self) -> dict:
+        """The scalar fields of the account, without holdings or history."""
+        return self.model_dump(exclude={"holdings", "average_costs"})
+
+    def _check_order(self, side: str, symbol: str, quantity: int):
+        """Apply the checks that don't need a price."""
         if quantity <= 0:
             raise ValueError("Quantity must be positive.")
         if quantity > MAX_ORDER_SIZE:
             raise ValueError(f"Order size exceeds maximum of {MAX_ORDER_SIZE} shares.")
         if self._trades_today() >= DAILY_TRADE_LIMIT:
             raise ValueError("Daily trade limit reached.")
-        price = get_share_price(symbol)
+        if side == "sell" and self.holdings.get(symbol, 0) < quantity:
+            log_risk(self.name, f"Sell {quantity} {symbol} rejected: insufficient shares", self._storage)
+            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+
+    def _price_buy(self, symbol: str, quantity: int, prices: dict[str, float]) -> float:
+        """Return the price a buy fills at, after checking it against the risk limits and balance."""
+        price = prices[symbol]
         buy_price = price * (1 + SPREAD)
         total_cost = buy_price * quantity
 
-        portfolio_value = self.calculate_portfolio_value()
+        portfolio_value = self.calculate_portfolio_value(prices)
         if total_cost > portfolio_value * MAX_SINGLE_TRADE_FRACTION:
-            log_risk(self.name, f"Buy {quantity} {symbol} rejected: trade value ${total_cost:.2f} exceeds limit")
+            log_risk(self.name, f"Buy {quantity} {symbol} rejected: trade value ${total_cost:.2f} exceeds limit", self._storage)
             raise ValueError("Trade size exceeds risk limit.")
 
         if total_cost > self.balance:
-            log_risk(self.name, f"Buy {quantity} {symbol} rejected: insufficient funds")
+            log_risk(self.name, f"Buy {quantity} {symbol} rejected: insufficient funds", self._storage)
             raise ValueError("Insufficient funds to buy shares.")
         elif price == 0:
-            log_risk(self.name, f"Buy {quantity} {symbol} rejected: unrecognized symbol")
+            log_risk(self.name, f"Buy {quantity} {symbol} rejected: unrecognized symbol", self._storage)
             raise ValueError(f"Unrecognized symbol {symbol}")
-        
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
-        
-        # Update balance
-        self.balance -= total_cost
-        self.save()
-        write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        log_audit(self.name, f"Bought {quantity} {symbol} at {buy_price}")
-        return "Completed. Latest details:\n" + self.report()
+        return buy_price
 
-    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Sell shares of a stock if the user has enough shares. """
-        if quantity <= 0:
-            raise ValueError("Quantity must be positive.")
-        if quantity > MAX_ORDER_SIZE:
-            raise ValueError(f"Order size exceeds maximum of {MAX_ORDER_SIZE} shares.")
-        if self._trades_today() >= DAILY_TRADE_LIMIT:
-            raise ValueError("Daily trade limit reached.")
-        if self.holdings.get(symbol, 0) < quantity:
-            log_risk(self.name, f"Sell {quantity} {symbol} rejected: insufficient shares")
-            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
-        
-        price = get_share_price(symbol)
+    def _price_sell(self, symbol: str, quantity: int, prices: dict[str, float]) -> float:
+        """Return the price a sell fills at, after checking it against the risk limits."""
+        price = prices[symbol]
         sell_price = price * (1 - SPREAD)
         total_proceeds = sell_price * quantity
 
-        portfolio_value = self.calculate_portfolio_value()
+        portfolio_value = self.calculate_portfolio_value(prices)
         if total_proceeds > portfolio_value * MAX_SINGLE_TRADE_FRACTION:
-            log_risk(self.name, f"Sell {quantity} {symbol} rejected: trade value ${total_proceeds:.2f} exceeds limit")
+            log_risk(self.name, f"Sell {quantity} {symbol} rejected: trade value ${total_proceeds:.2f} exceeds limit", self._storage)
             raise ValueError("Trade size exceeds risk limit.")
-        
-        # Update holdings
-        self.holdings[symbol] -= quantity
-        
-        # If shares are completely sold, remove from holdings
+        return sell_price
+
+    def _apply_fill(self, symbol: str, quantity: int, price: float, timestamp: str):
+        """Apply a fill to the holdings, trade counter, cost basis and balance; quantity is negative for a sell."""
+        # Update holdings, removing them if shares are completely sold
+        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
         if self.holdings[symbol] == 0:
             del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._count_trade(timestamp)
+        self._update_cost_basis(symbol, quantity, price)
+        self.balance -= quantity * price
+
+    def _fill(self, symbol: str, quantity: int, price: float, rationale: str):
+        """Apply and persist a fill; quantity is negative for a sell."""
+        timestamp = now().strftime("%Y-%m-%d %H:%M:%S")
         # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
-
-        # Update balance
-        self.balance += total_proceeds
-        self.save()
-        write_log(self.name, "account", f"Sold {quantity} of {symbol}")
-        log_audit(self.name, f"Sold {quantity} {symbol} at {sell_price}")
-        return "Completed. Latest details:\n" + self.report()
-
-    def calculate_portfolio_value(self):
-        """ Calculate the total value of the user's portfolio. """
+        transaction = Transaction(symbol=symbol, quantity=quantity, price=price, timestamp=timestamp, rationale=rationale)
+        if self._transactions is not None:
+            self._transactions.append(transaction)
+        self._apply_fill(symbol, quantity, price, timestamp)
+        self._storage.write_fill(self.name, self._state(), symbol, self.holdings.get(symbol, 0), transaction.model_dump(),
+                   avg_cost=self.average_costs.get(symbol, 0.0))
+        if quantity > 0:
+            self._storage.write_log(self.name, "account", f"Bought {quantity} of {symbol}")
+            log_audit(self.name, f"Bought {quantity} {symbol} at {price}", self._storage)
+        else:
+            self._storage.write_log(self.name, "account", f"Sold {-quantity} of {symbol}")
+            log_audit(self.name, f"Sold {-quantity} {symbol} at {price}", self._storage)
+
+    def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Buy shares of a stock if sufficient funds are available. """
+        self._check_order("buy", symbol, quantity)
+        prices = get_share_prices([symbol, *self.holdings])
+        buy_price = self._price_buy(symbol, quantity, prices)
+        with self.unit_of_work():
+            self._fill(symbol, quantity, buy_price, rationale)
+        return "Completed. Latest details:\n" + self.report(prices)
+
+    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Sell shares of a stock if the user has enough shares. """
+        self._check_order("sell", symbol, quantity)
+        prices = get_share_prices([symbol, *self.holdings])
+        sell_price = self._price_sell(symbol, quantity, prices)
+        with self.unit_of_work():
+            self._fill(symbol, -quantity, sell_price, rationale)
+        return "Completed. Latest details:\n" + self.report(prices)
+
+    def execute_orders(self, orders: list[Order], prices: dict[str, float] | None = None) -> str:
+        """ Fill a list of buy and sell orders in sequence against one price snapshot; either all are filled or none.
+        Any prices not given are fetched in one batch. """
+        prices = self.fill_orders(orders, prices)
+        return "Completed. Latest details:\n" + self.report(prices)
+
+    def fill_orders(self, orders: list[Order], prices: dict[str, float] | None = None) -> dict[str, float]:
+        """ Fill the orders all-or-nothing without building a report, and return the prices they were filled against. """
+        orders = [Order.model_validate(order) for order in orders]
+        if not orders:
+            raise ValueError("No orders given.")
+        prices = dict(prices or {})
+        missing = [symbol for symbol in (*(order.symbol for order in orders), *self.holdings) if symbol not in prices]
+        if missing:
+            prices.update(get_share_prices(missing))
+        try:
+            with self.unit_of_work():
+                for number, order in enumerate(orders, start=1):
+                    try:
+                        self._check_order(order.side, order.symbol, order.quantity)
+                        if order.side == "buy":
+                            self._fill(order.symbol, order.quantity, self._price_buy(order.symbol, order.quantity, prices), order.rationale)
+                        else:
+                            self._fill(order.symbol, -order.quantity, self._price_sell(order.symbol, order.quantity, prices), order.rationale)
+                    except ValueError as e:
+                        raise ValueError(f"Order {number} ({order.side} {order.quantity} {order.symbol}) rejected: {e}") from e
+        except ValueError as e:
+            # Risk logs written inside the unit of work were rolled back with it
+            log_risk(self.name, f"Batch of {len(orders)} orders not executed. {e}", self._storage)
+            raise
+        return prices
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None):
+        """ Calculate the total value of the user's portfolio, fetching any prices not given in one batch. """
+        if prices is None:
+            prices = get_share_prices(self.holdings)
         total_value = self.balance
         for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
+            total_value += prices[symbol] * quantity
         return total_value
 
     def calculate_profit_loss(self, portfolio_value: float):
         """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        return portfolio_value - self.net_invested - self.balance
+
+    def calculate_unrealized_profit_loss(self, prices: dict[str, float] | None = None) -> dict[str, float]:
+        """ Calculate the unrealized profit or loss of each position from its average cost. """
+        if prices is None:
+            prices = get_share_prices(self.holdings)
+        return {
+            symbol: (prices[symbol] - self.average_costs.get(symbol, 0.0)) * quantity
+            for symbol, quantity in self.holdings.items()
+        }
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -183,34 +435,55 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(self.calculate_portfolio_value())
 
     def list_transactions(self):
         """ List all transactions made by the user. """
         return [transaction.model_dump() for transaction in self.transactions]
     
-    def report(self) -> str:
-        """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
+    def report(self, prices: dict[str, float] | None = None) -> str:
+        """
+        Return a json string representing the account.
+
+        Reading the report has no side effects. It is cached per storage, account version
+        and price snapshot, so repeated reads between trades and price moves are free.
+        """
+        key = (self.version, price_snapshot_id())
+        reports = _report_cache.setdefault(self._storage, {})
+        cached = reports.get(self.name)
+        # Prices given must be the ones the report was built from; without them any report of the snapshot will do
+        if cached and cached[0] == key and (prices is None or cached[1] == prices):
+            return cached[2]
+        portfolio_value = self.calculate_portfolio_value(prices)
         pnl = self.calculate_profit_loss(portfolio_value)
         data = self.model_dump()
+        data["transactions"] = self.list_transactions()
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
-        write_log(self.name, "account", f"Retrieved account details")
-        return json.dumps(data)
+        report = json.dumps(data)
+        reports[self.name] = (key, None if prices is None else dict(prices), report)
+        return report
+
+    def mark_to_market(self, prices: dict[str, float] | None = None) -> float:
+        """ Record the current portfolio value in the time series, and return it. """
+        portfolio_value = self.calculate_portfolio_value(prices)
+        timestamp = now().strftime("%Y-%m-%d %H:%M:%S")
+        self._storage.write_portfolio_value(self.name, timestamp, portfolio_value)
+        if self._portfolio_value_time_series is not None:
+            self._portfolio_value_time_series.append((timestamp, portfolio_value))
+        return portfolio_value
     
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
-        write_log(self.name, "account", f"Retrieved strategy")
+        self._storage.write_log(self.name, "account", f"Retrieved strategy")
         return self.strategy
     
     def change_strategy(self, strategy: str) -> str:
         """ At your discretion, if you choose to, call this to change your investment strategy for the future """
-        self.strategy = strategy
-        self.save()
-        write_log(self.name, "account", f"Changed strategy")
+        with self.unit_of_work():
+            self.strategy = strategy
+            self._record("strategy", {"strategy": strategy})
+            self._storage.write_log(self.name, "account", f"Changed strategy")
         return "Changed strategy"
 
 # Example of usage:
@@ -1,8 +1,14 @@
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from accounts import Account, Order
+from analytics import compute_analytics
+from orders import order_book, place_order, cancel_order, list_orders
+from market import add_price_listener
 
 mcp = FastMCP("accounts_server")
 
+# Every price batch fetched for a trade also triggers any resting orders it crosses
+add_price_listener(order_book.on_prices)
+
 @mcp.tool()
 async def get_balance(name: str) -> float:
     """Get the cash balance of the given account name.
@@ -21,6 +27,16 @@ async def get_holdings(name: str) -> dict[str, int]:
     """
     return Account.get(name).holdings
 
+@mcp.tool()
+async def get_analytics(name: str) -> dict:
+    """Get performance and risk metrics for the given account name: Sharpe ratio, annualized volatility,
+    max drawdown, turnover, and realized and unrealized profit or loss for each symbol traded.
+
+    Args:
+        name: The name of the account holder
+    """
+    return compute_analytics(Account.get(name))
+
 @mcp.tool()
 async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
     """Buy shares of a stock.
@@ -31,7 +47,7 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    return Account.run_with_retry(name, lambda account: account.buy_shares(symbol, quantity, rationale))
 
 
 @mcp.tool()
@@ -44,7 +60,57 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    return Account.run_with_retry(name, lambda account: account.sell_shares(symbol, quantity, rationale))
+
+@mcp.tool()
+async def execute_orders(name: str, orders: list[Order]) -> str:
+    """Buy and sell several stocks in one go, for example to rebalance. The orders are filled in sequence
+    at the same prices, and either all of them are executed or none are.
+
+    Args:
+        name: The name of the account holder
+        orders: The orders, each with a side ("buy" or "sell"), symbol, quantity and rationale
+    """
+    return Account.run_with_retry(name, lambda account: account.execute_orders(orders))
+
+@mcp.tool()
+async def place_resting_order(name: str, side: str, symbol: str, quantity: int, order_type: str, trigger_price: float, rationale: str) -> str:
+    """Place an order that rests until the share price reaches a trigger, then fills automatically at the market price.
+    A "limit" buy fills when the price falls to the trigger, and a "limit" sell when it rises to it.
+    A "stop_loss" sell fills when the price falls to the trigger, and a "take_profit" sell when it rises to it.
+
+    Args:
+        name: The name of the account holder
+        side: "buy" or "sell"
+        symbol: The symbol of the stock
+        quantity: The quantity of shares
+        order_type: "limit", "stop_loss" or "take_profit"
+        trigger_price: The share price at which the order fills
+        rationale: The rationale for the order and fit with the account's strategy
+    """
+    order = place_order(name, side, symbol, quantity, order_type, trigger_price, rationale)
+    return f"Placed resting order {order}"
+
+@mcp.tool()
+async def cancel_resting_order(name: str, order_id: int) -> str:
+    """Cancel one of your resting orders.
+
+    Args:
+        name: The name of the account holder
+        order_id: The id of the order to cancel
+    """
+    if cancel_order(name, order_id):
+        return f"Cancelled resting order #{order_id}"
+    return f"No resting order #{order_id}; it may already have filled"
+
+@mcp.tool()
+async def list_resting_orders(name: str) -> list[str]:
+    """List your resting limit, stop-loss and take-profit orders.
+
+    Args:
+        name: The name of the account holder
+    """
+    return [str(order) for order in list_orders(name)]
 
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
@@ -54,7 +120,7 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    return Account.run_with_retry(name, lambda account: account.change_strategy(strategy))
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
@@ -0,0 +1,164 @@
+"""
+Portfolio analytics over an account's ledger.
+
+The transactions and portfolio value time series are loaded into pandas once per
+account version; new portfolio values from mark-to-market are appended incrementally.
+Metrics are computed with vectorized operations and cached until the account,
+its time series or the prices move.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from accounts import Account
+from storage import Storage
+from market import get_share_prices, price_snapshot_id
+
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.0
+
+
+class Ledger:
+    """An account's transactions and portfolio values as arrays, for one account version."""
+
+    def __init__(self, name: str, version: int, storage: Storage):
+        self.name = name
+        self.version = version
+        self.storage = storage
+        self.trades = pd.DataFrame(storage.read_transactions(name), columns=["id", "symbol", "quantity", "price", "timestamp", "rationale"])
+        self.value_times = np.array([], dtype="datetime64[s]")
+        self.values = np.array([], dtype=np.float64)
+        self.last_value_id = 0
+        self.refresh_values()
+
+    def refresh_values(self):
+        """Append any portfolio values recorded since the last load."""
+        rows = self.storage.read_portfolio_values(self.name, after_id=self.last_value_id)
+        if rows:
+            ids, times, values = zip(*rows)
+            self.value_times = np.concatenate([self.value_times, pd.to_datetime(list(times)).values.astype("datetime64[s]")])
+            self.values = np.concatenate([self.values, np.array(values, dtype=np.float64)])
+            self.last_value_id = ids[-1]
+
+
+# Per account name: the loaded ledger, and the latest metrics with the key they were computed for
+_ledgers: dict[str, Ledger] = {}
+_analytics_cache: dict[str, tuple[tuple, dict]] = {}
+
+
+def load_ledger(account: Account) -> Ledger:
+    """Return the account's ledger, reloading it only when the account version has changed."""
+    ledger = _ledgers.get(account.name)
+    if ledger is None or ledger.version != account.version or ledger.storage is not account.storage:
+        ledger = _ledgers[account.name] = Ledger(account.name, account.version, account.storage)
+    else:
+        ledger.refresh_values()
+    return ledger
+
+
+def _number(value) -> float | None:
+    """A float for the JSON payload, with NaN and infinities as None."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def daily_returns(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Returns between the closing portfolio value of each day."""
+    if len(values) == 0:
+        return np.array([], dtype=np.float64)
+    closes = pd.Series(values, index=pd.DatetimeIndex(times)).resample("D").last().dropna().to_numpy()
+    return closes[1:] / closes[:-1] - 1
+
+
+def volatility(returns: np.ndarray) -> float:
+    """Annualized standard deviation of daily returns."""
+    if len(returns) < 2:
+        return math.nan
+    return returns.std(ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR)
+
+
+def sharpe_ratio(returns: np.ndarray, risk_free_rate: float = RISK_FREE_RATE) -> float:
+    """Annualized Sharpe ratio of daily returns."""
+    if len(returns) < 2:
+        return math.nan
+    excess = returns - risk_free_rate / TRADING_DAYS_PER_YEAR
+    deviation = excess.std(ddof=1)
+    return excess.mean() / deviation * math.sqrt(TRADING_DAYS_PER_YEAR) if deviation else math.nan
+
+
+def max_drawdown(values: np.ndarray) -> float:
+    """The largest fall from a running peak, as a negative fraction of that peak."""
+    if len(values) == 0:
+        return math.nan
+    return (values / np.maximum.accumulate(values) - 1).min()
+
+
+def turnover(trades: pd.DataFrame, values: np.ndarray) -> float:
+    """Traded notional divided by the average portfolio value."""
+    if len(values) == 0 or trades.empty:
+        return 0.0 if trades.empty else math.nan
+    return (trades["quantity"].abs() * trades["price"]).sum() / values.mean()
+
+
+def symbol_pnl(account: Account, trades: pd.DataFrame, prices: dict[str, float]) -> dict[str, dict]:
+    """Realized and unrealized P&L per symbol, on the account's average cost basis.
+
+    Realized P&L is the net cash a symbol has returned plus the cost basis still held,
+    so it sums over the fills without replaying them.
+    """
+    if trades.empty:
+        return {}
+    cash = (-trades["quantity"] * trades["price"]).groupby(trades["symbol"]).sum()
+    symbols = cash.index
+    quantity = pd.Series(account.holdings, dtype=np.float64).reindex(symbols, fill_value=0.0)
+    average_cost = pd.Series(account.average_costs, dtype=np.float64).reindex(symbols, fill_value=0.0)
+    price = pd.Series(prices, dtype=np.float64).reindex(symbols)
+    realized = cash + quantity * average_cost
+    unrealized = (quantity * (price - average_cost)).where(quantity != 0, 0.0)
+    return {
+        symbol: {
+            "quantity": int(quantity[symbol]),
+            "average_cost": _number(average_cost[symbol]),
+            "price": _number(price[symbol]),
+            "realized_pnl": _number(realized[symbol]),
+            "unrealized_pnl": _number(unrealized[symbol]),
+        }
+        for symbol in symbols
+    }
+
+
+def summarize(account: Account, trades: pd.DataFrame, times: np.ndarray, values: np.ndarray, prices: dict[str, float]) -> dict:
+    """The metrics for a ledger already in arrays, with None for any without enough history."""
+    returns = daily_returns(times, values)
+    return {
+        "sharpe_ratio": _number(sharpe_ratio(returns)),
+        "volatility": _number(volatility(returns)),
+        "max_drawdown": _number(max_drawdown(values)),
+        "turnover": _number(turnover(trades, values)),
+        "symbols": symbol_pnl(account, trades, prices),
+    }
+
+
+def compute_analytics(account: Account, prices: dict[str, float] | None = None) -> dict:
+    """Return the account's performance and risk metrics, and P&L by symbol.
+
+    Args:
+        account: The account to analyse.
+        prices: Current prices of the holdings; fetched in one batch if not given.
+
+    Returns:
+        A dict of sharpe_ratio, volatility, max_drawdown, turnover and symbols, the
+        per-symbol P&L. Metrics without enough history are None.
+    """
+    ledger = load_ledger(account)
+    key = (ledger, account.version, ledger.last_value_id, price_snapshot_id())
+    cached = _analytics_cache.get(account.name)
+    if cached and cached[0] == key:
+        return cached[1]
+    if prices is None:
+        prices = get_share_prices(list(account.holdings)) if account.holdings else {}
+    analytics = {"name": account.name, **summarize(account, ledger.trades, ledger.value_times, ledger.values, prices)}
+    _analytics_cache[account.name] = (key, analytics)
+    return analytics
@@ -4,7 +4,9 @@ import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from analytics import compute_analytics
+from storage import get_storage
+from collections import deque
 
 mapper = {
     "trace": Color.WHITE,
@@ -21,6 +23,8 @@ class Trader:
         self.lastname = lastname
         self.model_name = model_name
         self.account = Account.get(name)
+        self.logs = deque(maxlen=13)
+        self.last_log_id = 0
 
     def reload(self):
         self.account = Account.get(self.name)
@@ -76,10 +80,32 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
     
+    def get_analytics(self) -> str:
+        """Summarize the risk and performance metrics for display"""
+        analytics = compute_analytics(self.account)
+        realized = sum(row["realized_pnl"] or 0.0 for row in analytics["symbols"].values())
+        unrealized = sum(row["unrealized_pnl"] or 0.0 for row in analytics["symbols"].values())
+
+        def show(value, format):
+            return "-" if value is None else format.format(value)
+
+        metrics = [
+            ("Sharpe", show(analytics["sharpe_ratio"], "{:.2f}")),
+            ("Volatility", show(analytics["volatility"], "{:.1%}")),
+            ("Max drawdown", show(analytics["max_drawdown"], "{:.1%}")),
+            ("Turnover", show(analytics["turnover"], "{:.2f}x")),
+            ("Realized", f"${realized:,.0f}"),
+            ("Unrealized", f"${unrealized:,.0f}"),
+        ]
+        cells = "".join(f"<span style='margin:0 8px;'>{label}: <b>{value}</b></span>" for label, value in metrics)
+        return f"<div style='text-align: center;font-size:14px;'>{cells}</div>"
+
     def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
+        for log_id, timestamp, type, message in get_storage().read_log_since(self.name, self.last_log_id, limit=self.logs.maxlen):
+            self.logs.append((timestamp, type, message))
+            self.last_log_id = log_id
         response = ""
-        for log in logs:
+        for log in self.logs:
             timestamp, type, message = log
             color = mapper.get(type, Color.WHITE).value
             response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
@@ -94,6 +120,7 @@ class TraderView:
     def __init__(self, trader: Trader):
         self.trader = trader
         self.portfolio_value = None
+        self.analytics = None
         self.chart = None
         self.holdings_table = None
         self.transactions_table = None
@@ -120,6 +147,8 @@ class TraderView:
                 )
             with gr.Row():
                 self.portfolio_value = gr.HTML(self.trader.get_portfolio_value())
+            with gr.Row():
+                self.analytics = gr.HTML(self.trader.get_analytics())
             with gr.Row():
                 self.chart = gr.Plot(self.trader.get_portfolio_value_chart(), container=True, show_label=False)
             with gr.Row(variant="panel"):
@@ -150,7 +179,7 @@ class TraderView:
         self.timer.tick(
             fn=self.refresh,
             inputs=[],
-            outputs=[self.portfolio_value, self.chart, self.holdings_table, self.transactions_table],
+            outputs=[self.portfolio_value, self.analytics, self.chart, self.holdings_table, self.transactions_table],
             show_progress="hidden",
             queue=False,
         )
@@ -175,7 +204,7 @@ class TraderView:
 
     def refresh(self):
         self.trader.reload()
-        return self.trader.get_portfolio_value(), self.trader.get_portfolio_value_chart(), self.trader.get_holdings_df(), self.trader.get_transactions_df()
+        return self.trader.get_portfolio_value(), self.trader.get_analytics(), self.trader.get_portfolio_value_chart(), self.trader.get_holdings_df(), self.trader.get_transactions_df()
 
     def update_model(self, model_name):
         self.trader.model_name = model_name
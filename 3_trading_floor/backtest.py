@@ -0,0 +1,169 @@
+"""
+Replay price history through the real Account order logic at full speed.
+
+History comes from the stored market prices or from a CSV or Parquet file, and is
+replayed one day at a time on a simulated clock against in-memory storage, so
+risk rules and strategies can be regression-tested over years of data in seconds.
+
+A strategy is any callable taking (time, prices, account) and returning the orders
+to place that day. `scripted` and `recorded` build strategies from a fixed plan or
+from a live account's transactions. From the command line, e.g.
+
+    uv run backtest.py --replay warren
+    uv run backtest.py --history prices.csv --script orders.json
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from datetime import datetime, time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+import analytics
+from accounts import Account, Order, Transaction, INITIAL_BALANCE
+from clock import SimulatedClock, use_clock
+from storage import InMemoryStorage, get_storage, use_storage
+
+MARKET_CLOSE = time(16, 0)
+
+Strategy = Callable[[datetime, dict[str, float], Account], list[Order]]
+
+
+class BacktestResult(BaseModel):
+    name: str
+    start: str
+    end: str
+    final_value: float
+    profit_loss: float
+    trades: int
+    rejected: list[str]
+    portfolio_values: list[tuple[str, float]]
+    holdings: dict[str, int]
+    analytics: dict
+
+
+def load_history_from_db(start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    """Stored market prices as a frame of closes, one row per date and one column per symbol."""
+    storage = get_storage()
+    days = {date: storage.read_market(date) for date in storage.read_market_dates(start, end)}
+    return pd.DataFrame.from_dict(days, orient="index").sort_index()
+
+
+def load_history_file(path: str) -> pd.DataFrame:
+    """Read closes from a CSV or Parquet file, either long (date, symbol, close) or wide (date, then a column per symbol)."""
+    frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    if {"symbol", "close"} <= set(frame.columns):
+        frame = frame.pivot(index="date", columns="symbol", values="close")
+    else:
+        frame = frame.set_index("date")
+    frame.index = pd.to_datetime(frame.index).strftime("%Y-%m-%d")
+    return frame.sort_index()
+
+
+def scripted(plan: dict[str, list[Order | dict]]) -> Strategy:
+    """A strategy that places the orders planned for each date, given as YYYY-MM-DD."""
+    def strategy(when: datetime, prices: dict[str, float], account: Account) -> list[Order]:
+        return [Order.model_validate(order) for order in plan.get(when.strftime("%Y-%m-%d"), [])]
+    return strategy
+
+
+def recorded(transactions: list[Transaction | dict]) -> Strategy:
+    """A strategy that repeats a live account's trades on the days they were made."""
+    plan = defaultdict(list)
+    for transaction in map(Transaction.model_validate, transactions):
+        side = "buy" if transaction.quantity > 0 else "sell"
+        plan[transaction.timestamp[:10]].append(
+            Order(side=side, symbol=transaction.symbol, quantity=abs(transaction.quantity), rationale=transaction.rationale)
+        )
+    return scripted(plan)
+
+
+def run_backtest(history: pd.DataFrame, strategy: Strategy, name: str = "backtest", initial_balance: float = INITIAL_BALANCE) -> BacktestResult:
+    """Replay the history through a fresh account following the strategy.
+
+    Each day the strategy sees the latest closes, its orders are filled one at a time
+    against them with the usual risk checks, and the account is marked to market at
+    the close. Orders the account rejects, and orders for a symbol with no close yet,
+    are recorded rather than stopping the run. A symbol missing on a day keeps its last close.
+
+    The run uses its own in-memory storage, so it never touches the database. It swaps
+    the process-wide storage and clock while it runs, so it must not run inside a live
+    trading floor process: run it from its own process, as the command line does.
+
+    Args:
+        history: Closes with one row per YYYY-MM-DD date and one column per symbol.
+        strategy: Called each day with the simulated time, the prices and the account.
+        name: The account name to trade under.
+        initial_balance: The starting cash.
+
+    Returns:
+        The final state, the portfolio value series, rejected orders and performance analytics.
+    """
+    if history.empty:
+        raise ValueError("No price history to replay.")
+    symbols = list(history.columns)
+    closes = history.to_numpy(dtype=np.float64)
+    dates = list(history.index)
+
+    rejected = []
+    last_prices: dict[str, float] = {}
+    with use_clock(SimulatedClock(datetime.fromisoformat(dates[0]))) as clock, use_storage(InMemoryStorage()) as storage:
+        account = Account.get(name, storage)
+        account.reset("", initial_balance)
+        for date, row in zip(dates, closes):
+            clock.set(datetime.combine(datetime.fromisoformat(date).date(), MARKET_CLOSE))
+            last_prices.update((symbol, price) for symbol, price in zip(symbols, row) if price > 0)
+            for order in map(Order.model_validate, strategy(clock.now(), dict(last_prices), account)):
+                if order.symbol not in last_prices:
+                    # Never price from the live provider: the replay only knows the history's closes
+                    rejected.append(f"{date}: Order ({order.side} {order.quantity} {order.symbol}) rejected: no close yet.")
+                    continue
+                try:
+                    account.fill_orders([order], last_prices)
+                except ValueError as e:
+                    rejected.append(f"{date}: {e}")
+            account.mark_to_market(last_prices)
+
+    portfolio_values = account.portfolio_value_time_series
+    trades = pd.DataFrame(account.list_transactions(), columns=["symbol", "quantity", "price", "timestamp", "rationale"])
+    times = np.array([when for when, _ in portfolio_values], dtype="datetime64[s]")
+    values = np.array([value for _, value in portfolio_values], dtype=np.float64)
+    final_value = values[-1]
+    return BacktestResult(
+        name=account.name,
+        start=dates[0],
+        end=dates[-1],
+        final_value=final_value,
+        profit_loss=final_value - initial_balance,
+        trades=len(trades),
+        rejected=rejected,
+        portfolio_values=portfolio_values,
+        holdings=account.holdings,
+        analytics=analytics.summarize(account, trades, times, values, last_prices),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", help="CSV or Parquet file of closes (default: the stored market prices)")
+    parser.add_argument("--start", help="first date to replay, YYYY-MM-DD")
+    parser.add_argument("--end", help="last date to replay, YYYY-MM-DD")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", metavar="NAME", help="repeat the trades of this live account")
+    source.add_argument("--script", metavar="FILE", help="JSON file mapping YYYY-MM-DD dates to lists of orders")
+    parser.add_argument("--balance", type=float, default=INITIAL_BALANCE, help="starting cash")
+    args = parser.parse_args()
+
+    history = load_history_file(args.history) if args.history else load_history_from_db(args.start, args.end)
+    history = history.loc[args.start or history.index[0]:args.end or history.index[-1]]
+    if args.replay:
+        strategy = recorded(Account.get(args.replay).list_transactions())
+    else:
+        with open(args.script) as f:
+            strategy = scripted(json.load(f))
+    result = run_backtest(history, strategy, initial_balance=args.balance)
+    print(result.model_dump_json(indent=2, exclude={"portfolio_values"}))
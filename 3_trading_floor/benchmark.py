@@ -0,0 +1,273 @@
+"""
+Micro-benchmarks for the trading floor's storage and market layers.
+
+Each benchmark runs against a throwaway database in a temporary directory.
+Run everything with `uv run benchmark.py`, or pick one
+with e.g. `uv run benchmark.py database`.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import SQLiteStorage
+from storage import InMemoryStorage, use_storage
+from market import PriceCache
+from price_snapshot import PriceSnapshot
+from price_bus import PriceBus
+from simulator import MarketSimulator
+
+SAMPLE_ACCOUNT = {
+    "name": "bench",
+    "balance": 10_000.0,
+    "strategy": "Buy low, sell high",
+    "holdings": {"AAPL": 10, "MSFT": 5},
+    "transactions": [],
+    "portfolio_value_time_series": [],
+}
+
+
+def ops_per_second(fn, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def report(title: str, results: dict[str, float]) -> None:
+    print(f"\n{title}")
+    for label, value in results.items():
+        print(f"  {label:<32} {value:>12,.0f} ops/sec")
+
+
+def legacy_connect_per_call(path: str):
+    """The original database.py pattern: a fresh connection and commit per call."""
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime DATETIME, type TEXT, message TEXT)")
+
+    def write_account(i):
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "INSERT INTO accounts (name, account) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET account=excluded.account",
+                ("bench", json.dumps(SAMPLE_ACCOUNT)),
+            )
+            conn.commit()
+
+    def read_account(i):
+        with sqlite3.connect(path) as conn:
+            row = conn.execute("SELECT account FROM accounts WHERE name = ?", ("bench",)).fetchone()
+            json.loads(row[0])
+
+    def write_log(i):
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "INSERT INTO logs (name, datetime, type, message) VALUES (?, datetime('now'), ?, ?)",
+                ("bench", "account", f"message {i}"),
+            )
+            conn.commit()
+
+    return write_account, read_account, write_log
+
+
+def storage_operations(storage, n: int):
+    def write_log(i):
+        storage.write_log("bench", "account", f"message {i}")
+        if i == n - 1:
+            storage.flush_logs()
+
+    return (
+        lambda i: storage.write_account("bench", SAMPLE_ACCOUNT),
+        lambda i: storage.read_account("bench"),
+        write_log,
+    )
+
+
+def bench_database(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        before = legacy_connect_per_call(os.path.join(tmp, "legacy.db"))
+        storage = SQLiteStorage(os.path.join(tmp, "pooled.db"))
+        after = storage_operations(storage, n)
+        memory = storage_operations(InMemoryStorage(), n)
+        results = {}
+        for label, legacy, pooled, in_memory in zip(["write_account", "read_account", "write_log"], before, after, memory):
+            results[f"{label} (connect per call)"] = ops_per_second(legacy, n)
+            results[f"{label} (pooled, WAL)"] = ops_per_second(pooled, n)
+            results[f"{label} (in memory)"] = ops_per_second(in_memory, n)
+        storage.close()
+    report("database", results)
+
+
+def bench_logs(n: int) -> None:
+    names = ["warren", "george", "ray", "cathie"]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "logs.db"))
+        conn = storage.connection()
+        for size in (10_000, 100_000, 500_000):
+            with storage.transaction():
+                existing = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO logs (name, datetime, type, message) VALUES (?, datetime('now'), 'trace', 'message')",
+                    ((names[i % len(names)],) for i in range(size - existing)),
+                )
+            last_id = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0]
+            unindexed = "SELECT datetime, type, message FROM logs NOT INDEXED WHERE name = ? ORDER BY datetime DESC LIMIT 13"
+            results[f"read_log, no index ({size:,} rows)"] = ops_per_second(
+                lambda i: conn.execute(unindexed, (names[i % len(names)],)).fetchall(), max(n // 100, 10)
+            )
+            results[f"read_log_since ({size:,} rows)"] = ops_per_second(
+                lambda i: storage.read_log_since(names[i % len(names)], last_id - 8, limit=13), n
+            )
+        storage.close()
+    report("logs", results)
+
+
+def bench_market(n: int) -> None:
+    symbols = [f"S{i:05d}" for i in range(10_000)]
+    day = {symbol: 100.0 + i / 100 for i, symbol in enumerate(symbols)}
+    blob = json.dumps(day)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "market.db"))
+        storage.write_market("2025-01-02", day)
+        holdings = symbols[::400]
+        results["cold lookup, parse day blob"] = ops_per_second(lambda i: json.loads(blob)[symbols[i % 10_000]], max(n // 10, 10))
+        results["cold lookup, read_market_price"] = ops_per_second(
+            lambda i: storage.read_market_price("2025-01-02", symbols[i % 10_000]), n
+        )
+        results[f"read_market_prices ({len(holdings)} symbols)"] = ops_per_second(
+            lambda i: storage.read_market_prices("2025-01-02", holdings), n
+        )
+        cache = PriceCache(maxsize=len(symbols))
+        cache.update(day)
+        results[f"PriceCache.fresh ({len(holdings)} symbols)"] = ops_per_second(lambda i: cache.fresh(holdings), n)
+        snapshot = PriceSnapshot(os.path.join(tmp, "prices.snap"))
+        snapshot.publish(day)
+        results["shared snapshot lookup, mapped file"] = ops_per_second(lambda i: snapshot.get(symbols[i % 10_000]), n)
+        results[f"shared snapshot fresh ({len(holdings)} symbols)"] = ops_per_second(
+            lambda i: snapshot.fresh(holdings, 60), n
+        )
+        snapshot.close()
+        bus = PriceBus()
+        bus.subscribe(lambda prices: None)
+        bus.subscribe(lambda prices: None, symbols=holdings)
+        batch = {symbol: day[symbol] for symbol in holdings}
+        results[f"PriceBus.publish ({len(holdings)} trades)"] = ops_per_second(lambda i: bus.publish(batch), n)
+        results[f"PriceBus.last ({len(holdings)} symbols)"] = ops_per_second(lambda i: bus.last(holdings, 300), n)
+        storage.close()
+    report("market", results)
+
+
+def bench_backtest(n: int) -> None:
+    import numpy as np
+    import pandas as pd
+    import backtest
+    from accounts import Order
+
+    days = pd.bdate_range("2015-01-01", periods=max(n, 2)).strftime("%Y-%m-%d")
+    rng = np.random.default_rng(0)
+    symbols = ["AAPL", "MSFT", "GOOG", "AMZN", "SPY"]
+    history = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(days), len(symbols))), axis=0)), index=days, columns=symbols)
+
+    def rebalance(when, prices, account):
+        symbol = symbols[when.toordinal() % len(symbols)]
+        if account.holdings.get(symbol):
+            return [Order(side="sell", symbol=symbol, quantity=account.holdings[symbol], rationale="rotate")]
+        return [Order(side="buy", symbol=symbol, quantity=10, rationale="rotate")]
+
+    start = time.perf_counter()
+    result = backtest.run_backtest(history, rebalance)
+    elapsed = time.perf_counter() - start
+    report("backtest", {f"simulated days ({len(days):,} days, {result.trades:,} trades)": len(days) / elapsed})
+
+
+def bench_mark_to_market(n: int) -> None:
+    from unittest.mock import patch
+    import mark_to_market
+    from accounts import Account
+
+    symbols = [f"S{i:03d}" for i in range(500)]
+    prices = {symbol: 100.0 for symbol in symbols}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("mark_to_market.get_share_prices", side_effect=lambda batch: {s: prices[s] for s in batch}), \
+         patch("accounts.get_share_prices", side_effect=lambda batch: {s: prices[s] for s in batch}):
+        storage = SQLiteStorage(os.path.join(tmp, "mark.db"))
+        with storage.transaction():
+            for i in range(n):
+                held = {symbols[(i * 7 + k) % len(symbols)]: 10 for k in range(5)}
+                storage.write_account(f"trader{i}", {"balance": 1_000.0, "strategy": "", "holdings": held})
+        names = [f"trader{i}" for i in range(n)]
+
+        with use_storage(storage):
+            start = time.perf_counter()
+            for name in names:
+                Account.get(name).mark_to_market()
+            results[f"per account ({n:,} accounts)"] = n / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            mark_to_market.mark_to_market()
+            results[f"bulk, one snapshot ({n:,} accounts)"] = n / (time.perf_counter() - start)
+        storage.close()
+    report("mark_to_market (accounts valued per second)", results)
+
+
+def bench_ledger(n: int) -> None:
+    from accounts import Account
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "ledger.db"))
+        account = Account.get("bench", storage)
+        results[f"deposit, state + event ({n:,} events)"] = ops_per_second(lambda i: account.deposit(1.0), n)
+        events = [event["id"] for event in storage.read_account_events("bench")]
+        results["rebuild past state (as_of)"] = ops_per_second(
+            lambda i: Account.as_of("bench", event_id=events[i * 7919 % len(events)], storage=storage), max(n // 10, 10)
+        )
+        storage.close()
+    report("ledger", results)
+
+
+def bench_simulator(n: int) -> None:
+    symbols = [f"S{i:03d}" for i in range(25)]
+    block = 100_000
+    results = {}
+    simulator = MarketSimulator()
+    # one op is one tick of one symbol
+    results[f"simulate, ticks ({len(symbols)} symbols)"] = block * len(symbols) * ops_per_second(
+        lambda i: simulator.simulate(symbols, block), max(n // 200, 3)
+    )
+    clock = [1_760_000_000.0]
+    provider = MarketSimulator(clock=lambda: clock[0])
+    provider.get_prices(symbols)
+
+    def next_second(i):
+        clock[0] += 1
+        provider.get_prices(symbols)
+    results[f"get_prices, next second ({len(symbols)} symbols)"] = ops_per_second(next_second, n)
+    report("simulator", results)
+
+
+BENCHMARKS = {
+    "database": bench_database,
+    "logs": bench_logs,
+    "market": bench_market,
+    "backtest": bench_backtest,
+    "mark_to_market": bench_mark_to_market,
+    "ledger": bench_ledger,
+    "simulator": bench_simulator,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", choices=[[], *BENCHMARKS], help="benchmarks to run (default: all)")
+    parser.add_argument("-n", type=int, default=2_000, help="operations per measurement")
+    args = parser.parse_args()
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](args.n)
@@ -0,0 +1,49 @@
+"""
+The time as the trading floor sees it.
+
+Accounts read the time from here rather than from the system, so a backtest
+can drive them through simulated days at full speed.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class SimulatedClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+    def set(self, when: datetime) -> None:
+        self.current = when
+
+    def advance(self, delta: timedelta) -> None:
+        self.current += delta
+
+
+clock = SystemClock()
+
+
+def now() -> datetime:
+    """The current time on the active clock."""
+    return clock.now()
+
+
+@contextmanager
+def use_clock(new_clock):
+    """Make ``new_clock`` the active clock for the enclosed block."""
+    global clock
+    previous, clock = clock, new_clock
+    try:
+        yield new_clock
+    finally:
+        clock = previous
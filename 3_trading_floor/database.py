@@ -1,17 +1,203 @@
 import sqlite3
 import json
-from datetime import datetime
-from dotenv import load_dotenv
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+from datetime import datetime, timezone
 
-load_dotenv(override=True)
+# Applied to every connection. WAL lets the dashboard read while the traders write,
+# and synchronous=NORMAL only fsyncs at checkpoints instead of on every commit.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64_000,  # in KiB, so ~64MB
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5_000,
+}
 
-DB = "accounts.db"
+# Scalar state of an account stored in the accounts table, with defaults for rows written by older versions
+ACCOUNT_COLUMNS = {
+    "balance": None,
+    "strategy": "",
+    "trade_day": "",
+    "trade_count": 0,
+    "net_invested": 0.0,
+    "realized_pnl": 0.0,
+    "epoch": 0,
+}
 
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.25"))
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
+# An account's full state is snapshotted after this many events, so rebuilding any
+# past state replays at most this many events on top of the nearest snapshot
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "100"))
+
+
+class VersionConflictError(Exception):
+    """Raised when an account was saved by someone else since it was read."""
+
+
+class ConnectionManager:
+    """
+    Keeps one open SQLite connection per thread for a database file.
+
+    Connections are opened in autocommit mode; writes are grouped with
+    ``transaction()``, which can be nested - only the outermost block commits,
+    and an inner block that raises is rolled back to a savepoint where it began.
+    The path may be an SQLite URI, e.g. for a shared in-memory database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, uri=True)
+            for pragma, value in PRAGMAS.items():
+                conn.execute(f"PRAGMA {pragma}={value}")
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the enclosed statements in a single write transaction.
+
+        Yields:
+            sqlite3.Connection: The connection for the current thread
+        """
+        conn = self.connection()
+        if self._local.depth:
+            savepoint = f"nested_{self._local.depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            self._local.depth += 1
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                raise
+            finally:
+                conn.execute(f"RELEASE {savepoint}")
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def in_transaction(self) -> bool:
+        return bool(getattr(self._local, "depth", 0))
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    """Create the tables and indexes, migrating a database written by an older version."""
+    legacy = 'account' in _columns(conn, 'accounts')
+    if legacy:
+        conn.execute('ALTER TABLE accounts RENAME TO accounts_blob')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS accounts (
+            name TEXT PRIMARY KEY,
+            balance REAL NOT NULL,
+            strategy TEXT NOT NULL DEFAULT '',
+            trade_day TEXT NOT NULL DEFAULT '',
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            net_invested REAL NOT NULL DEFAULT 0,
+            realized_pnl REAL NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            epoch INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _add_column(conn, 'accounts', "trade_day TEXT NOT NULL DEFAULT ''")
+    _add_column(conn, 'accounts', 'trade_count INTEGER NOT NULL DEFAULT 0')
+    needs_cost_basis = _add_column(conn, 'accounts', 'net_invested REAL NOT NULL DEFAULT 0')
+    _add_column(conn, 'accounts', 'realized_pnl REAL NOT NULL DEFAULT 0')
+    _add_column(conn, 'accounts', 'version INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'accounts', 'epoch INTEGER NOT NULL DEFAULT 0')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            avg_cost REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, symbol)
+        )
+    ''')
+    _add_column(conn, 'holdings', 'avg_cost REAL NOT NULL DEFAULT 0')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            rationale TEXT NOT NULL,
+            epoch INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _add_column(conn, 'transactions', 'epoch INTEGER NOT NULL DEFAULT 0')
+    conn.execute('DROP INDEX IF EXISTS idx_transactions_name')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_epoch ON transactions (name, epoch, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            datetime TEXT NOT NULL,
+            value REAL NOT NULL,
+            epoch INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _add_column(conn, 'portfolio_values', 'epoch INTEGER NOT NULL DEFAULT 0')
+    conn.execute('DROP INDEX IF EXISTS idx_portfolio_values_name')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_epoch ON portfolio_values (name, epoch, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS account_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            epoch INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            data TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_account_events_name ON account_events (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS account_snapshots (
+            name TEXT NOT NULL,
+            event_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, event_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
@@ -20,82 +206,692 @@ with sqlite3.connect(DB) as conn:
             message TEXT
         )
     ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
-
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
-
-def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
-def write_log(name: str, type: str, message: str):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resting_orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            side TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            order_type TEXT NOT NULL,
+            trigger_price REAL NOT NULL,
+            rationale TEXT NOT NULL,
+            created TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_resting_orders_name ON resting_orders (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS market_prices (
+            date TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (date, symbol)
+        ) WITHOUT ROWID
+    ''')
+    if legacy:
+        _migrate_account_blobs(conn)
+    if _columns(conn, 'market'):
+        _migrate_market_blobs(conn)
+    _backfill_trade_counts(conn)
+    if legacy or needs_cost_basis:
+        _backfill_cost_basis(conn)
+    _backfill_snapshots(conn)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _add_column(conn: sqlite3.Connection, table: str, definition: str) -> bool:
+    """Add a column to a table created by an older version; return whether it was missing."""
+    if definition.split()[0] in _columns(conn, table):
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {definition}')
+    return True
+
+
+def _backfill_trade_counts(conn: sqlite3.Connection) -> None:
+    """Start the daily trade counter of accounts that predate it from today's transactions in their current epoch."""
+    conn.execute('''
+        UPDATE accounts SET
+            trade_day = date('now', 'localtime'),
+            trade_count = (
+                SELECT COUNT(*) FROM transactions t
+                WHERE t.name = accounts.name AND t.epoch = accounts.epoch AND t.timestamp >= date('now', 'localtime')
+            )
+        WHERE trade_day = ''
+    ''')
+
+
+def _backfill_cost_basis(conn: sqlite3.Connection) -> None:
+    """Replay each account's transactions to seed its net invested capital, average costs and realized P&L."""
+    for (name,) in conn.execute('SELECT name FROM accounts').fetchall():
+        held, avg_cost, net_invested, realized_pnl = {}, {}, 0.0, 0.0
+        rows = conn.execute('SELECT symbol, quantity, price FROM transactions WHERE name = ? ORDER BY id', (name,))
+        for symbol, quantity, price in rows.fetchall():
+            net_invested += quantity * price
+            before = held.get(symbol, 0)
+            if quantity > 0:
+                avg_cost[symbol] = (avg_cost.get(symbol, 0.0) * before + price * quantity) / (before + quantity)
+            else:
+                realized_pnl += (price - avg_cost.get(symbol, 0.0)) * -quantity
+            held[symbol] = before + quantity
+            if not held[symbol]:
+                avg_cost.pop(symbol, None)
+        conn.execute('UPDATE accounts SET net_invested = ?, realized_pnl = ? WHERE name = ?', (net_invested, realized_pnl, name))
+        conn.executemany(
+            'UPDATE holdings SET avg_cost = ? WHERE name = ? AND symbol = ?',
+            [(cost, name, symbol) for symbol, cost in avg_cost.items()],
+        )
+
+
+def _backfill_snapshots(conn: sqlite3.Connection) -> None:
+    """Start the event log of accounts that predate it with a snapshot of their current state."""
+    rows = conn.execute('SELECT name FROM accounts WHERE name NOT IN (SELECT name FROM account_snapshots)').fetchall()
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for (name,) in rows:
+        account = _read_account(conn, name)
+        _append_event(conn, name, account["epoch"], "open", {"balance": account["balance"], "strategy": account["strategy"]},
+                      timestamp, snapshot=True)
+
+
+def _migrate_account_blobs(conn: sqlite3.Connection) -> None:
+    """One-shot move of the old JSON-per-account rows into the ledger tables."""
+    for name, blob in conn.execute('SELECT name, account FROM accounts_blob').fetchall():
+        fields = json.loads(blob)
+        _write_account(conn, name, fields)
+        conn.executemany(
+            'INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale) VALUES (?, ?, ?, ?, ?, ?)',
+            [(name, t['symbol'], t['quantity'], t['price'], t['timestamp'], t['rationale']) for t in fields.get('transactions', [])],
+        )
+        conn.executemany(
+            'INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)',
+            [(name, when, value) for when, value in fields.get('portfolio_value_time_series', [])],
+        )
+    conn.execute('DROP TABLE accounts_blob')
+
+
+def _migrate_market_blobs(conn: sqlite3.Connection) -> None:
+    """One-shot move of the old JSON-per-date market rows into market_prices."""
+    for date, blob in conn.execute('SELECT date, data FROM market').fetchall():
+        _write_market(conn, date, json.loads(blob))
+    conn.execute('DROP TABLE market')
+
+
+def _read_account(conn: sqlite3.Connection, name: str) -> dict | None:
+    row = conn.execute(f'SELECT {", ".join(ACCOUNT_COLUMNS)}, version FROM accounts WHERE name = ?', (name,)).fetchone()
+    if not row:
+        return None
+    holdings = conn.execute('SELECT symbol, quantity, avg_cost FROM holdings WHERE name = ? ORDER BY rowid', (name,)).fetchall()
+    return {
+        "name": name,
+        **dict(zip([*ACCOUNT_COLUMNS, "version"], row)),
+        "holdings": {symbol: quantity for symbol, quantity, _ in holdings},
+        "average_costs": {symbol: avg_cost for symbol, _, avg_cost in holdings},
+    }
+
+
+def _append_event(conn: sqlite3.Connection, name: str, epoch: int, type: str, data: dict, timestamp: str, snapshot: bool = False) -> int:
     """
-    Write a log entry to the logs table.
-    
-    Args:
-        name (str): The name associated with the log
-        type (str): The type of log entry
-        message (str): The log message
+    Append an event to an account's log. The account's state after the event is
+    snapshotted when asked for, or once SNAPSHOT_INTERVAL events have passed since
+    the last snapshot, so call this after writing that state, in the same transaction.
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO logs (name, datetime, type, message)
-            VALUES (?, datetime('now'), ?, ?)
-        ''', (name.lower(), type, message))
-        conn.commit()
-
-def read_log(name: str, last_n=10):
+    event_id = conn.execute(
+        'INSERT INTO account_events (name, epoch, type, timestamp, data) VALUES (?, ?, ?, ?, ?)',
+        (name, epoch, type, timestamp, json.dumps(data)),
+    ).lastrowid
+    if not snapshot:
+        pending = conn.execute('''
+            SELECT COUNT(*) FROM account_events
+            WHERE name = ? AND id > (SELECT COALESCE(MAX(event_id), 0) FROM account_snapshots WHERE name = ?)
+        ''', (name, name)).fetchone()[0]
+        snapshot = pending >= SNAPSHOT_INTERVAL
+    if snapshot:
+        state = _read_account(conn, name)
+        del state["version"]
+        conn.execute(
+            'INSERT INTO account_snapshots (name, event_id, timestamp, state) VALUES (?, ?, ?, ?)',
+            (name, event_id, timestamp, json.dumps(state)),
+        )
+    return event_id
+
+
+def _write_account_state(conn: sqlite3.Connection, name: str, account_dict: dict) -> None:
+    columns = ", ".join(ACCOUNT_COLUMNS)
+    placeholders = ", ".join("?" for _ in ACCOUNT_COLUMNS)
+    updates = ", ".join(f"{column}=excluded.{column}" for column in ACCOUNT_COLUMNS)
+    values = [account_dict.get(column, default) for column, default in ACCOUNT_COLUMNS.items()]
+    conn.execute(f'''
+        INSERT INTO accounts (name, {columns})
+        VALUES (?, {placeholders})
+        ON CONFLICT(name) DO UPDATE SET {updates}
+    ''', (name, *values))
+
+
+def _write_account(conn: sqlite3.Connection, name: str, account_dict: dict) -> None:
+    _write_account_state(conn, name, account_dict)
+    conn.execute('DELETE FROM holdings WHERE name = ?', (name,))
+    avg_costs = account_dict.get('average_costs', {})
+    conn.executemany(
+        'INSERT INTO holdings (name, symbol, quantity, avg_cost) VALUES (?, ?, ?, ?)',
+        [(name, symbol, quantity, avg_costs.get(symbol, 0.0)) for symbol, quantity in account_dict['holdings'].items()],
+    )
+
+
+def _write_market(conn: sqlite3.Connection, date: str, data: dict) -> None:
+    conn.execute('DELETE FROM market_prices WHERE date = ?', (date,))
+    conn.executemany(
+        'INSERT INTO market_prices (date, symbol, close) VALUES (?, ?, ?)',
+        [(date, symbol, close) for symbol, close in data.items() if close is not None],
+    )
+
+RESTING_ORDER_COLUMNS = ("id", "name", "side", "symbol", "quantity", "order_type", "trigger_price", "rationale", "created")
+
+
+class LogWriter:
+    """
+    Buffers log rows and inserts them from a background thread with ``insert``.
+
+    Rows are committed in one transaction per batch, once ``batch_size`` rows are
+    waiting or ``flush_interval`` seconds after the first one arrived. ``write``
+    never touches the database, so it is safe to call from the event loop.
+    """
+
+    _STOP = object()
+
+    def __init__(self, insert: Callable[[list[tuple]], None], batch_size: int = LOG_BATCH_SIZE, flush_interval: float = LOG_FLUSH_INTERVAL):
+        self.insert = insert
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, row: tuple) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(row)
+
+    def flush(self) -> None:
+        """Block until every row written so far has been committed."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        """Flush outstanding rows and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is self._STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                timeout = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if batch:
+                self._insert(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _insert(self, batch: list[tuple]) -> None:
+        try:
+            self.insert(batch)
+        except Exception as e:
+            print(f"Failed to write {len(batch)} log entries: {e}", file=sys.stderr)
+
+
+class SQLiteStorage:
     """
-    Read the most recent log entries for a given name.
-    
-    Args:
-        name (str): The name to retrieve logs for
-        last_n (int): Number of most recent entries to retrieve
-        
-    Returns:
-        list: A list of tuples containing (datetime, type, message)
+    Stores accounts, their ledgers, logs, resting orders and market prices in an SQLite database.
+
+    Nothing touches the disk until the first query, which creates the tables.
+    Log rows are batched by a background LogWriter.
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manager = ConnectionManager(path)
+        self.log_writer = LogWriter(self._insert_logs)
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the open connection for the current thread, creating the tables on first use."""
+        if not self._ready:
+            with self._schema_lock:
+                if not self._ready:
+                    with self.manager.transaction() as conn:
+                        _create_schema(conn)
+                    self._ready = True
+        return self.manager.connection()
+
+    def transaction(self):
+        """Context manager grouping writes into one atomic commit."""
+        self.connection()
+        return self.manager.transaction()
+
+    def flush_logs(self) -> None:
+        """Commit any log entries still buffered by write_log."""
+        self.log_writer.flush()
+
+    def close(self) -> None:
+        """Flush buffered logs and close every connection; the storage reopens them if used again."""
+        self.log_writer.close()
+        self.manager.close_all()
+
+    def _insert_logs(self, batch: list[tuple]) -> None:
+        with self.transaction() as conn:
+            conn.executemany('INSERT INTO logs (name, datetime, type, message) VALUES (?, ?, ?, ?)', batch)
+
+    def write_account(self, name, account_dict):
+        """
+        Write the scalar state (balance, strategy, counters, cost basis) and holdings of an account.
+
+        Transactions and portfolio values are append-only and are written with
+        write_fill and write_portfolio_value instead, and read with read_transactions
+        and read_portfolio_values. Changes made through write_fill, write_event and
+        start_epoch are also recorded in the account's event log; this is not.
+        """
+        with self.transaction() as conn:
+            _write_account(conn, name.lower(), account_dict)
+
+    def read_account(self, name):
+        return _read_account(self.connection(), name.lower())
+
+    def read_transactions(self, name: str, since: str | None = None, after_id: int = 0, limit: int | None = None) -> list[dict]:
+        """
+        Read a page of the transactions in an account's current epoch, oldest first.
+
+        Args:
+            name (str): The account name
+            since (str | None): Only return transactions with a timestamp at or after this
+            after_id (int): Only return transactions with an id greater than this, to fetch the next page
+            limit (int | None): The maximum number of transactions to return
+
+        Returns:
+            list: A list of dicts with the transaction fields and its id
+        """
+        cursor = self.connection().execute('''
+            SELECT id, symbol, quantity, price, timestamp, rationale FROM transactions
+            WHERE name = ? AND epoch = (SELECT COALESCE(MAX(epoch), 0) FROM accounts WHERE name = ?)
+                AND id > ? AND timestamp >= ?
+            ORDER BY id
+            LIMIT ?
+        ''', (name.lower(), name.lower(), after_id, since or '', -1 if limit is None else limit))
+        return [dict(zip(("id", "symbol", "quantity", "price", "timestamp", "rationale"), row)) for row in cursor.fetchall()]
+
+    def read_portfolio_values(self, name: str, since: str | None = None, after_id: int = 0, limit: int | None = None) -> list[tuple]:
+        """
+        Read a page of an account's portfolio value time series in its current epoch, oldest first.
+
+        Returns:
+            list: A list of tuples containing (id, datetime, value)
+        """
+        cursor = self.connection().execute('''
+            SELECT id, datetime, value FROM portfolio_values
+            WHERE name = ? AND epoch = (SELECT COALESCE(MAX(epoch), 0) FROM accounts WHERE name = ?)
+                AND id > ? AND datetime >= ?
+            ORDER BY id
+            LIMIT ?
+        ''', (name.lower(), name.lower(), after_id, since or '', -1 if limit is None else limit))
+        return cursor.fetchall()
+
+    def claim_account_version(self, name: str, version: int) -> None:
+        """
+        Bump an account's version, provided it is still the version the caller read.
+
+        Call this inside the transaction that writes the account's changes: the
+        transaction holds the write lock, so the check and the writes are atomic.
+
+        Args:
+            name (str): The account name
+            version (int): The version the caller's copy of the account was read at
+
+        Raises:
+            VersionConflictError: If the account was changed since it was read
+        """
+        cursor = self.connection().execute(
+            'UPDATE accounts SET version = version + 1 WHERE name = ? AND version = ?', (name.lower(), version)
+        )
+        if cursor.rowcount != 1:
+            raise VersionConflictError(f"Account {name} was modified since version {version} was read")
+
+    def write_fill(self, name: str, account_dict: dict, symbol: str, quantity: int, transaction_dict: dict, avg_cost: float = 0.0) -> None:
+        """
+        Record a trade: the new account state, the new holding for the symbol, the transaction and its fill event.
+
+        Args:
+            name (str): The account name
+            account_dict (dict): The account after the trade; only its scalar state is written
+            symbol (str): The symbol traded
+            quantity (int): The shares of symbol now held; 0 removes the holding
+            transaction_dict (dict): The transaction to append
+            avg_cost (float): The average cost of the shares of symbol now held
+        """
+        name = name.lower()
+        with self.transaction() as conn:
+            _write_account_state(conn, name, account_dict)
+            if quantity:
+                conn.execute('''
+                    INSERT INTO holdings (name, symbol, quantity, avg_cost)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name, symbol) DO UPDATE SET quantity=excluded.quantity, avg_cost=excluded.avg_cost
+                ''', (name, symbol, quantity, avg_cost))
+            else:
+                conn.execute('DELETE FROM holdings WHERE name = ? AND symbol = ?', (name, symbol))
+            epoch = account_dict.get('epoch', 0)
+            transaction = {key: transaction_dict[key] for key in ('symbol', 'quantity', 'price', 'timestamp', 'rationale')}
+            conn.execute('''
+                INSERT INTO transactions (name, epoch, symbol, quantity, price, timestamp, rationale)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, epoch, *transaction.values()))
+            _append_event(conn, name, epoch, 'fill', transaction, transaction['timestamp'])
+
+    def write_event(self, name: str, account_dict: dict, type: str, data: dict, timestamp: str) -> int:
+        """
+        Record a change to an account's scalar state, such as a deposit, with the event that made it.
+
+        Args:
+            name (str): The account name
+            account_dict (dict): The account after the change; only its scalar state is written
+            type (str): The kind of event, e.g. "deposit", "withdraw" or "strategy"
+            data (dict): What is needed to replay the event
+            timestamp (str): When the event happened
+
+        Returns:
+            int: The id of the event
+        """
+        name = name.lower()
+        with self.transaction() as conn:
+            _write_account_state(conn, name, account_dict)
+            return _append_event(conn, name, account_dict.get('epoch', 0), type, data, timestamp)
+
+    def start_epoch(self, name: str, account_dict: dict, type: str, timestamp: str) -> int:
+        """
+        Open an account, or reset it, by starting a new epoch of its ledger.
+
+        The account's state and holdings are written, its resting orders are dropped,
+        and the event starting the epoch is snapshotted. Transactions and portfolio
+        values of earlier epochs are kept for audit, but are no longer read.
+
+        Args:
+            name (str): The account name
+            account_dict (dict): The account at the start of the epoch, with its new epoch number
+            type (str): "open" or "reset"
+            timestamp (str): When the epoch started
+
+        Returns:
+            int: The id of the event starting the epoch
+        """
+        name = name.lower()
+        with self.transaction() as conn:
+            _write_account(conn, name, account_dict)
+            conn.execute('DELETE FROM resting_orders WHERE name = ?', (name,))
+            data = {'balance': account_dict['balance'], 'strategy': account_dict['strategy']}
+            return _append_event(conn, name, account_dict.get('epoch', 0), type, data, timestamp, snapshot=True)
+
+    def read_account_snapshot(self, name: str, until_id: int | None = None, until: str | None = None) -> tuple[int, dict] | None:
+        """
+        Read the latest snapshot of an account taken at or before an event or time.
+
+        Args:
+            name (str): The account name
+            until_id (int | None): The latest event id the snapshot may be taken at
+            until (str | None): The latest time the snapshot may be taken at
+
+        Returns:
+            tuple | None: The id of the event the snapshot was taken after, and the account's state then
+        """
+        row = self.connection().execute('''
+            SELECT event_id, state FROM account_snapshots
+            WHERE name = ? AND event_id <= COALESCE(?, event_id) AND timestamp <= COALESCE(?, timestamp)
+            ORDER BY event_id DESC
+            LIMIT 1
+        ''', (name.lower(), until_id, until)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def read_account_events(self, name: str, after_id: int = 0, until_id: int | None = None, until: str | None = None) -> list[dict]:
+        """
+        Read an account's events oldest first, across every epoch.
+
+        Args:
+            name (str): The account name
+            after_id (int): Only return events with a greater id
+            until_id (int | None): Only return events up to this id
+            until (str | None): Only return events up to this time
+
+        Returns:
+            list: Dicts with the event's id, epoch, type, timestamp and data
+        """
+        rows = self.connection().execute('''
+            SELECT id, epoch, type, timestamp, data FROM account_events
+            WHERE name = ? AND id > ? AND id <= COALESCE(?, id) AND timestamp <= COALESCE(?, timestamp)
+            ORDER BY id
+        ''', (name.lower(), after_id, until_id, until)).fetchall()
+        return [
+            {"id": id, "epoch": epoch, "type": type, "timestamp": timestamp, "data": json.loads(data)}
+            for id, epoch, type, timestamp, data in rows
+        ]
+
+    def write_portfolio_value(self, name: str, datetime: str, value: float) -> None:
+        self.write_portfolio_values([(name, datetime, value)])
+
+    def write_portfolio_values(self, points: list[tuple[str, str, float]]) -> None:
+        """
+        Append portfolio values for many accounts in one transaction, each in its account's current epoch.
+
+        Args:
+            points (list): Tuples of (name, datetime, value)
+        """
+        with self.transaction() as conn:
+            conn.executemany('''
+                INSERT INTO portfolio_values (name, epoch, datetime, value)
+                VALUES (?, (SELECT COALESCE(MAX(epoch), 0) FROM accounts WHERE name = ?), ?, ?)
+            ''', ((name.lower(), name.lower(), datetime, value) for name, datetime, value in points))
+
+    def read_positions(self) -> list[tuple]:
+        """
+        Read every account's cash balance and holdings in one consistent query.
+
+        Returns:
+            list: Tuples of (name, balance, symbol, quantity), one per holding, with
+            symbol and quantity None for an account that holds nothing
+        """
+        return self.connection().execute('''
+            SELECT a.name, a.balance, h.symbol, h.quantity
+            FROM accounts a LEFT JOIN holdings h ON h.name = a.name
+        ''').fetchall()
+
+    def write_resting_order(self, order_dict: dict) -> int:
+        """
+        Store a resting order until it triggers or is cancelled.
+
+        Args:
+            order_dict (dict): The order's name, side, symbol, quantity, order_type, trigger_price, rationale and created time
+
+        Returns:
+            int: The id of the new order
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO resting_orders (name, side, symbol, quantity, order_type, trigger_price, rationale, created)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (order_dict['name'].lower(), *(order_dict[column] for column in RESTING_ORDER_COLUMNS[2:])))
+            return cursor.lastrowid
+
+    def read_resting_orders(self, name: str | None = None, after_id: int = 0) -> list[dict]:
+        """
+        Read resting orders oldest first, for one account or for all of them.
+
+        Args:
+            name (str | None): The account name, or None for every account
+            after_id (int): Only return orders with a greater id
+
+        Returns:
+            list: A list of dicts of the order columns
+        """
+        if name is None:
+            cursor = self.connection().execute('SELECT * FROM resting_orders WHERE id > ? ORDER BY id', (after_id,))
+        else:
+            cursor = self.connection().execute(
+                'SELECT * FROM resting_orders WHERE name = ? AND id > ? ORDER BY id', (name.lower(), after_id)
+            )
+        return [dict(zip(RESTING_ORDER_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def delete_resting_order(self, order_id: int, name: str | None = None) -> bool:
+        """
+        Remove a resting order, optionally only if it belongs to the given account.
+
+        Returns:
+            bool: Whether the order was still resting; False if it was already filled or cancelled
+        """
+        with self.transaction() as conn:
+            if name is None:
+                cursor = conn.execute('DELETE FROM resting_orders WHERE id = ?', (order_id,))
+            else:
+                cursor = conn.execute('DELETE FROM resting_orders WHERE id = ? AND name = ?', (order_id, name.lower()))
+            return cursor.rowcount == 1
+
+    def write_log(self, name: str, type: str, message: str):
+        """
+        Write a log entry to the logs table.
+
+        The entry is queued for the background log writer, unless a transaction is
+        open on this thread, in which case it is written as part of that transaction.
+
+        Args:
+            name (str): The name associated with the log
+            type (str): The type of log entry
+            message (str): The log message
+        """
+        row = (name.lower(), datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), type, message)
+        if self.manager.in_transaction():
+            self.connection().execute('INSERT INTO logs (name, datetime, type, message) VALUES (?, ?, ?, ?)', row)
+        else:
+            self.log_writer.write(row)
+
+    def read_log(self, name: str, last_n=10):
+        """
+        Read the most recent log entries for a given name.
+
+        Args:
+            name (str): The name to retrieve logs for
+            last_n (int): Number of most recent entries to retrieve
+
+        Returns:
+            list: A list of tuples containing (datetime, type, message)
+        """
+        cursor = self.connection().execute('''
+            SELECT datetime, type, message FROM logs
+            WHERE name = ?
+            ORDER BY id DESC
             LIMIT ?
         ''', (name.lower(), last_n))
-        
         return reversed(cursor.fetchall())
 
-def write_market(date: str, data: dict) -> None:
-    data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
-
-def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    def read_log_since(self, name: str, last_id: int = 0, limit: int | None = None) -> list[tuple]:
+        """
+        Read the log entries for a given name written after a known entry.
+
+        Pollers pass the id of the last row they have seen, so each call only reads
+        the new rows via the (name, id) index.
+
+        Args:
+            name (str): The name to retrieve logs for
+            last_id (int): Only return entries with an id greater than this
+            limit (int | None): If set, return only the most recent ``limit`` new entries
+
+        Returns:
+            list: A list of tuples containing (id, datetime, type, message), oldest first
+        """
+        cursor = self.connection().execute('''
+            SELECT id, datetime, type, message FROM logs
+            WHERE name = ? AND id > ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (name.lower(), last_id, -1 if limit is None else limit))
+        return cursor.fetchall()[::-1]
+
+    def write_market(self, date: str, data: dict) -> None:
+        """
+        Bulk load the closing prices for a date, replacing any already stored.
+
+        Args:
+            date (str): The date the prices are stored under, as YYYY-MM-DD
+            data (dict): Closing price keyed by symbol
+        """
+        with self.transaction() as conn:
+            _write_market(conn, date, data)
+
+    def read_market(self, date: str) -> dict | None:
+        rows = self.connection().execute('SELECT symbol, close FROM market_prices WHERE date = ?', (date,)).fetchall()
+        return dict(rows) if rows else None
+
+    def read_market_dates(self, start: str | None = None, end: str | None = None) -> list[str]:
+        """
+        List the dates with stored market prices, oldest first.
+
+        Args:
+            start (str | None): The first date to include
+            end (str | None): The last date to include
+
+        Returns:
+            list: The dates as YYYY-MM-DD strings
+        """
+        rows = self.connection().execute(
+            'SELECT DISTINCT date FROM market_prices WHERE date >= ? AND date <= ? ORDER BY date',
+            (start or '', end or '9999-12-31')
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def has_market(self, date: str) -> bool:
+        return self.connection().execute('SELECT 1 FROM market_prices WHERE date = ? LIMIT 1', (date,)).fetchone() is not None
+
+    def read_market_price(self, date: str, symbol: str) -> float | None:
+        row = self.connection().execute(
+            'SELECT close FROM market_prices WHERE date = ? AND symbol = ?', (date, symbol)
+        ).fetchone()
+        return row[0] if row else None
+
+    def read_market_prices(self, date: str, symbols) -> dict[str, float]:
+        """
+        Look up the closing prices of several symbols for a date.
+
+        Returns:
+            dict: Closing price keyed by symbol; symbols without a price are left out
+        """
+        rows = self.connection().execute('''
+            SELECT symbol, close FROM market_prices
+            WHERE date = ? AND symbol IN (SELECT value FROM json_each(?))
+        ''', (date, json.dumps(list(symbols)))).fetchall()
+        return dict(rows)
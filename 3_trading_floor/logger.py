@@ -1,22 +1,27 @@
-from database import write_log
+from storage import Storage, get_storage
 
 
-def log_error(name: str, message: str) -> None:
+def write_log(name: str, type: str, message: str, storage: Storage | None = None) -> None:
+    """Write a log entry to the given storage, by default the process-wide one."""
+    (storage or get_storage()).write_log(name.lower(), type, message)
+
+
+def log_error(name: str, message: str, storage: Storage | None = None) -> None:
     """Log an error message for the given agent."""
-    write_log(name.lower(), "error", message)
+    write_log(name, "error", message, storage)
 
 
-def log_exception(name: str, exc: Exception, context: str | None = None) -> None:
+def log_exception(name: str, exc: Exception, context: str | None = None, storage: Storage | None = None) -> None:
     """Log an exception with optional context."""
     msg = f"{context}: {exc}" if context else str(exc)
-    log_error(name, msg)
+    log_error(name, msg, storage)
 
 
-def log_risk(name: str, message: str) -> None:
+def log_risk(name: str, message: str, storage: Storage | None = None) -> None:
     """Log a risk-related incident for the given agent."""
-    write_log(name.lower(), "risk", message)
+    write_log(name, "risk", message, storage)
 
 
-def log_audit(name: str, message: str) -> None:
+def log_audit(name: str, message: str, storage: Storage | None = None) -> None:
     """Log an audit trail message for the given agent."""
-    write_log(name.lower(), "audit", message)
+    write_log(name, "audit", message, storage)
@@ -0,0 +1,53 @@
+"""
+Scheduled mark-to-market: records every account's portfolio value in its time series.
+
+Reading an account report has no side effects, so this job is what feeds the
+portfolio value charts on the dashboard. Each run takes one price snapshot for
+every symbol held, values all accounts in a single pass over a symbol to holders
+index, and appends the points in one transaction.
+"""
+
+from collections import defaultdict
+
+from clock import now
+from storage import get_storage
+from market import get_share_prices
+
+
+def value_accounts(positions: list[tuple], prices: dict[str, float]) -> dict[str, float]:
+    """Value each account as its cash plus its holdings at the given prices.
+
+    Args:
+        positions: Tuples of (name, balance, symbol, quantity), as from read_positions.
+        prices: The price of each symbol held; unknown symbols are valued at 0.
+
+    Returns:
+        The portfolio value of each account name.
+    """
+    values = {}
+    holders = defaultdict(list)
+    for name, balance, symbol, quantity in positions:
+        values[name] = balance
+        if symbol:
+            holders[symbol].append((name, quantity))
+    for symbol, positions in holders.items():
+        price = prices.get(symbol, 0.0)
+        for name, quantity in positions:
+            values[name] += quantity * price
+    return values
+
+
+def mark_to_market() -> dict[str, float]:
+    """Value every account against one batch of prices and record the results.
+
+    Returns:
+        The recorded portfolio value for each account name.
+    """
+    storage = get_storage()
+    positions = storage.read_positions()
+    symbols = sorted({symbol for _, _, symbol, _ in positions if symbol})
+    prices = get_share_prices(symbols) if symbols else {}
+    values = value_accounts(positions, prices)
+    timestamp = now().strftime("%Y-%m-%d %H:%M:%S")
+    storage.write_portfolio_values([(name, timestamp, value) for name, value in values.items()])
+    return values
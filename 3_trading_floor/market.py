@@ -1,10 +1,18 @@
 from polygon import RESTClient
 from dotenv import load_dotenv
+import asyncio
 import os
 import random
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict
-from database import write_market, read_market
+from typing import Callable, Iterable, Protocol
+from storage import get_storage
+from price_snapshot import PriceSnapshot, snapshot_path
+from price_bus import PolygonTradeFeed, price_bus
+from simulator import MarketSimulator
 from functools import lru_cache
 from logger import log_exception
 import time
@@ -17,16 +25,265 @@ polygon_plan = os.getenv("POLYGON_PLAN")
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
-# simple in-memory cache of latest successful prices
-price_cache: Dict[str, float] = {}
+# Where prices come from: "polygon", or "simulated" for a seeded synthetic market, which is
+# only ever used when asked for. Without an API key Polygon serves cached prices only.
+PRICE_PROVIDER = os.getenv("PRICE_PROVIDER", "polygon")
+SIMULATOR_SEED = int(os.getenv("SIMULATOR_SEED", "0"))
+SIMULATOR_TICK_RATE = float(os.getenv("SIMULATOR_TICK_RATE", "1"))
+# The symbols the simulator trades; it has no price for any other
+SIMULATOR_SYMBOLS = os.getenv(
+    "SIMULATOR_SYMBOLS",
+    "AAPL,MSFT,NVDA,AMZN,GOOGL,GOOG,META,TSLA,BRK.B,AVGO,JPM,LLY,V,UNH,XOM,MA,JNJ,PG,HD,COST,"
+    "ABBV,MRK,CVX,KO,PEP,WMT,BAC,NFLX,AMD,ADBE,CRM,ORCL,INTC,DIS,SPY,QQQ",
+).split(",")
+
+POLYGON_BASE_URL = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io")
+POLYGON_CONNECT_TIMEOUT = float(os.getenv("POLYGON_CONNECT_TIMEOUT", "5"))
+POLYGON_READ_TIMEOUT = float(os.getenv("POLYGON_READ_TIMEOUT", "10"))
+# Kept-alive connections per host; concurrent callers beyond this open short-lived extras
+POLYGON_POOL_SIZE = int(os.getenv("POLYGON_POOL_SIZE", "4"))
+
+# Seconds a fetched price is served without asking Polygon again, by plan: end of day
+# closes change once a day, the 15-minute delayed snapshot every minute
+PRICE_TTL_BY_PLAN = {"eod": 3600.0, "paid": 60.0, "realtime": 1.0, "simulated": 1.0}
+if PRICE_PROVIDER == "simulated":
+    price_plan = "simulated"
+else:
+    price_plan = "realtime" if is_realtime_polygon else "paid" if is_paid_polygon else "eod"
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", PRICE_TTL_BY_PLAN[price_plan]))
+PRICE_CACHE_SIZE = int(os.getenv("PRICE_CACHE_SIZE", "5000"))
+# When Polygon fails, cached prices up to this many seconds old are served instead
+PRICE_CACHE_MAX_STALE = float(os.getenv("PRICE_CACHE_MAX_STALE", "86400"))
+# First delay between async retries, doubling on each further attempt
+PRICE_RETRY_BACKOFF = float(os.getenv("PRICE_RETRY_BACKOFF", "0.1"))
+
+# Stream trades over Polygon's websocket instead of polling, by default on the realtime plan
+PRICE_STREAM = os.getenv("PRICE_STREAM", str(is_realtime_polygon)).strip().lower() == "true"
+POLYGON_STREAM_HOST = os.getenv("POLYGON_STREAM_HOST", "socket.polygon.io" if is_realtime_polygon else "delayed.polygon.io")
+# A streamed trade is served as the current price for this many seconds after it arrived
+PRICE_STREAM_MAX_AGE = float(os.getenv("PRICE_STREAM_MAX_AGE", "300"))
+# Streamed trades are written to the shared price snapshot at most this often
+PRICE_STREAM_SHARE_INTERVAL = float(os.getenv("PRICE_STREAM_SHARE_INTERVAL", "1"))
+
+
+class PriceCache(MutableMapping):
+    """
+    A bounded LRU cache of share prices that remembers when each price was fetched.
+
+    ``fresh`` serves prices younger than ``ttl`` seconds and ``stale`` those younger
+    than ``max_stale``, the fallback when a fetch fails; both count hits and misses
+    and the age of what they served. Indexing returns a price whatever its age.
+    """
+
+    def __init__(self, maxsize: int = PRICE_CACHE_SIZE, ttl: float = PRICE_CACHE_TTL,
+                 max_stale: float = PRICE_CACHE_MAX_STALE, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = self.stale_hits = self.evictions = 0
+        self._served_age = 0.0
+        self.max_age_served = 0.0
+
+    def __getitem__(self, symbol: str) -> float:
+        return self._entries[symbol][0]
+
+    def __setitem__(self, symbol: str, price: float) -> None:
+        with self._lock:
+            self._entries[symbol] = (price, self.clock())
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __delitem__(self, symbol: str) -> None:
+        with self._lock:
+            del self._entries[symbol]
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def copy(self) -> dict[str, float]:
+        return {symbol: price for symbol, (price, _) in list(self._entries.items())}
+
+    def age(self, symbol: str) -> float | None:
+        """Seconds since the symbol's price was fetched, or None if it is not cached."""
+        entry = self._entries.get(symbol)
+        return None if entry is None else self.clock() - entry[1]
+
+    def _serve(self, symbols: Iterable[str], max_age: float) -> dict[str, float]:
+        now = self.clock()
+        prices = {}
+        with self._lock:
+            for symbol in symbols:
+                entry = self._entries.get(symbol)
+                if entry is None or now - entry[1] > max_age:
+                    continue
+                self._entries.move_to_end(symbol)
+                prices[symbol] = entry[0]
+                age = now - entry[1]
+                self._served_age += age
+                self.max_age_served = max(self.max_age_served, age)
+        return prices
+
+    def fresh(self, symbols: Iterable[str]) -> dict[str, float]:
+        """The cached prices of the symbols that are younger than the TTL."""
+        symbols = list(symbols)
+        prices = self._serve(symbols, self.ttl)
+        with self._lock:
+            self.hits += len(prices)
+            self.misses += len(symbols) - len(prices)
+        return prices
+
+    def stale(self, symbols: Iterable[str]) -> dict[str, float]:
+        """The cached prices of the symbols that are no older than ``max_stale``, for when a fetch failed."""
+        prices = self._serve(symbols, self.max_stale)
+        with self._lock:
+            self.stale_hits += len(prices)
+        return prices
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counts, and the mean and maximum age in seconds of the prices served."""
+        served = self.hits + self.stale_hits
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "mean_age_served": self._served_age / served if served else 0.0,
+            "max_age_served": self.max_age_served,
+        }
+
+
+# the latest fetched prices, served while fresh and as a fallback when Polygon fails
+price_cache = PriceCache()
+
+_polygon_client: RESTClient | None = None
+_polygon_client_lock = threading.Lock()
+
+def get_polygon_client() -> RESTClient:
+    """The process-wide Polygon client, whose HTTPS connections are kept alive and reused across calls."""
+    global _polygon_client
+    if _polygon_client is None:
+        with _polygon_client_lock:
+            if _polygon_client is None:
+                client = RESTClient(polygon_api_key, connect_timeout=POLYGON_CONNECT_TIMEOUT,
+                                    read_timeout=POLYGON_READ_TIMEOUT, base=POLYGON_BASE_URL)
+                client.client.connection_pool_kw["maxsize"] = POLYGON_POOL_SIZE
+                _polygon_client = client
+    return _polygon_client
+
+def close_polygon_client() -> None:
+    """Close the shared client's connections; the next call opens a new client."""
+    global _polygon_client
+    with _polygon_client_lock:
+        client, _polygon_client = _polygon_client, None
+    if client is not None:
+        client.client.clear()
+
+def polygon_client_stats() -> dict:
+    """Requests made by the shared client, and how many of them reused an open connection."""
+    connections = requests = 0
+    if _polygon_client is not None:
+        pools = _polygon_client.client.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests += pool.num_requests
+    return {"connections": connections, "requests": requests, "reused": requests - connections}
+
+# called with every batch of fresh prices fetched by get_share_prices
+price_listeners: list[Callable[[dict[str, float]], None]] = []
+
+def add_price_listener(listener: Callable[[dict[str, float]], None]) -> None:
+    """Call ``listener`` with each new batch of prices, e.g. to trigger resting orders."""
+    if listener not in price_listeners:
+        price_listeners.append(listener)
+
+def _publish_prices(prices: dict[str, float]) -> None:
+    for listener in list(price_listeners):
+        try:
+            listener(prices)
+        except Exception as e:
+            log_exception("market", e, "Price listener error")
+
+price_stream: PolygonTradeFeed | None = None
+_stream_subscriptions: list[Callable[[], None]] = []
+_streamed: dict[str, float] = {}
+_streamed_shared_at = 0.0
+
+def _share_streamed_prices(prices: dict[str, float]) -> None:
+    """Collect streamed trades, sharing them with other processes at most every PRICE_STREAM_SHARE_INTERVAL seconds."""
+    global _streamed_shared_at
+    _streamed.update(prices)
+    if time.monotonic() - _streamed_shared_at >= PRICE_STREAM_SHARE_INTERVAL:
+        _streamed_shared_at = time.monotonic()
+        batch = dict(_streamed)
+        _streamed.clear()
+        _share_prices(batch)
+
+def start_price_stream(symbols: Iterable[str] = ()) -> PolygonTradeFeed | None:
+    """Stream trades from Polygon into ``price_bus``, so prices are pushed rather than polled.
+
+    Every symbol priced afterwards is streamed too. Each batch of trades reaches the
+    price listeners, and is shared with the other processes through the price snapshot.
+    Returns the feed, or None without an API key or when prices come from another provider.
+    """
+    global price_stream
+    if not polygon_api_key or not isinstance(get_price_provider(), PolygonProvider):
+        return None
+    if price_stream is None:
+        price_stream = PolygonTradeFeed(polygon_api_key, price_bus, POLYGON_STREAM_HOST, symbols=symbols).start()
+        _stream_subscriptions.append(price_bus.subscribe(_publish_prices))
+        _stream_subscriptions.append(price_bus.subscribe(_share_streamed_prices))
+    else:
+        price_stream.watch(symbols)
+    return price_stream
+
+def stop_price_stream() -> None:
+    global price_stream
+    stream, price_stream = price_stream, None
+    while _stream_subscriptions:
+        _stream_subscriptions.pop()()
+    if stream is not None:
+        stream.stop()
+
+def price_snapshot_id() -> str:
+    """Identify the prices get_share_prices currently serves.
+
+    End of day prices change once a day and the delayed snapshot every minute; realtime and
+    streamed prices, and the simulator's, move every second.
+    """
+    now = datetime.now()
+    if price_plan in ("realtime", "simulated") or PRICE_STREAM:
+        return now.strftime("%Y-%m-%d %H:%M:%S")
+    return now.strftime("%Y-%m-%d %H:%M") if is_paid_polygon else now.strftime("%Y-%m-%d")
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
+    if isinstance(get_price_provider(), MarketSimulator):
+        return True  # the simulated market trades around the clock
+    client = get_polygon_client()
     market_status = client.get_market_status()
     return market_status.market == "open"
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp/1000).date()
@@ -34,23 +291,52 @@ def get_all_share_prices_polygon_eod() -> dict[str, float]:
     results = client.get_grouped_daily_aggs(last_close, adjusted=True, include_otc=False)
     return {result.ticker: result.close for result in results}
 
+_market_load_lock = threading.Lock()
+
 @lru_cache(maxsize=2)
-def get_market_for_prior_date(today):
-    market_data = read_market(today)
-    if not market_data:
-        market_data = get_all_share_prices_polygon_eod()
-        write_market(today, market_data)
-    return market_data
+def load_market_for_prior_date(today) -> None:
+    """Make sure the prior day's closes are stored under ``today``, fetching them once if not.
+
+    Threads asking for the same date at once wait for the first one's fetch.
+    """
+    with _market_load_lock:
+        storage = get_storage()
+        if not storage.has_market(today):
+            closes = get_all_share_prices_polygon_eod()
+            storage.write_market(today, closes)
+            _share_prices(closes)
 
 def get_share_price_polygon_eod(symbol) -> float:
     today = datetime.now().date().strftime("%Y-%m-%d")
-    market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    load_market_for_prior_date(today)
+    return get_storage().read_market_price(today, symbol) or 0.0
+
+def get_share_prices_polygon_eod(symbols: list[str]) -> dict[str, float]:
+    today = datetime.now().date().strftime("%Y-%m-%d")
+    load_market_for_prior_date(today)
+    return get_storage().read_market_prices(today, symbols)
+
+def _snapshot_price(result) -> float | None:
+    """The latest price in a ticker snapshot: the last minute's close, else the last trade, else the day's close.
+
+    Illiquid tickers, and every ticker just after the snapshot resets each day, have no minute bar.
+    """
+    for price in (result.min and result.min.close, result.last_trade and result.last_trade.price,
+                  result.day and result.day.close):
+        if price:
+            return price
+    return None
 
 def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
     result = client.get_snapshot_ticker("stocks", symbol)
-    return result.min.close
+    return _snapshot_price(result) or 0.0
+
+def get_share_prices_polygon_min(symbols: list[str]) -> dict[str, float]:
+    """Snapshot prices of the symbols in one request; tickers with no price yet are left out rather than failing the batch."""
+    client = get_polygon_client()
+    results = client.get_snapshot_all("stocks", tickers=symbols)
+    return {result.ticker: price for result in results if (price := _snapshot_price(result)) is not None}
 
 def get_share_price_polygon(symbol) -> float:
     if is_paid_polygon:
@@ -58,37 +344,244 @@ def get_share_price_polygon(symbol) -> float:
     else:
         return get_share_price_polygon_eod(symbol)
 
+def get_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    if is_paid_polygon:
+        return get_share_prices_polygon_min(symbols)
+    else:
+        return get_share_prices_polygon_eod(symbols)
+
+
+class PriceProvider(Protocol):
+    """Where get_share_price(s) fetch the prices they do not already have; unknown symbols may be left out."""
+
+    def get_price(self, symbol: str) -> float: ...
+
+    def get_prices(self, symbols: list[str]) -> dict[str, float]: ...
+
+
+class PolygonProvider:
+    """Prices from Polygon: the prior day's closes, or the 15-minute delayed snapshot on a paid plan."""
+
+    def get_price(self, symbol: str) -> float:
+        return get_share_price_polygon(symbol)
+
+    def get_prices(self, symbols: list[str]) -> dict[str, float]:
+        return get_share_prices_polygon(symbols)
+
+
+def create_price_provider(kind: str) -> PriceProvider:
+    """
+    Build a price provider.
+
+    Args:
+        kind (str): "polygon" or "simulated"
+
+    Returns:
+        PriceProvider: The new provider; the simulator is seeded with SIMULATOR_SEED, ticks at
+        SIMULATOR_TICK_RATE and trades SIMULATOR_SYMBOLS
+    """
+    if kind == "polygon":
+        return PolygonProvider()
+    if kind == "simulated":
+        return MarketSimulator(seed=SIMULATOR_SEED, tick_rate=SIMULATOR_TICK_RATE, symbols=SIMULATOR_SYMBOLS)
+    raise ValueError(f"Unknown price provider {kind!r}; expected 'polygon' or 'simulated'.")
+
+def price_source(kind: str) -> str:
+    """Name the prices a kind of provider serves; the simulator's depend on its seed and tick rate."""
+    return f"simulated.{SIMULATOR_SEED}.{SIMULATOR_TICK_RATE:g}" if kind == "simulated" else kind
+
+# The snapshot shared by every process on the host that prices from the same configured source
+shared_prices = PriceSnapshot(snapshot_path(price_source(PRICE_PROVIDER)))
+# Stands in for it while a provider set in this process is in use, whose prices are its own
+_unshared_prices = PriceSnapshot(None)
+
+_price_provider: PriceProvider | None = None
+
+@lru_cache(maxsize=None)
+def _configured_price_provider(kind: str) -> PriceProvider:
+    return create_price_provider(kind)
+
+def get_price_provider() -> PriceProvider | None:
+    """The process-wide price provider: the one set, else the PRICE_PROVIDER one.
+
+    None when that is Polygon without an API key, in which case only cached prices are served.
+    """
+    if _price_provider is not None:
+        return _price_provider
+    if PRICE_PROVIDER == "polygon" and not polygon_api_key:
+        return None
+    return _configured_price_provider(PRICE_PROVIDER)
+
+def set_price_provider(provider: PriceProvider | None) -> None:
+    """Replace the process-wide price provider; None goes back to the configured one."""
+    global _price_provider
+    _price_provider = provider
+
+@contextmanager
+def use_price_provider(provider: PriceProvider):
+    """Make ``provider`` the process-wide price provider for the enclosed block."""
+    previous = _price_provider
+    set_price_provider(provider)
+    try:
+        yield provider
+    finally:
+        set_price_provider(previous)
+
+def _shared_snapshot() -> PriceSnapshot:
+    """The host-wide price snapshot, or a disabled one while a provider set in this process is in use."""
+    return shared_prices if _price_provider is None else _unshared_prices
+
+
+def _fresh_prices(symbols: list[str]) -> dict[str, float]:
+    """Current prices without a fetch: streamed trades, else prices younger than the cache TTL from
+    this process's cache or the snapshot shared by all processes. Symbols with none start streaming."""
+    prices = price_bus.last(symbols, PRICE_STREAM_MAX_AGE)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(price_cache.fresh(missing))
+        missing = [symbol for symbol in missing if symbol not in prices]
+    if missing:
+        prices.update(_shared_snapshot().fresh(missing, price_cache.ttl))
+    if price_stream is not None:
+        price_stream.watch(symbol for symbol in symbols if symbol not in prices)
+    return prices
+
+def _share_prices(prices: dict[str, float]) -> None:
+    """Publish fetched prices to the other processes; if that fails they just fetch the prices themselves."""
+    try:
+        _shared_snapshot().publish(prices)
+    except Exception as e:
+        log_exception("market", e, "Price snapshot error")
+
+def _stale_prices(symbols: list[str]) -> dict[str, float]:
+    """Prices no older than PRICE_CACHE_MAX_STALE, from this process's cache or else the shared snapshot."""
+    prices = price_cache.stale(symbols)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(_shared_snapshot().fresh(missing, price_cache.max_stale))
+    return prices
 
 def _get_cached_price(symbol: str) -> float:
-    """Return the last known price for ``symbol`` from memory or today's DB."""
-    if symbol in price_cache:
-        return price_cache[symbol]
+    """Return the last known price for ``symbol``: a stale cached price, else today's stored close, else 0.0."""
+    cached = _stale_prices([symbol])
+    if cached:
+        return cached[symbol]
 
     today = datetime.now().date().strftime("%Y-%m-%d")
-    market_data = read_market(today)
-    if market_data:
-        price = market_data.get(symbol)
-        if price is not None:
-            price_cache[symbol] = price
-            return price
-    return 0.0
+    price = get_storage().read_market_price(today, symbol)
+    return 0.0 if price is None else price
+
+def _get_cached_prices(symbols: list[str]) -> dict[str, float]:
+    """Return the last known price of each symbol from stale cached prices or today's DB, 0.0 if unknown."""
+    prices = _stale_prices(symbols)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        today = datetime.now().date().strftime("%Y-%m-%d")
+        prices.update(get_storage().read_market_prices(today, missing))
+    return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
 
 def get_share_price(symbol, retries: int = 2) -> float:
     """Return the latest share price for ``symbol``.
 
-    Attempts to fetch the price from Polygon up to ``retries`` + 1 times
-    before falling back to cached data. Any exceptions raised by the API are
-    logged for monitoring.
+    A streamed trade, or a price fetched within the cache TTL by this or any
+    other process on the host, is served without asking the price provider.
+    Otherwise it is fetched up to ``retries`` + 1 times before falling back to a
+    stale cached price, no older than PRICE_CACHE_MAX_STALE, or today's stored
+    close. Any exceptions raised by the provider are logged for monitoring.
     """
-    if polygon_api_key:
-
+    cached = _fresh_prices([symbol])
+    if cached:
+        return cached[symbol]
+    provider = get_price_provider()
+    if provider is not None:
         for attempt in range(retries + 1):
             try:
-                price = get_share_price_polygon(symbol)
+                price = provider.get_price(symbol)
                 price_cache[symbol] = price
+                _share_prices({symbol: price})
                 return price
             except Exception as e:
-                log_exception("market", e, "Polygon API error")
+                log_exception("market", e, "Price provider error")
                 if attempt < retries:
                     time.sleep(0.1)
     return _get_cached_price(symbol)
+
+
+def get_share_prices(symbols, retries: int = 2) -> dict[str, float]:
+    """Return the latest share price of each of ``symbols``.
+
+    Streamed trades and fresh cached prices, including those other processes
+    fetched, are served as they are, and the rest are fetched from the price
+    provider in one batch. Unknown symbols map to 0.0, as with ``get_share_price``.
+    Failures are retried and logged the same way, then fall back to cached data.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    prices = _fresh_prices(symbols)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    provider = get_price_provider() if missing else None
+    if provider is not None:
+        for attempt in range(retries + 1):
+            try:
+                fetched = provider.get_prices(missing)
+                price_cache.update(fetched)
+                _share_prices(fetched)
+                _publish_prices(fetched)
+                prices.update(fetched)
+                return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+            except Exception as e:
+                log_exception("market", e, "Price provider error")
+                if attempt < retries:
+                    time.sleep(0.1)
+    if missing:
+        prices.update(_get_cached_prices(missing))
+    return {symbol: prices[symbol] for symbol in symbols}
+
+
+# Batches being fetched, by event loop and symbol; callers wanting a symbol already
+# in flight await that batch instead of starting their own request
+_in_flight: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+async def _fetch_prices(symbols: list[str], retries: int) -> dict[str, float]:
+    """Fetch the symbols in one batch off the event loop, backing off between attempts without blocking it."""
+    provider = get_price_provider()
+    if provider is not None:
+        for attempt in range(retries + 1):
+            try:
+                fetched = await asyncio.to_thread(provider.get_prices, symbols)
+                price_cache.update(fetched)
+                await asyncio.to_thread(_share_prices, fetched)
+                _publish_prices(fetched)
+                return {symbol: fetched.get(symbol, 0.0) for symbol in symbols}
+            except Exception as e:
+                log_exception("market", e, "Price provider error")
+                if attempt < retries:
+                    await asyncio.sleep(PRICE_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+    return await asyncio.to_thread(_get_cached_prices, symbols)
+
+async def get_share_prices_async(symbols, retries: int = 2) -> dict[str, float]:
+    """Return the latest share price of each of ``symbols`` without blocking the event loop.
+
+    Like ``get_share_prices``, fresh cached prices are served as they are and the
+    rest are fetched in one batch. Concurrent callers share fetches: a symbol that
+    is already being fetched is awaited rather than requested again.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    prices = _fresh_prices(symbols)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        loop = asyncio.get_running_loop()
+        new = [symbol for symbol in missing if (loop, symbol) not in _in_flight]
+        if new:
+            batch = asyncio.ensure_future(_fetch_prices(new, retries))
+            for symbol in new:
+                _in_flight[loop, symbol] = batch
+            batch.add_done_callback(lambda _: [_in_flight.pop((loop, symbol), None) for symbol in new])
+        for batch in {_in_flight[loop, symbol] for symbol in missing}:
+            prices.update(await asyncio.shield(batch))
+    return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+async def get_share_price_async(symbol, retries: int = 2) -> float:
+    """Return the latest share price for ``symbol`` without blocking the event loop; see ``get_share_prices_async``."""
+    return (await get_share_prices_async([symbol], retries))[symbol]
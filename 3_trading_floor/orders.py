@@ -0,0 +1,201 @@
+"""
+Resting limit, stop-loss and take-profit orders.
+
+Orders are persisted in the resting_orders table and indexed in memory per symbol,
+in two heaps keyed on trigger price: orders that fire when the price falls to their
+trigger, and orders that fire when it rises to it. Each batch of prices only pops the
+orders whose trigger has been crossed, so a tick costs O(log n) per triggered order
+however many orders are resting.
+"""
+
+import heapq
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Literal
+
+from pydantic import BaseModel
+
+from accounts import Account, Order, MAX_ORDER_SIZE
+from database import VersionConflictError
+from storage import get_storage
+from market import get_share_prices
+from logger import log_exception, log_risk
+from clock import now
+
+
+class RestingOrder(BaseModel):
+    id: int = 0
+    name: str
+    side: Literal["buy", "sell"]
+    symbol: str
+    quantity: int
+    order_type: Literal["limit", "stop_loss", "take_profit"]
+    trigger_price: float
+    rationale: str
+    created: str = ""
+
+    @property
+    def fires_below(self) -> bool:
+        """Whether the order fires when the price falls to its trigger, rather than rises to it."""
+        return (self.order_type, self.side) in {("limit", "buy"), ("stop_loss", "sell")}
+
+    def __str__(self) -> str:
+        return f"#{self.id} {self.order_type} {self.side} {self.quantity} {self.symbol} at {self.trigger_price}"
+
+
+class OrderBook:
+    """An in-memory trigger index over the resting orders in the database."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.orders: dict[int, RestingOrder] = {}
+        # Per symbol: max-heap of (-trigger, id) firing at or below, min-heap of (trigger, id) firing at or above
+        self.below: dict[str, list[tuple[float, int]]] = defaultdict(list)
+        self.above: dict[str, list[tuple[float, int]]] = defaultdict(list)
+        self.last_id = 0
+
+    def add(self, order: RestingOrder):
+        with self.lock:
+            self._add(order)
+
+    def _add(self, order: RestingOrder):
+        self.orders[order.id] = order
+        self.last_id = max(self.last_id, order.id)
+        if order.fires_below:
+            heapq.heappush(self.below[order.symbol], (-order.trigger_price, order.id))
+        else:
+            heapq.heappush(self.above[order.symbol], (order.trigger_price, order.id))
+
+    def remove(self, order_id: int):
+        """Forget an order; its heap entries are skipped when they surface."""
+        with self.lock:
+            self.orders.pop(order_id, None)
+
+    def sync(self):
+        """Index orders placed since the last sync, including by other processes."""
+        rows = get_storage().read_resting_orders(after_id=self.last_id)
+        with self.lock:
+            for row in rows:
+                self._add(RestingOrder(**row))
+
+    def symbols(self) -> list[str]:
+        with self.lock:
+            return sorted({order.symbol for order in self.orders.values()})
+
+    def triggered(self, prices: dict[str, float]) -> list[RestingOrder]:
+        """Remove and return the orders whose trigger the prices have crossed, oldest first."""
+        fired = []
+        with self.lock:
+            for symbol, price in prices.items():
+                if not price or price <= 0:
+                    continue
+                below, above = self.below.get(symbol), self.above.get(symbol)
+                while below and -below[0][0] >= price:
+                    fired.append(self.orders.pop(heapq.heappop(below)[1], None))
+                while above and above[0][0] <= price:
+                    fired.append(self.orders.pop(heapq.heappop(above)[1], None))
+        return sorted((order for order in fired if order), key=lambda order: order.id)
+
+    def on_prices(self, prices: dict[str, float]):
+        """Fill every resting order triggered by a new batch of prices."""
+        self.sync()
+        fill_triggered(self.triggered(prices), prices, self)
+
+
+order_book = OrderBook()
+
+
+def fill_order(order: RestingOrder, prices: dict[str, float], book: "OrderBook | None" = None) -> bool:
+    """Execute a triggered order at the batch's price, unless it was filled or cancelled elsewhere.
+
+    Removing the order and filling it happen in one transaction, so each order fills at most once
+    across processes. Prices are fetched before it begins, so the write lock is never held over a
+    fetch. An order that can no longer be filled is dropped and logged as a risk event; one that
+    lost a race with another writer is put back in ``book`` to fire on a later batch.
+    """
+    market_order = Order(side=order.side, symbol=order.symbol, quantity=order.quantity,
+                         rationale=f"{order.order_type.replace('_', ' ')} at {order.trigger_price}: {order.rationale}")
+    storage = get_storage()
+    # Price the order and every holding first: nothing inside the transaction may wait on the network
+    prices = dict(prices)
+    missing = [s for s in (order.symbol, *Account.get(order.name, storage).holdings) if s not in prices]
+    if missing:
+        prices.update(get_share_prices(missing))
+    try:
+        with storage.transaction():
+            if not storage.delete_resting_order(order.id):
+                return False
+            account = Account.get(order.name, storage)
+            if any(symbol not in prices for symbol in account.holdings):
+                raise VersionConflictError(f"Account {order.name} bought new holdings while the order was priced")
+            account.fill_orders([market_order], prices)
+        return True
+    except ValueError as e:
+        storage.delete_resting_order(order.id)
+        log_risk(order.name, f"Resting order {order} cancelled: {e}", storage)
+        return False
+    except (VersionConflictError, sqlite3.OperationalError) as e:
+        # The account was saved elsewhere or the database was busy: the order still rests, so index it again
+        (book or order_book).add(order)
+        log_exception(order.name, e, f"Resting order {order} not filled yet")
+        return False
+
+
+def fill_triggered(triggered: list[RestingOrder], prices: dict[str, float], book: "OrderBook | None" = None) -> int:
+    """Fill each triggered order on its own, so a failure neither loses the order nor skips the rest.
+
+    Returns:
+        int: How many orders were filled
+    """
+    book = book or order_book
+    filled = 0
+    for order in triggered:
+        try:
+            filled += fill_order(order, prices, book)
+        except Exception as e:
+            book.add(order)
+            log_exception(order.name, e, f"Resting order {order} not filled")
+    return filled
+
+
+def place_order(name: str, side: str, symbol: str, quantity: int, order_type: str, trigger_price: float, rationale: str) -> RestingOrder:
+    """Validate and store a resting order, and add it to the trigger index."""
+    order = RestingOrder(name=name.lower(), side=side, symbol=symbol, quantity=quantity, order_type=order_type,
+                         trigger_price=trigger_price, rationale=rationale, created=now().strftime("%Y-%m-%d %H:%M:%S"))
+    if order.order_type != "limit" and order.side != "sell":
+        raise ValueError("Stop-loss and take-profit orders must be sells.")
+    if order.quantity <= 0:
+        raise ValueError("Quantity must be positive.")
+    if order.quantity > MAX_ORDER_SIZE:
+        raise ValueError(f"Order size exceeds maximum of {MAX_ORDER_SIZE} shares.")
+    if order.trigger_price <= 0:
+        raise ValueError("Trigger price must be positive.")
+    if order.side == "sell" and Account.get(name).holdings.get(symbol, 0) < quantity:
+        raise ValueError(f"Cannot place a sell of {quantity} shares of {symbol}. Not enough shares held.")
+    order.id = get_storage().write_resting_order(order.model_dump())
+    order_book.add(order)
+    return order
+
+
+def cancel_order(name: str, order_id: int) -> bool:
+    """Cancel one of the account's resting orders. Returns False if it had already filled or been cancelled."""
+    if not get_storage().delete_resting_order(order_id, name):
+        return False
+    order_book.remove(order_id)
+    return True
+
+
+def list_orders(name: str) -> list[RestingOrder]:
+    """The account's resting orders, oldest first."""
+    return [RestingOrder(**row) for row in get_storage().read_resting_orders(name)]
+
+
+def check_resting_orders() -> int:
+    """Price every symbol with resting orders in one batch and fill those triggered. Returns the number filled."""
+    order_book.sync()
+    symbols = order_book.symbols()
+    if not symbols:
+        return 0
+    prices = get_share_prices(symbols)
+    return fill_triggered(order_book.triggered(prices), prices)
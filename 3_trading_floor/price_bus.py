@@ -0,0 +1,160 @@
+"""
+A price bus: trades streamed from a feed, pushed to whoever is interested.
+
+A feed, such as Polygon's websocket of trades, publishes batches of last-trade
+prices to the bus. The bus keeps the last trade of every symbol, so valuations
+can read current prices without a network call, and pushes each batch to its
+subscribers, such as the resting order book and the shared price snapshot.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Iterable
+
+from polygon import WebSocketClient
+from polygon.websocket.models import EquityTrade
+
+from logger import log_exception
+
+Subscriber = Callable[[dict[str, float]], None]
+
+
+class PriceBus:
+    """A last-trade table of streamed prices, and the subscribers each new batch is pushed to."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last: dict[str, tuple[float, float]] = {}
+        self._subscribers: list[tuple[Subscriber, frozenset[str] | None]] = []
+        self.ticks = 0
+
+    def subscribe(self, subscriber: Subscriber, symbols: Iterable[str] | None = None) -> Callable[[], None]:
+        """Push each batch of prices to ``subscriber``, only those of ``symbols`` if given.
+
+        Returns:
+            A function that unsubscribes it
+        """
+        entry = (subscriber, None if symbols is None else frozenset(symbols))
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def publish(self, prices: dict[str, float]) -> None:
+        """Record a batch of trades as the last prices of their symbols and push it to the subscribers."""
+        if not prices:
+            return
+        now = self.clock()
+        with self._lock:
+            self._last.update((symbol, (price, now)) for symbol, price in prices.items())
+            self.ticks += len(prices)
+            subscribers = list(self._subscribers)
+        for subscriber, symbols in subscribers:
+            batch = prices if symbols is None else {s: p for s, p in prices.items() if s in symbols}
+            if batch:
+                try:
+                    subscriber(batch)
+                except Exception as e:
+                    log_exception("price_bus", e, "Price subscriber error")
+
+    def last(self, symbols: Iterable[str], max_age: float | None = None) -> dict[str, float]:
+        """The last traded price of each of the symbols that has traded, within ``max_age`` seconds if given."""
+        now = self.clock()
+        with self._lock:
+            entries = [(symbol, self._last.get(symbol)) for symbol in symbols]
+        return {
+            symbol: entry[0] for symbol, entry in entries
+            if entry and (max_age is None or now - entry[1] <= max_age)
+        }
+
+    def symbols(self) -> list[str]:
+        with self._lock:
+            return sorted(self._last)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._last.clear()
+
+
+# The bus of this process
+price_bus = PriceBus()
+
+
+class PolygonTradeFeed:
+    """
+    Streams trades of the watched symbols from Polygon's websocket into a price bus.
+
+    The websocket runs on its own event loop in a daemon thread, and reconnects
+    after network errors. Polygon allows one socket per key by default, so one
+    process per host should run the feed and share what it receives.
+    """
+
+    def __init__(self, api_key: str, bus: PriceBus = price_bus, host: str = "socket.polygon.io",
+                 secure: bool = True, symbols: Iterable[str] = ()):
+        symbols = list(symbols)
+        self.bus = bus
+        self.client = WebSocketClient(api_key, feed=host, secure=secure,
+                                      subscriptions=[f"T.{symbol}" for symbol in symbols])
+        self.watched = set(symbols)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    async def _on_messages(self, messages: list) -> None:
+        self.bus.publish({m.symbol: m.price for m in messages if isinstance(m, EquityTrade) and m.price})
+
+    def _run(self) -> None:
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            log_exception("price_bus", e, "Price stream stopped")
+        finally:
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    async def _close(self) -> None:
+        await self.client.close()
+        # Still connecting or waiting to reconnect
+        self._task.cancel()
+
+    def start(self) -> "PolygonTradeFeed":
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self.client.connect(self._on_messages))
+        self._thread = threading.Thread(target=self._run, name="price-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def watch(self, symbols: Iterable[str]) -> None:
+        """Also stream trades of these symbols."""
+        new = [symbol for symbol in symbols if symbol not in self.watched]
+        if not new:
+            return
+        self.watched.update(new)
+        topics = [f"T.{symbol}" for symbol in new]
+        if self.running:
+            self._loop.call_soon_threadsafe(self.client.subscribe, *topics)
+        else:
+            self.client.subscribe(*topics)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Close the websocket and wait for the feed thread to finish."""
+        if not self.running:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop)
+        self._thread.join(timeout)
@@ -0,0 +1,206 @@
+"""
+A snapshot of share prices shared by every process on the host.
+
+The accounts and market servers of every trader each run in their own process.
+Rather than each fetching and parsing the same prices, whichever process fetches
+prices publishes them to a file, and every process maps that file read-only. Each
+source of prices has its own file, so simulated prices never reach a live floor.
+
+The file holds a header, the symbols sorted as fixed-width byte strings, and two
+float64 arrays of their prices and the time each price was fetched. A lookup is a
+binary search over the mapped symbols, with nothing to parse. Publishing writes a
+new file and renames it over the old one, so readers never see a partial snapshot;
+they notice the new file on their next lookup after ``check_interval`` seconds.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from logger import log_exception
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishers are not serialized, so concurrent merges may drop prices
+    fcntl = None
+
+# Where snapshot files are kept; each source of prices has its own file
+PRICE_SNAPSHOT_DIR = os.getenv("PRICE_SNAPSHOT_DIR", tempfile.gettempdir())
+
+MAGIC = b"PXSNAP01"
+HEADER = struct.Struct("<8sQ8x")  # magic, symbol count, padding to keep the arrays 8-byte aligned
+SYMBOL_WIDTH = 16
+SYMBOL_DTYPE = f"S{SYMBOL_WIDTH}"
+EMPTY = (np.array([], dtype=SYMBOL_DTYPE), np.array([]), np.array([]))
+
+
+def write_snapshot(path: str, prices: dict[str, float], times: dict[str, float]) -> None:
+    """
+    Atomically replace the snapshot file with the given prices.
+
+    Args:
+        path (str): The snapshot file
+        prices (dict): Price keyed by symbol; symbols longer than SYMBOL_WIDTH bytes are left out
+        times (dict): When each price was fetched, as a Unix time
+    """
+    symbols = sorted(symbol for symbol in prices if len(symbol.encode()) <= SYMBOL_WIDTH)
+    keys = np.array([symbol.encode() for symbol in symbols], dtype=SYMBOL_DTYPE)
+    values = np.array([prices[symbol] for symbol in symbols], dtype=np.float64)
+    fetched = np.array([times[symbol] for symbol in symbols], dtype=np.float64)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".prices-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(symbols)))
+            f.write(keys.tobytes())
+            f.write(values.tobytes())
+            f.write(fetched.tobytes())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def snapshot_path(source: str) -> str:
+    """The snapshot file of a source of prices, so processes only share prices from the same source."""
+    return os.path.join(PRICE_SNAPSHOT_DIR, f"trading_floor_prices.{source}.snap")
+
+
+def _map_snapshot(path: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Map a snapshot file read-only as its symbols, prices and fetch times, or EMPTY if it cannot be read as one."""
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        # Removed since it was found, or empty, which cannot be mapped
+        log_exception("price_snapshot", e, f"Price snapshot {path} unreadable")
+        return EMPTY
+    try:
+        magic, count = HEADER.unpack_from(mapped)
+        if magic != MAGIC or len(mapped) != HEADER.size + count * (SYMBOL_WIDTH + 16):
+            raise ValueError("not a price snapshot")
+    except (struct.error, ValueError) as e:
+        mapped.close()
+        log_exception("price_snapshot", e, f"Price snapshot {path} unreadable")
+        return EMPTY
+    # The arrays share the mapping, which closes when the last of them is dropped
+    offset = HEADER.size
+    symbols = np.frombuffer(mapped, dtype=SYMBOL_DTYPE, count=count, offset=offset)
+    offset += count * SYMBOL_WIDTH
+    prices = np.frombuffer(mapped, dtype=np.float64, count=count, offset=offset)
+    times = np.frombuffer(mapped, dtype=np.float64, count=count, offset=offset + count * 8)
+    return symbols, prices, times
+
+
+class PriceSnapshot:
+    """
+    A read-only mapping of the shared snapshot file, remapped when a new snapshot is published.
+
+    A path of None disables the snapshot: lookups find nothing and publishing does nothing.
+    """
+
+    def __init__(self, path: str | None, check_interval: float = 0.5):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = -check_interval
+        self._identity = None
+        self._view = EMPTY
+
+    def _refresh(self) -> None:
+        """Map the snapshot file if it was replaced since it was last mapped."""
+        if time.monotonic() - self._checked < self.check_interval:
+            return
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self._view, self._identity = EMPTY, None
+                return
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if identity != self._identity:
+                self._view, self._identity = _map_snapshot(self.path), identity
+
+    def lookup(self, symbols: list[str]) -> dict[str, tuple[float, float]]:
+        """
+        Find symbols in the snapshot.
+
+        Returns:
+            dict: (price, Unix time it was fetched) keyed by symbol, for the symbols found
+        """
+        if self.path is None or not symbols:
+            return {}
+        self._refresh()
+        keys, prices, times = self._view
+        if not len(keys):
+            return {}
+        # Encoded to the mapped dtype so searchsorted compares in place rather than copying every symbol;
+        # longer symbols are never stored, and are blanked so they cannot match a truncated one
+        encoded = [symbol.encode() for symbol in symbols]
+        wanted = np.array([key if len(key) <= SYMBOL_WIDTH else b"" for key in encoded], dtype=SYMBOL_DTYPE)
+        index = np.minimum(keys.searchsorted(wanted), len(keys) - 1)
+        hits = np.flatnonzero((keys[index] == wanted) & (wanted != b""))
+        index = index[hits]
+        return dict(zip(
+            [symbols[i] for i in hits.tolist()],
+            zip(prices[index].tolist(), times[index].tolist()),
+        ))
+
+    def fresh(self, symbols: list[str], max_age: float) -> dict[str, float]:
+        """The prices of the symbols fetched no more than ``max_age`` seconds ago."""
+        now = time.time()
+        return {symbol: price for symbol, (price, fetched) in self.lookup(symbols).items() if now - fetched <= max_age}
+
+    def get(self, symbol: str) -> float | None:
+        """The symbol's price in the snapshot, whatever its age, or None."""
+        if self.path is None:
+            return None
+        self._refresh()
+        keys, prices, _ = self._view
+        key = symbol.encode()
+        if len(key) > SYMBOL_WIDTH:
+            return None
+        i = keys.searchsorted(key)
+        return prices.item(i) if i < len(keys) and keys[i] == key else None
+
+    @contextmanager
+    def _publishing(self):
+        """Hold the host-wide publish lock, so concurrent publishers merge rather than overwrite."""
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def publish(self, prices: dict[str, float]) -> None:
+        """Merge freshly fetched prices into the shared snapshot, stamped with the current time."""
+        if self.path is None or not prices:
+            return
+        with self._publishing():
+            self._checked = -self.check_interval
+            self._refresh()
+            symbols, current, fetched = self._view
+            keys = [key.decode() for key in symbols.tolist()]
+            merged = dict(zip(keys, current.tolist()))
+            times = dict(zip(keys, fetched.tolist()))
+            now = time.time()
+            merged.update(prices)
+            times.update((symbol, now) for symbol in prices)
+            write_snapshot(self.path, merged, times)
+        self._checked = -self.check_interval
+
+    def close(self) -> None:
+        """Drop the mapping; it is unmapped once no lookup still holds it."""
+        with self._lock:
+            self._view, self._identity = EMPTY, None
+
@@ -41,10 +41,10 @@ You focus your trading on crypto ETFs.
 
 
 def reset_traders():
-    Account.get("Warren").reset(waren_strategy)
-    Account.get("George").reset(george_strategy)
-    Account.get("Ray").reset(ray_strategy)
-    Account.get("Cathie").reset(cathie_strategy)
+    Account.run_with_retry("Warren", lambda account: account.reset(waren_strategy))
+    Account.run_with_retry("George", lambda account: account.reset(george_strategy))
+    Account.run_with_retry("Ray", lambda account: account.reset(ray_strategy))
+    Account.run_with_retry("Cathie", lambda account: account.reset(cathie_strategy))
 
 if __name__ == "__main__":
     reset_traders()
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+A deterministic synthetic market, so the floor runs offline and under load without Polygon.
+
+Each symbol follows a geometric Brownian motion with jumps. Part of every move comes
+from one market factor shared by all symbols, so they are correlated. Prices tick
+``tick_rate`` times a second through the UTC day and gap overnight, from a daily
+path that runs since EPOCH.
+
+Every random draw is read from its own position in a seeded stream addressed by
+symbol, day and tick. The price of a symbol at a tick therefore depends only on the
+seed, never on what was priced before, so every process with the same seed sees
+the same market.
+"""
+
+import math
+import threading
+import time
+import zlib
+from datetime import date
+from typing import Callable, Iterable
+
+import numpy as np
+
+# Seconds of trading in a year, the unit of drift and volatility
+SECONDS_PER_YEAR = 252 * 6.5 * 3600
+EPOCH = date(2024, 1, 1).toordinal()
+UNIX_EPOCH = date(1970, 1, 1).toordinal()
+
+# Stream ids; within a daily or tick stream, (0,) is the market factor and (1, symbol key) each symbol
+_BASE, _DAILY, _TICK = 1, 2, 3
+_CHUNK = 1 << 16
+
+
+class MarketSimulator:
+    """
+    A seeded synthetic market that provides prices as of its clock, like Polygon does.
+
+    Given a universe of symbols, it has no price for any other, as Polygon has none for an
+    unknown ticker. ``simulate`` produces whole blocks of ticks at once, for benchmarks and load tests.
+    """
+
+    def __init__(self, seed: int = 0, tick_rate: float = 1.0, drift: float = 0.07, volatility: float = 0.3,
+                 correlation: float = 0.5, jump_rate: float = 4.0, jump_mean: float = -0.01,
+                 jump_std: float = 0.04, clock: Callable[[], float] = time.time,
+                 symbols: Iterable[str] | None = None):
+        """
+        Args:
+            seed (int): Selects the market; the same seed always gives the same prices
+            tick_rate (float): Ticks per second
+            drift (float): Annual drift of every symbol
+            volatility (float): Typical annual volatility; each symbol gets between half and one and a half times it
+            correlation (float): Share of each move's variance that comes from the market factor
+            jump_rate (float): Expected jumps per symbol per year
+            jump_mean (float): Mean jump in log price
+            jump_std (float): Standard deviation of a jump in log price
+            clock (callable): The current Unix time
+            symbols (iterable): The symbols traded; any symbol if None
+        """
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.drift = drift
+        self.volatility = volatility
+        self.correlation = correlation
+        self.jump_rate = jump_rate
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+        self.clock = clock
+        self.symbols = None if symbols is None else frozenset(symbols)
+        self._lock = threading.Lock()
+        # Per symbol: the day, tick and log price of the last price served, and its volatility
+        self._state: dict[str, tuple[int, int, float, float]] = {}
+
+    def _uniforms(self, key: tuple[int, ...], start: int, n: int) -> np.ndarray:
+        """Draws ``start`` to ``start + n`` of the stream identified by ``key``."""
+        bitgen = np.random.PCG64(np.random.SeedSequence([self.seed, *key]))
+        bitgen.advance(start)
+        return np.random.Generator(bitgen).random(n)
+
+    @staticmethod
+    def _key(symbol: str) -> int:
+        return zlib.crc32(symbol.encode())
+
+    def _base(self, symbols: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Each symbol's log price at EPOCH, between 10 and 500, and its volatility."""
+        draws = np.array([self._uniforms((_BASE, self._key(symbol)), 0, 2) for symbol in symbols]).reshape(-1, 2)
+        return math.log(10) + draws[:, 0] * math.log(50), self.volatility * (0.5 + draws[:, 1])
+
+    def _increments(self, stream: tuple[int, ...], symbols: list[str], volatility: np.ndarray,
+                    start: int, n: int, dt: float) -> np.ndarray:
+        """The log price changes of the symbols over steps ``start`` to ``start + n`` of a stream, shaped (n, symbols)."""
+        u = self._uniforms((*stream, 0), 2 * start, 2 * n)
+        factor = np.sqrt(-2 * np.log1p(-u[0::2])) * np.cos(2 * np.pi * u[1::2])
+        shocks = np.empty((n, len(symbols)))
+        jumps = np.empty((n, len(symbols)))
+        for j, symbol in enumerate(symbols):
+            # Box-Muller gives the idiosyncratic shock and the jump size; the third draw decides if there is a jump
+            u = self._uniforms((*stream, 1, self._key(symbol)), 3 * start, 3 * n)
+            radius = np.sqrt(-2 * np.log1p(-u[0::3]))
+            angle = 2 * np.pi * u[1::3]
+            shocks[:, j] = radius * np.cos(angle)
+            jumps[:, j] = np.where(u[2::3] < self.jump_rate * dt, self.jump_mean + self.jump_std * radius * np.sin(angle), 0.0)
+        rho = self.correlation
+        shocks *= math.sqrt(1 - rho)
+        shocks += math.sqrt(rho) * factor[:, None]
+        return (self.drift - volatility ** 2 / 2) * dt + volatility * math.sqrt(dt) * shocks + jumps
+
+    def _total(self, stream: tuple[int, ...], symbols: list[str], volatility: np.ndarray,
+               start: int, stop: int, dt: float) -> np.ndarray:
+        """The summed log price changes of the symbols from ``start`` to ``stop``, in bounded chunks."""
+        total = np.zeros(len(symbols))
+        for chunk in range(start, stop, _CHUNK):
+            total += self._increments(stream, symbols, volatility, chunk, min(_CHUNK, stop - chunk), dt).sum(axis=0)
+        return total
+
+    def _open(self, symbols: list[str], day: int) -> tuple[np.ndarray, np.ndarray]:
+        """The symbols' log prices at the start of ``day``, a date ordinal, and their volatilities."""
+        log_price, volatility = self._base(symbols)
+        return log_price + self._total((_DAILY,), symbols, volatility, 0, max(day - EPOCH, 0), 1 / 252), volatility
+
+    def _today(self, now: float) -> tuple[int, int]:
+        """The date ordinal and tick of a Unix time."""
+        day, seconds = divmod(now, 86400)
+        return UNIX_EPOCH + int(day), int(seconds * self.tick_rate)
+
+    def simulate(self, symbols: list[str], n_ticks: int, day: int | None = None) -> np.ndarray:
+        """
+        The symbols' prices over the first ``n_ticks`` ticks of a day.
+
+        Args:
+            symbols (list): The symbols
+            n_ticks (int): How many ticks
+            day (int): A date ordinal; today by default
+
+        Returns:
+            np.ndarray: Prices shaped (n_ticks, len(symbols)), each row one tick
+        """
+        day = self._today(self.clock())[0] if day is None else day
+        log_price, volatility = self._open(symbols, day)
+        steps = self._increments((_TICK, day), symbols, volatility, 0, n_ticks, 1 / (self.tick_rate * SECONDS_PER_YEAR))
+        paths = np.cumsum(steps, axis=0)
+        paths[1:] = paths[:-1]
+        paths[0] = 0.0
+        return np.exp(paths + log_price)
+
+    def get_prices(self, symbols: list[str]) -> dict[str, float]:
+        """The price of every traded symbol at the current tick, rounded to the cent; other symbols are left out."""
+        if self.symbols is not None:
+            symbols = [symbol for symbol in symbols if symbol in self.symbols]
+        day, tick = self._today(self.clock())
+        dt = 1 / (self.tick_rate * SECONDS_PER_YEAR)
+        with self._lock:
+            # Symbols priced earlier today advance from their last tick, in groups that share it;
+            # the others start from the day's open
+            opening, by_tick = [], {}
+            for symbol in dict.fromkeys(symbols):
+                state = self._state.get(symbol)
+                if state and state[0] == day and state[1] <= tick:
+                    by_tick.setdefault(state[1], []).append(symbol)
+                else:
+                    opening.append(symbol)
+            groups = []
+            if opening:
+                groups.append((opening, 0, *self._open(opening, day)))
+            for start, group in by_tick.items():
+                states = [self._state[symbol] for symbol in group]
+                groups.append((group, start, np.array([s[2] for s in states]), np.array([s[3] for s in states])))
+            for group, start, log_price, volatility in groups:
+                log_price = log_price + self._total((_TICK, day), group, volatility, start, tick, dt)
+                self._state.update(
+                    (symbol, (day, tick, value, vol))
+                    for symbol, value, vol in zip(group, log_price.tolist(), volatility.tolist())
+                )
+            return {symbol: round(math.exp(self._state[symbol][2]), 2) for symbol in symbols}
+
+    def get_price(self, symbol: str) -> float:
+        """The symbol's price at the current tick, or 0.0 if it is not traded."""
+        return self.get_prices([symbol]).get(symbol, 0.0)
@@ -0,0 +1,364 @@
+"""
+Where the trading floor keeps its state.
+
+``Storage`` is the interface accounts and the jobs around them use to persist
+accounts, their ledgers, logs, resting orders and market prices. SQLiteStorage,
+in database.py, is the durable implementation; InMemoryStorage keeps everything
+in dicts, for tests, benchmarks and backtests.
+
+The process-wide storage is chosen by ACCOUNTS_STORAGE ("sqlite", the default, or
+"memory") and is only created, along with any database file, when first used.
+"""
+
+import atexit
+import bisect
+import copy
+import itertools
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, Iterable, Protocol
+from dotenv import load_dotenv
+
+from database import SQLiteStorage, VersionConflictError, ACCOUNT_COLUMNS, RESTING_ORDER_COLUMNS, SNAPSHOT_INTERVAL
+
+load_dotenv(override=True)
+
+STORAGE = os.getenv("ACCOUNTS_STORAGE", "sqlite")
+DB = os.getenv("ACCOUNTS_DB", "accounts.db")
+
+
+class Storage(Protocol):
+    """The operations a storage backend provides; see SQLiteStorage for their full descriptions."""
+
+    def transaction(self) -> ContextManager: ...
+    def flush_logs(self) -> None: ...
+    def close(self) -> None: ...
+
+    def read_account(self, name: str) -> dict | None: ...
+    def write_account(self, name: str, account_dict: dict) -> None: ...
+    def claim_account_version(self, name: str, version: int) -> None: ...
+    def write_fill(self, name: str, account_dict: dict, symbol: str, quantity: int, transaction_dict: dict, avg_cost: float = 0.0) -> None: ...
+    def read_transactions(self, name: str, since: str | None = None, after_id: int = 0, limit: int | None = None) -> list[dict]: ...
+    def write_portfolio_value(self, name: str, datetime: str, value: float) -> None: ...
+    def write_portfolio_values(self, points: list[tuple[str, str, float]]) -> None: ...
+    def read_portfolio_values(self, name: str, since: str | None = None, after_id: int = 0, limit: int | None = None) -> list[tuple]: ...
+    def read_positions(self) -> list[tuple]: ...
+
+    def write_event(self, name: str, account_dict: dict, type: str, data: dict, timestamp: str) -> int: ...
+    def start_epoch(self, name: str, account_dict: dict, type: str, timestamp: str) -> int: ...
+    def read_account_snapshot(self, name: str, until_id: int | None = None, until: str | None = None) -> tuple[int, dict] | None: ...
+    def read_account_events(self, name: str, after_id: int = 0, until_id: int | None = None, until: str | None = None) -> list[dict]: ...
+
+    def write_resting_order(self, order_dict: dict) -> int: ...
+    def read_resting_orders(self, name: str | None = None, after_id: int = 0) -> list[dict]: ...
+    def delete_resting_order(self, order_id: int, name: str | None = None) -> bool: ...
+
+    def write_log(self, name: str, type: str, message: str) -> None: ...
+    def read_log(self, name: str, last_n: int = 10) -> Iterable[tuple]: ...
+    def read_log_since(self, name: str, last_id: int = 0, limit: int | None = None) -> list[tuple]: ...
+
+    def write_market(self, date: str, data: dict) -> None: ...
+    def read_market(self, date: str) -> dict | None: ...
+    def read_market_dates(self, start: str | None = None, end: str | None = None) -> list[str]: ...
+    def has_market(self, date: str) -> bool: ...
+    def read_market_price(self, date: str, symbol: str) -> float | None: ...
+    def read_market_prices(self, date: str, symbols) -> dict[str, float]: ...
+
+
+class InMemoryStorage:
+    """
+    Keeps everything in dicts, with the same semantics as SQLiteStorage.
+
+    Transactions hold a lock, so writers are serialized, and record how to undo
+    each change, so a block that raises - including a nested one - leaves no trace.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._undo: list[Callable[[], None]] = []
+        self._depth = 0
+        self._ids = itertools.count(1)
+        self.accounts: dict[str, dict] = {}
+        self.holdings: dict[str, dict[str, tuple[int, float]]] = {}
+        # Transactions and portfolio values per (name, epoch)
+        self.transactions: dict[tuple[str, int], list[dict]] = defaultdict(list)
+        self.portfolio_values: dict[tuple[str, int], list[tuple]] = defaultdict(list)
+        self.events: dict[str, list[dict]] = defaultdict(list)
+        self.snapshots: dict[str, list[tuple[int, str, dict]]] = defaultdict(list)
+        self.logs: dict[str, list[tuple]] = defaultdict(list)
+        self.resting_orders: dict[int, dict] = {}
+        self.market: dict[str, dict[str, float]] = {}
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            mark = len(self._undo)
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                while len(self._undo) > mark:
+                    self._undo.pop()()
+                raise
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self._undo.clear()
+
+    def flush_logs(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _set(self, mapping: dict, key, value) -> None:
+        if key in mapping:
+            old = mapping[key]
+            self._undo.append(lambda: mapping.__setitem__(key, old))
+        else:
+            self._undo.append(lambda: mapping.pop(key, None))
+        mapping[key] = value
+
+    def _pop(self, mapping: dict, key) -> bool:
+        if key not in mapping:
+            return False
+        old = mapping.pop(key)
+        self._undo.append(lambda: mapping.__setitem__(key, old))
+        return True
+
+    def _append(self, rows: list, row) -> None:
+        rows.append(row)
+        self._undo.append(rows.pop)
+
+    @staticmethod
+    def _page(rows: list, key: Callable, after_id: int, limit: int | None) -> list:
+        start = bisect.bisect_right(rows, after_id, key=key)
+        return rows[start:] if limit is None else rows[start:start + limit]
+
+    def _epoch(self, name: str) -> int:
+        return self.accounts[name]["epoch"] if name in self.accounts else 0
+
+    def _append_event(self, name: str, type: str, data: dict, timestamp: str, snapshot: bool = False) -> int:
+        event_id = next(self._ids)
+        events = self.events[name]
+        self._append(events, {"id": event_id, "epoch": self._epoch(name), "type": type, "timestamp": timestamp, "data": dict(data)})
+        snapshots = self.snapshots[name]
+        pending = len(events) - bisect.bisect_right(events, snapshots[-1][0] if snapshots else 0, key=lambda event: event["id"])
+        if snapshot or pending >= SNAPSHOT_INTERVAL:
+            state = self.read_account(name)
+            del state["version"]
+            self._append(snapshots, (event_id, timestamp, state))
+        return event_id
+
+    def _write_state(self, name: str, account_dict: dict) -> None:
+        version = self.accounts[name]["version"] if name in self.accounts else 0
+        state = {column: account_dict.get(column, default) for column, default in ACCOUNT_COLUMNS.items()}
+        self._set(self.accounts, name, {**state, "version": version})
+
+    def read_account(self, name: str) -> dict | None:
+        name = name.lower()
+        if name not in self.accounts:
+            return None
+        holdings = self.holdings.get(name, {})
+        return {
+            "name": name,
+            **self.accounts[name],
+            "holdings": {symbol: quantity for symbol, (quantity, _) in holdings.items()},
+            "average_costs": {symbol: avg_cost for symbol, (_, avg_cost) in holdings.items()},
+        }
+
+    def write_account(self, name: str, account_dict: dict) -> None:
+        name = name.lower()
+        avg_costs = account_dict.get("average_costs", {})
+        with self.transaction():
+            self._write_state(name, account_dict)
+            holdings = {symbol: (quantity, avg_costs.get(symbol, 0.0)) for symbol, quantity in account_dict["holdings"].items()}
+            self._set(self.holdings, name, holdings)
+
+    def claim_account_version(self, name: str, version: int) -> None:
+        name = name.lower()
+        with self.transaction():
+            account = self.accounts.get(name)
+            if account is None or account["version"] != version:
+                raise VersionConflictError(f"Account {name} was modified since version {version} was read")
+            self._set(self.accounts, name, {**account, "version": version + 1})
+
+    def write_fill(self, name: str, account_dict: dict, symbol: str, quantity: int, transaction_dict: dict, avg_cost: float = 0.0) -> None:
+        name = name.lower()
+        with self.transaction():
+            self._write_state(name, account_dict)
+            holdings = dict(self.holdings.get(name, {}))
+            if quantity:
+                holdings[symbol] = (quantity, avg_cost)
+            else:
+                holdings.pop(symbol, None)
+            self._set(self.holdings, name, holdings)
+            transaction = {key: transaction_dict[key] for key in ("symbol", "quantity", "price", "timestamp", "rationale")}
+            self._append(self.transactions[name, self._epoch(name)], {"id": next(self._ids), **transaction})
+            self._append_event(name, "fill", transaction, transaction["timestamp"])
+
+    def write_event(self, name: str, account_dict: dict, type: str, data: dict, timestamp: str) -> int:
+        name = name.lower()
+        with self.transaction():
+            self._write_state(name, account_dict)
+            return self._append_event(name, type, data, timestamp)
+
+    def start_epoch(self, name: str, account_dict: dict, type: str, timestamp: str) -> int:
+        name = name.lower()
+        with self.transaction():
+            self.write_account(name, account_dict)
+            for order_id in [order_id for order_id, order in self.resting_orders.items() if order["name"] == name]:
+                self._pop(self.resting_orders, order_id)
+            data = {"balance": account_dict["balance"], "strategy": account_dict["strategy"]}
+            return self._append_event(name, type, data, timestamp, snapshot=True)
+
+    def read_account_snapshot(self, name: str, until_id: int | None = None, until: str | None = None) -> tuple[int, dict] | None:
+        for event_id, timestamp, state in reversed(self.snapshots.get(name.lower(), [])):
+            if (until_id is None or event_id <= until_id) and (until is None or timestamp <= until):
+                return event_id, copy.deepcopy(state)
+        return None
+
+    def read_account_events(self, name: str, after_id: int = 0, until_id: int | None = None, until: str | None = None) -> list[dict]:
+        return [
+            copy.deepcopy(event) for event in self._page(self.events.get(name.lower(), []), lambda event: event["id"], after_id, None)
+            if (until_id is None or event["id"] <= until_id) and (until is None or event["timestamp"] <= until)
+        ]
+
+    def read_transactions(self, name: str, since: str | None = None, after_id: int = 0, limit: int | None = None) -> list[dict]:
+        name = name.lower()
+        rows = self.transactions.get((name, self._epoch(name)), [])
+        if since:
+            rows = [row for row in rows if row["timestamp"] >= since]
+        return [dict(row) for row in self._page(rows, lambda row: row["id"], after_id, limit)]
+
+    def write_portfolio_value(self, name: str, datetime: str, value: float) -> None:
+        self.write_portfolio_values([(name, datetime, value)])
+
+    def write_portfolio_values(self, points: list[tuple[str, str, float]]) -> None:
+        with self.transaction():
+            for name, when, value in points:
+                name = name.lower()
+                self._append(self.portfolio_values[name, self._epoch(name)], (next(self._ids), when, value))
+
+    def read_portfolio_values(self, name: str, since: str | None = None, after_id: int = 0, limit: int | None = None) -> list[tuple]:
+        name = name.lower()
+        rows = self.portfolio_values.get((name, self._epoch(name)), [])
+        if since:
+            rows = [row for row in rows if row[1] >= since]
+        return self._page(rows, lambda row: row[0], after_id, limit)
+
+    def read_positions(self) -> list[tuple]:
+        with self._lock:
+            positions = []
+            for name, account in self.accounts.items():
+                holdings = self.holdings.get(name)
+                if not holdings:
+                    positions.append((name, account["balance"], None, None))
+                positions.extend((name, account["balance"], symbol, quantity) for symbol, (quantity, _) in (holdings or {}).items())
+            return positions
+
+    def write_resting_order(self, order_dict: dict) -> int:
+        with self.transaction():
+            order_id = next(self._ids)
+            order = {"id": order_id, **{column: order_dict[column] for column in RESTING_ORDER_COLUMNS[1:]}}
+            order["name"] = order["name"].lower()
+            self._set(self.resting_orders, order_id, order)
+            return order_id
+
+    def read_resting_orders(self, name: str | None = None, after_id: int = 0) -> list[dict]:
+        return [
+            dict(order) for order_id, order in sorted(self.resting_orders.items())
+            if order_id > after_id and (name is None or order["name"] == name.lower())
+        ]
+
+    def delete_resting_order(self, order_id: int, name: str | None = None) -> bool:
+        with self.transaction():
+            order = self.resting_orders.get(order_id)
+            if order is None or (name is not None and order["name"] != name.lower()):
+                return False
+            return self._pop(self.resting_orders, order_id)
+
+    def write_log(self, name: str, type: str, message: str) -> None:
+        row = (datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), type, message)
+        with self.transaction():
+            self._append(self.logs[name.lower()], (next(self._ids), *row))
+
+    def read_log(self, name: str, last_n: int = 10) -> list[tuple]:
+        return [row[1:] for row in self.logs.get(name.lower(), [])[-last_n:]] if last_n > 0 else []
+
+    def read_log_since(self, name: str, last_id: int = 0, limit: int | None = None) -> list[tuple]:
+        rows = self._page(self.logs.get(name.lower(), []), lambda row: row[0], last_id, None)
+        return rows if limit is None else rows[-limit:] if limit > 0 else []
+
+    def write_market(self, date: str, data: dict) -> None:
+        with self.transaction():
+            self._set(self.market, date, {symbol: close for symbol, close in data.items() if close is not None})
+
+    def read_market(self, date: str) -> dict | None:
+        return dict(self.market[date]) if self.market.get(date) else None
+
+    def read_market_dates(self, start: str | None = None, end: str | None = None) -> list[str]:
+        return sorted(date for date, prices in self.market.items() if prices and (start or "") <= date <= (end or "9999-12-31"))
+
+    def has_market(self, date: str) -> bool:
+        return bool(self.market.get(date))
+
+    def read_market_price(self, date: str, symbol: str) -> float | None:
+        return self.market.get(date, {}).get(symbol)
+
+    def read_market_prices(self, date: str, symbols) -> dict[str, float]:
+        prices = self.market.get(date, {})
+        return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+
+def create_storage(kind: str = STORAGE, path: str = DB) -> Storage:
+    """
+    Build a storage backend.
+
+    Args:
+        kind (str): "sqlite" or "memory"
+        path (str): The database file, for SQLite
+
+    Returns:
+        Storage: The new backend; SQLite does not open the file until first used
+    """
+    if kind == "sqlite":
+        return SQLiteStorage(path)
+    if kind == "memory":
+        return InMemoryStorage()
+    raise ValueError(f"Unknown storage {kind!r}; expected 'sqlite' or 'memory'.")
+
+
+_storage: Storage | None = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """The process-wide storage, created from the configuration on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+                atexit.register(_storage.close)
+    return _storage
+
+
+def set_storage(storage: Storage | None) -> None:
+    """Replace the process-wide storage; None goes back to the configured default on next use."""
+    global _storage
+    _storage = storage
+
+
+@contextmanager
+def use_storage(storage: Storage):
+    """Make ``storage`` the process-wide storage for the enclosed block."""
+    previous = _storage
+    set_storage(storage)
+    try:
+        yield storage
+    finally:
+        set_storage(previous)
@@ -1,5 +1,6 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from logger import write_log
+from storage import get_storage
 import secrets
 import string
 
@@ -69,7 +70,7 @@ class LogTracer(TracingProcessor):
             write_log(name, type, message)
 
     def force_flush(self) -> None:
-        pass
+        get_storage().flush_logs()
 
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        get_storage().flush_logs()
\ No newline at end of file
@@ -5,7 +5,6 @@ from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import os
-import json
 from agents.mcp import MCPServerStdio
 from templates import researcher_instructions, trader_instructions, trade_message, rebalance_message, research_tool
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
@@ -78,10 +77,7 @@ class Trader:
         return self.agent
     
     async def get_account_report(self) -> str:
-        account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+        return await read_accounts_resource(self.name)
 
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
         self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
@@ -3,7 +3,9 @@ from typing import List
 import asyncio
 from tracers import LogTracer
 from agents import add_trace_processor
-from market import is_market_open
+from market import is_market_open, start_price_stream, add_price_listener, PRICE_STREAM
+from mark_to_market import mark_to_market
+from orders import order_book, check_resting_orders
 from dotenv import load_dotenv
 import os
 
@@ -32,10 +34,16 @@ def create_traders() -> List[Trader]:
 
 async def run_every_n_minutes():
     add_trace_processor(LogTracer())
+    if PRICE_STREAM:
+        # Polygon allows one socket per key, so this process streams and shares prices with the others
+        start_price_stream()
+        add_price_listener(order_book.on_prices)
     traders = create_traders()
     while True:
         if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
             await asyncio.gather(*[trader.run() for trader in traders])
+            await asyncio.to_thread(check_resting_orders)
+            await asyncio.to_thread(mark_to_market)
         else:
             print("Market is closed, skipping run")
         await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
@@ -1,34 +1,27 @@
 import sys
 import os
+import gc
+import json
+import tempfile
 import unittest
+from datetime import datetime
 from unittest.mock import patch
 
 # Make trading floor modules importable
 sys.path.insert(0, os.path.abspath('3_trading_floor'))
 
 import accounts
+import database
+from storage import InMemoryStorage, use_storage
 
 
 class AccountOperationsTest(unittest.TestCase):
     def setUp(self):
-        # In-memory store instead of sqlite
-        self.store = {}
-
-        def fake_write(name, data):
-            self.store[name.lower()] = data
-
-        def fake_read(name):
-            return self.store.get(name.lower())
-
-        patches = [
-            patch('accounts.write_account', side_effect=fake_write),
-            patch('accounts.read_account', side_effect=fake_read),
-            patch('accounts.write_log'),
-            patch('accounts.get_share_price', return_value=100.0),
-        ]
-        for p in patches:
-            p.start()
-        self.addCleanup(lambda: [p.stop() for p in patches])
+        self.storage = InMemoryStorage()
+        self.enterContext(use_storage(self.storage))
+        self.enterContext(patch.dict('accounts._report_cache', clear=True))
+        self.price = 100.0
+        self.enterContext(patch('accounts.get_share_prices', side_effect=lambda symbols: {s: self.price for s in symbols}))
 
         self.account = accounts.Account.get('Alice')
 
@@ -54,6 +47,27 @@ class AccountOperationsTest(unittest.TestCase):
         # Expected small negative due to spread costs
         self.assertAlmostEqual(pnl, -3.0, places=1)
 
+    def test_running_cost_basis_matches_history(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        self.price = 120.0
+        self.account.buy_shares('AAPL', 10, 'add')
+        self.price = 150.0
+        self.account.sell_shares('AAPL', 5, 'trim')
+        buy_1, buy_2 = 100 * (1 + accounts.SPREAD), 120 * (1 + accounts.SPREAD)
+        average_cost = (10 * buy_1 + 10 * buy_2) / 20
+        self.assertAlmostEqual(self.account.average_costs['AAPL'], average_cost)
+        self.assertAlmostEqual(self.account.realized_pnl, (150 * (1 - accounts.SPREAD) - average_cost) * 5)
+        self.assertAlmostEqual(self.account.net_invested, sum(t.total() for t in self.account.transactions))
+        self.assertAlmostEqual(self.account.calculate_unrealized_profit_loss()['AAPL'], (150.0 - average_cost) * 15)
+
+    def test_prices_fetched_in_one_batch_per_trade(self):
+        self.account.buy_shares('AAPL', 1, 'a')
+        self.account.buy_shares('MSFT', 1, 'b')
+        with patch('accounts.get_share_prices', side_effect=lambda symbols: {s: 100.0 for s in symbols}) as prices:
+            self.account.buy_shares('GOOG', 1, 'c')
+        prices.assert_called_once()
+        self.assertCountEqual(prices.call_args[0][0], ['GOOG', 'AAPL', 'MSFT'])
+
     def test_max_order_size_enforced(self):
         with patch('accounts.MAX_ORDER_SIZE', 5):
             with self.assertRaises(ValueError):
@@ -66,6 +80,219 @@ class AccountOperationsTest(unittest.TestCase):
             with self.assertRaises(ValueError):
                 self.account.buy_shares('AAPL', 1, 't3')
 
+    def test_daily_trade_counter_matches_scan(self):
+        with patch('accounts.MAX_ORDER_SIZE', 100):
+            for i in range(3):
+                self.account.buy_shares('AAPL', 2, f'buy {i}')
+                self.account.sell_shares('AAPL', 1, f'sell {i}')
+        today = datetime.now().strftime('%Y-%m-%d')
+        scanned = sum(1 for t in self.account.transactions if t.timestamp.startswith(today))
+        self.assertEqual(self.account._trades_today(), scanned)
+        stored = self.storage.read_account('alice')
+        self.assertEqual(stored['trade_count'], scanned)
+        self.assertEqual(stored['trade_day'], today)
+
+    def test_daily_trade_counter_rolls_over(self):
+        self.account.trade_day = '2000-01-01'
+        self.account.trade_count = accounts.DAILY_TRADE_LIMIT
+        self.assertEqual(self.account._trades_today(), 0)
+        self.account.buy_shares('AAPL', 1, 'new day')
+        self.assertEqual(self.account._trades_today(), 1)
+
+    def test_execute_orders_fills_all_with_one_snapshot(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        with patch('accounts.get_share_prices', side_effect=lambda symbols: {s: 100.0 for s in symbols}) as prices, \
+             patch.object(self.storage, 'write_portfolio_value') as points:
+            self.account.execute_orders([
+                {'side': 'sell', 'symbol': 'AAPL', 'quantity': 5, 'rationale': 'trim'},
+                accounts.Order(side='buy', symbol='MSFT', quantity=5, rationale='rotate'),
+            ])
+        prices.assert_called_once()
+        points.assert_not_called()
+        self.assertEqual(self.account.holdings, {'AAPL': 5, 'MSFT': 5})
+        self.assertEqual(len(self.account.transactions), 3)
+
+    def test_execute_orders_is_all_or_nothing(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        before = self.account.model_dump()
+        with patch('accounts.log_risk') as log_risk:
+            with self.assertRaisesRegex(ValueError, 'Order 2'):
+                self.account.execute_orders([
+                    {'side': 'sell', 'symbol': 'AAPL', 'quantity': 5, 'rationale': 'trim'},
+                    {'side': 'sell', 'symbol': 'AAPL', 'quantity': 6, 'rationale': 'too many'},
+                ])
+        self.assertEqual(self.account.model_dump(), before)
+        self.assertIn('not executed', log_risk.call_args[0][1])
+
+    def test_report_is_cached_and_side_effect_free(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        with patch('accounts.get_share_prices', side_effect=lambda symbols: {s: 100.0 for s in symbols}) as prices, \
+             patch.object(self.storage, 'write_portfolio_value') as points, \
+             patch.object(self.storage, 'write_log') as logs:
+            first = self.account.report()
+            self.assertEqual(self.account.report(), first)
+            prices.assert_not_called()
+
+            self.account.version += 1
+            self.assertIn('total_portfolio_value', json.loads(self.account.report()))
+            prices.assert_called_once()
+            with patch('accounts.price_snapshot_id', return_value='later'):
+                self.account.report()
+            self.assertEqual(prices.call_count, 2)
+        points.assert_not_called()
+        logs.assert_not_called()
+
+    def test_report_cache_is_per_storage_and_prices(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        first = json.loads(self.account.report())
+        other = InMemoryStorage()
+        elsewhere = accounts.Account.get('Alice', other)
+        elsewhere.version = self.account.version
+        self.assertNotEqual(json.loads(elsewhere.report())['holdings'], first['holdings'])
+        del elsewhere, other
+        gc.collect()
+        self.assertEqual(list(accounts._report_cache), [self.storage])
+
+        valued = json.loads(self.account.report({'AAPL': 120.0}))
+        self.assertAlmostEqual(valued['total_portfolio_value'] - first['total_portfolio_value'], 200.0)
+
+    def test_mark_to_market_records_portfolio_value(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        value = self.account.mark_to_market({'AAPL': 120.0})
+        self.assertAlmostEqual(value, self.account.balance + 1200.0)
+        self.assertEqual([point for _, _, point in self.storage.read_portfolio_values('alice')], [value])
+        self.assertEqual(self.account.portfolio_value_time_series[-1][1], value)
+
+    def test_failed_trade_leaves_account_unchanged(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        before = self.account.model_dump()
+        with patch('accounts.log_audit', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.account.sell_shares('AAPL', 5, 'trim')
+        self.assertEqual(self.account.model_dump(), before)
+
+
+class AccountPersistenceTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = database.SQLiteStorage(os.path.join(tmp.name, 'accounts.db'))
+        self.addCleanup(self.storage.close)
+        self.enterContext(use_storage(self.storage))
+
+        price = patch('accounts.get_share_prices', side_effect=lambda symbols: {s: 100.0 for s in symbols})
+        price.start()
+        self.addCleanup(price.stop)
+        cache = patch.dict('accounts._report_cache', clear=True)
+        cache.start()
+        self.addCleanup(cache.stop)
+        self.account = accounts.Account.get('Bob')
+
+    def test_trade_is_persisted_atomically(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        with patch('accounts.log_audit', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.account.sell_shares('AAPL', 5, 'trim')
+        self.storage.flush_logs()
+
+        stored = accounts.Account.get('Bob')
+        self.assertEqual(stored.holdings, {'AAPL': 10})
+        self.assertEqual(len(stored.transactions), 1)
+        self.assertEqual(stored.portfolio_value_time_series, [])
+        self.assertEqual(stored.model_dump(), self.account.model_dump())
+        self.assertEqual(stored.transactions, self.account.transactions)
+        messages = [message for _, _, message in self.storage.read_log('bob', last_n=50)]
+        self.assertIn('Bought 10 of AAPL', messages)
+        self.assertNotIn('Sold 5 of AAPL', messages)
+
+    def test_history_is_loaded_lazily_and_paged(self):
+        with patch('accounts.MAX_ORDER_SIZE', 100):
+            for i in range(7):
+                self.account.buy_shares('AAPL', 1, f'buy {i}')
+                self.account.mark_to_market()
+
+        with patch.object(self.storage, 'read_transactions', wraps=self.storage.read_transactions) as read:
+            stored = accounts.Account.get('Bob')
+            self.assertEqual(stored.balance, self.account.balance)
+            read.assert_not_called()
+
+            page = list(stored.iter_transactions(limit=5, page_size=2))
+            self.assertEqual([t.rationale for t in page], [f'buy {i}' for i in range(5)])
+            self.assertEqual(read.call_count, 3)
+            self.assertEqual(len(list(stored.iter_portfolio_values(page_size=3))), 7)
+
+            read.reset_mock()
+            self.assertEqual(len(stored.transactions), 7)
+            self.assertEqual(read.call_count, 1)
+
+    def test_past_state_is_rebuilt_from_snapshots_and_events(self):
+        states = []
+        with patch('accounts.MAX_ORDER_SIZE', 100), patch('database.SNAPSHOT_INTERVAL', 3):
+            for i in range(4):
+                self.account.buy_shares('AAPL', 2, f'buy {i}')
+                self.account.sell_shares('AAPL', 1, f'sell {i}')
+                self.account.deposit(10.0)
+                states.append((self.storage.read_account_events('bob')[-1]['id'], self.account.model_dump(exclude={'version'})))
+            self.account.change_strategy('momentum')
+        for event_id, state in states:
+            self.assertEqual(accounts.Account.as_of('Bob', event_id=event_id).model_dump(exclude={'version'}), state)
+        self.assertEqual(accounts.Account.as_of('Bob').strategy, 'momentum')
+
+    def test_reset_starts_a_new_epoch(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        self.account.mark_to_market()
+        before_reset = self.storage.read_account_events('bob')[-1]['id']
+        self.account.reset('fresh')
+
+        stored = accounts.Account.get('Bob')
+        self.assertEqual((stored.epoch, stored.balance, stored.holdings), (1, accounts.INITIAL_BALANCE, {}))
+        self.assertEqual((stored.transactions, stored.portfolio_value_time_series), ([], []))
+        self.assertEqual(accounts.Account.as_of('Bob', event_id=before_reset).holdings, {'AAPL': 10})
+
+    def test_trades_before_a_reset_do_not_count_towards_the_daily_limit(self):
+        self.account.buy_shares('AAPL', 10, 'init')
+        self.account.reset('fresh')
+        self.assertEqual(accounts.Account.get('Bob')._trades_today(), 0)
+
+        # An account stored before the counter existed is backfilled from its current epoch only
+        self.storage.connection().execute("UPDATE accounts SET trade_day = '' WHERE name = 'bob'")
+        reopened = database.SQLiteStorage(self.storage.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(accounts.Account.get('Bob', reopened)._trades_today(), 0)
+
+    def test_account_opened_elsewhere_meanwhile_is_not_opened_again(self):
+        self.account.deposit(5.0)
+        read_account = self.storage.read_account
+        reads = []
+
+        def read_before_the_other_process_opened_it(name):
+            reads.append(name)
+            return None if len(reads) == 1 else read_account(name)
+
+        with patch.object(self.storage, 'read_account', side_effect=read_before_the_other_process_opened_it):
+            account = accounts.Account.get('Bob')
+        self.assertEqual(account.balance, accounts.INITIAL_BALANCE + 5.0)
+        self.assertEqual([event['type'] for event in self.storage.read_account_events('bob')], ['open', 'deposit'])
+
+    def test_stale_copy_conflicts_and_retry_reloads(self):
+        stale = accounts.Account.get('Bob')
+        self.account.buy_shares('AAPL', 10, 'first')
+        with self.assertRaises(database.VersionConflictError):
+            stale.buy_shares('MSFT', 10, 'second')
+        self.assertEqual(stale.holdings, {})
+
+        attempts = []
+
+        def buy(account):
+            attempts.append(account.version)
+            if len(attempts) == 1:
+                self.account.buy_shares('GOOG', 1, 'sneaks in')
+            return account.buy_shares('MSFT', 10, 'second')
+
+        accounts.Account.run_with_retry('Bob', buy)
+        self.assertEqual(attempts, [1, 2])
+        self.assertEqual(accounts.Account.get('Bob').holdings, {'AAPL': 10, 'GOOG': 1, 'MSFT': 10})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import accounts
+import analytics
+from storage import InMemoryStorage, use_storage
+
+
+class AnalyticsFunctionsTest(unittest.TestCase):
+    def test_max_drawdown(self):
+        self.assertAlmostEqual(analytics.max_drawdown(np.array([100.0, 120.0, 90.0, 130.0, 117.0])), -0.25)
+
+    def test_daily_returns_use_each_days_close(self):
+        times = np.array(['2025-01-02T10:00', '2025-01-02T16:00', '2025-01-03T16:00', '2025-01-06T16:00'], dtype='datetime64[s]')
+        returns = analytics.daily_returns(times, np.array([50.0, 100.0, 110.0, 99.0]))
+        np.testing.assert_allclose(returns, [0.1, -0.1])
+
+    def test_sharpe_and_volatility_need_two_returns(self):
+        self.assertTrue(np.isnan(analytics.sharpe_ratio(np.array([0.01]))))
+        returns = np.array([0.01, 0.03])
+        self.assertAlmostEqual(analytics.volatility(returns), returns.std(ddof=1) * np.sqrt(252))
+        self.assertAlmostEqual(analytics.sharpe_ratio(returns), 0.02 / returns.std(ddof=1) * np.sqrt(252))
+
+
+class ComputeAnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = self.enterContext(use_storage(InMemoryStorage()))
+
+        self.prices = {'AAPL': 100.0, 'MSFT': 50.0}
+        for target in ('accounts.get_share_prices', 'analytics.get_share_prices'):
+            prices = patch(target, side_effect=lambda symbols: {s: self.prices[s] for s in symbols})
+            prices.start()
+            self.addCleanup(prices.stop)
+        for cache in ('analytics._ledgers', 'analytics._analytics_cache', 'accounts._report_cache'):
+            cleared = patch.dict(cache, clear=True)
+            cleared.start()
+            self.addCleanup(cleared.stop)
+        self.account = accounts.Account.get('Carol')
+
+    def test_symbol_pnl_matches_running_cost_basis(self):
+        self.account.buy_shares('AAPL', 10, 'open')
+        self.prices['AAPL'] = 120.0
+        self.account.buy_shares('AAPL', 10, 'add')
+        self.account.sell_shares('AAPL', 5, 'trim')
+        self.account.buy_shares('MSFT', 4, 'open')
+        self.account.sell_shares('MSFT', 4, 'close')
+
+        result = analytics.compute_analytics(self.account)
+        aapl, msft = result['symbols']['AAPL'], result['symbols']['MSFT']
+        self.assertEqual(aapl['quantity'], 15)
+        self.assertAlmostEqual(aapl['unrealized_pnl'], 15 * (120.0 - self.account.average_costs['AAPL']))
+        self.assertAlmostEqual(aapl['realized_pnl'] + msft['realized_pnl'], self.account.realized_pnl)
+        self.assertAlmostEqual(msft['realized_pnl'], -4 * 50.0 * 2 * accounts.SPREAD)
+        self.assertEqual(msft['unrealized_pnl'], 0.0)
+
+    def test_cached_per_version_and_time_series(self):
+        self.account.buy_shares('AAPL', 10, 'open')
+        self.account.mark_to_market()
+        with patch.object(self.storage, 'read_transactions', wraps=self.storage.read_transactions) as reads:
+            first = analytics.compute_analytics(self.account)
+            self.assertIs(analytics.compute_analytics(self.account), first)
+            self.assertEqual(reads.call_count, 1)
+
+            self.account.mark_to_market()
+            second = analytics.compute_analytics(self.account)
+            self.assertIsNot(second, first)
+            self.assertEqual(reads.call_count, 1)
+            self.assertEqual(len(analytics._ledgers['carol'].values), 2)
+
+            self.account.buy_shares('MSFT', 1, 'more')
+            self.assertIn('MSFT', analytics.compute_analytics(self.account)['symbols'])
+            self.assertEqual(reads.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
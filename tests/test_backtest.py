@@ -0,0 +1,95 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import accounts
+import backtest
+from storage import InMemoryStorage, use_storage
+
+
+class BacktestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = self.enterContext(use_storage(InMemoryStorage()))
+
+        network = patch('accounts.get_share_prices', side_effect=AssertionError('backtests must not fetch prices'))
+        network.start()
+        self.addCleanup(network.stop)
+        self.history = pd.DataFrame(
+            {'AAPL': [100.0, 110.0, None, 90.0], 'MSFT': [50.0, 50.0, 55.0, 60.0]},
+            index=['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05'],
+        )
+
+    def test_replays_scripted_orders_on_simulated_days(self):
+        plan = {
+            '2024-01-02': [{'side': 'buy', 'symbol': 'AAPL', 'quantity': 10, 'rationale': 'open'}],
+            '2024-01-04': [{'side': 'sell', 'symbol': 'AAPL', 'quantity': 10, 'rationale': 'close'},
+                           {'side': 'sell', 'symbol': 'MSFT', 'quantity': 1, 'rationale': 'not held'}],
+        }
+        result = backtest.run_backtest(self.history, backtest.scripted(plan))
+
+        self.assertEqual(result.trades, 2)
+        self.assertEqual(result.holdings, {})
+        self.assertEqual(len(result.rejected), 1)
+        self.assertIn('2024-01-04', result.rejected[0])
+        self.assertEqual([when for when, _ in result.portfolio_values][0], '2024-01-02 16:00:00')
+        # AAPL is missing on the 4th, so it sells at the last close of 110
+        expected = accounts.INITIAL_BALANCE + 10 * (110 * (1 - accounts.SPREAD) - 100 * (1 + accounts.SPREAD))
+        self.assertAlmostEqual(result.final_value, expected)
+        self.assertAlmostEqual(result.analytics['symbols']['AAPL']['realized_pnl'], result.profit_loss)
+        self.assertIsNone(self.storage.read_account('backtest'))
+
+    def test_risk_rules_apply_per_simulated_day(self):
+        orders = [{'side': 'buy', 'symbol': 'MSFT', 'quantity': 1, 'rationale': str(i)} for i in range(accounts.DAILY_TRADE_LIMIT + 1)]
+        plan = {'2024-01-02': orders, '2024-01-03': orders[:1]}
+        result = backtest.run_backtest(self.history, backtest.scripted(plan))
+        self.assertEqual(result.trades, accounts.DAILY_TRADE_LIMIT + 1)
+        self.assertEqual(len(result.rejected), 1)
+        self.assertIn('Daily trade limit', result.rejected[0])
+
+    def test_orders_for_symbols_without_a_close_are_rejected(self):
+        history = self.history.assign(TSLA=[None, None, 200.0, 210.0])
+        plan = {'2024-01-02': [{'side': 'buy', 'symbol': 'TSLA', 'quantity': 1, 'rationale': 'early'}],
+                '2024-01-04': [{'side': 'buy', 'symbol': 'TSLA', 'quantity': 1, 'rationale': 'listed'}]}
+        result = backtest.run_backtest(history, backtest.scripted(plan))
+        self.assertEqual(result.trades, 1)
+        self.assertEqual(result.holdings, {'TSLA': 1})
+        self.assertEqual(len(result.rejected), 1)
+        self.assertIn('2024-01-02', result.rejected[0])
+        self.assertIn('no close yet', result.rejected[0])
+
+    def test_recorded_strategy_repeats_live_trades(self):
+        transactions = [
+            {'symbol': 'MSFT', 'quantity': 4, 'price': 1.0, 'timestamp': '2024-01-03 10:00:00', 'rationale': 'in'},
+            {'symbol': 'MSFT', 'quantity': -4, 'price': 1.0, 'timestamp': '2024-01-05 10:00:00', 'rationale': 'out'},
+        ]
+        result = backtest.run_backtest(self.history, backtest.recorded(transactions))
+        self.assertEqual(result.trades, 2)
+        self.assertAlmostEqual(result.analytics['symbols']['MSFT']['realized_pnl'],
+                               4 * (60 * (1 - accounts.SPREAD) - 50 * (1 + accounts.SPREAD)))
+
+    def test_loads_long_and_wide_history_files(self):
+        long = os.path.join(self.tmp.name, 'long.csv')
+        wide = os.path.join(self.tmp.name, 'wide.csv')
+        pd.DataFrame({'date': ['2024-01-03', '2024-01-02', '2024-01-02'], 'symbol': ['AAPL', 'AAPL', 'MSFT'],
+                      'close': [2.0, 1.0, 3.0]}).to_csv(long, index=False)
+        pd.DataFrame({'date': ['2024-01-02', '2024-01-03'], 'AAPL': [1.0, 2.0]}).to_csv(wide, index=False)
+        self.assertEqual(list(backtest.load_history_file(long).index), ['2024-01-02', '2024-01-03'])
+        self.assertEqual(backtest.load_history_file(long).loc['2024-01-02', 'MSFT'], 3.0)
+        self.assertEqual(backtest.load_history_file(wide)['AAPL'].tolist(), [1.0, 2.0])
+
+    def test_loads_stored_market_history(self):
+        self.storage.write_market('2024-01-02', {'AAPL': 1.0})
+        self.storage.write_market('2024-01-03', {'AAPL': 2.0, 'MSFT': 3.0})
+        history = backtest.load_history_from_db(start='2024-01-03')
+        self.assertEqual(history.to_dict('index'), {'2024-01-03': {'AAPL': 2.0, 'MSFT': 3.0}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import database
+
+
+class DatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = self.open(os.path.join(self.tmp.name, 'test.db'))
+
+    def open(self, path):
+        storage = database.SQLiteStorage(path)
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_connection_is_reused_per_thread_in_wal_mode(self):
+        conn = self.db.connection()
+        self.assertIs(conn, self.db.connection())
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.db.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(conn, other[0])
+
+    def test_nested_transaction_rolls_back_as_one_unit(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.write_account('alice', {'balance': 1.0, 'strategy': '', 'holdings': {}})
+                with self.db.transaction():
+                    self.db.write_log('alice', 'account', 'inner')
+                raise RuntimeError('boom')
+        self.assertIsNone(self.db.read_account('alice'))
+        self.assertEqual(list(self.db.read_log('alice')), [])
+
+    def test_logs_are_batched_until_flushed(self):
+        writer = database.LogWriter(self.db._insert_logs, batch_size=50, flush_interval=60)
+        with patch.object(self.db, 'log_writer', writer):
+            for i in range(120):
+                self.db.write_log('alice', 'trace', f'span {i}')
+            self.db.flush_logs()
+            messages = [message for _, _, message in self.db.read_log('alice', last_n=500)]
+            self.assertEqual(messages, [f'span {i}' for i in range(120)])
+
+            self.db.write_log('alice', 'trace', 'last')
+            writer.close()
+        self.assertEqual(list(self.db.read_log('alice', last_n=1))[0][2], 'last')
+
+    def test_read_log_since_returns_only_new_rows(self):
+        with self.db.transaction():
+            for i in range(5):
+                self.db.write_log('alice', 'account', f'a{i}')
+                self.db.write_log('bob', 'account', f'b{i}')
+        rows = self.db.read_log_since('alice', 0, limit=2)
+        self.assertEqual([row[3] for row in rows], ['a3', 'a4'])
+
+        last_id = rows[-1][0]
+        self.assertEqual(self.db.read_log_since('alice', last_id), [])
+        self.db.write_log('alice', 'account', 'a5')
+        self.db.flush_logs()
+        self.assertEqual([row[3] for row in self.db.read_log_since('alice', last_id)], ['a5'])
+
+        plan = self.db.connection().execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM logs WHERE name = ? AND id > ? ORDER BY id DESC', ('alice', last_id)
+        ).fetchall()
+        self.assertIn('idx_logs_name_id', str(plan))
+
+    def test_account_round_trip(self):
+        self.db.write_account('Alice', {'balance': 5.0, 'strategy': 'hold', 'holdings': {'AAPL': 3}})
+        self.assertEqual(self.db.read_account('alice'), {
+            'name': 'alice',
+            'balance': 5.0,
+            'strategy': 'hold',
+            'trade_day': '',
+            'trade_count': 0,
+            'holdings': {'AAPL': 3},
+            'average_costs': {'AAPL': 0.0},
+            'net_invested': 0.0,
+            'realized_pnl': 0.0,
+            'epoch': 0,
+            'version': 0,
+        })
+
+    def test_fill_appends_rows_and_updates_holding(self):
+        self.db.write_account('alice', {'balance': 100.0, 'strategy': '', 'holdings': {'AAPL': 3}})
+        trade = {'symbol': 'AAPL', 'quantity': -3, 'price': 10.0, 'timestamp': '2025-01-02 10:00:00', 'rationale': 'exit'}
+        self.db.write_fill('alice', {'balance': 130.0, 'strategy': '', 'trade_day': '2025-01-02', 'trade_count': 1}, 'AAPL', 0, trade)
+        self.db.write_portfolio_value('alice', '2025-01-02 10:00:00', 130.0)
+
+        account = self.db.read_account('alice')
+        self.assertEqual(account['balance'], 130.0)
+        self.assertEqual(account['trade_count'], 1)
+        self.assertEqual(account['holdings'], {})
+        self.assertEqual(self.db.read_transactions('alice'), [{'id': 1, **trade}])
+        self.assertEqual(self.db.read_portfolio_values('alice'), [(1, '2025-01-02 10:00:00', 130.0)])
+
+    def test_trade_counter_is_backfilled_for_older_accounts(self):
+        path = os.path.join(self.tmp.name, 'older.db')
+        today = datetime.now().strftime('%Y-%m-%d')
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE accounts (name TEXT PRIMARY KEY, balance REAL NOT NULL, strategy TEXT NOT NULL DEFAULT '')")
+            conn.execute('CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, symbol TEXT NOT NULL, quantity INTEGER NOT NULL, price REAL NOT NULL, timestamp TEXT NOT NULL, rationale TEXT NOT NULL)')
+            conn.execute("INSERT INTO accounts VALUES ('carol', 10.0, '')")
+            conn.executemany('INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale) VALUES (?, ?, ?, ?, ?, ?)', [
+                ('carol', 'AAPL', 1, 1.0, '2000-01-01 10:00:00', 'old'),
+                ('carol', 'AAPL', 1, 1.0, f'{today} 10:00:00', 'new'),
+                ('carol', 'AAPL', 1, 1.0, f'{today} 11:00:00', 'new'),
+            ])
+
+        self.db = self.open(path)
+        account = self.db.read_account('carol')
+        self.assertEqual((account['trade_day'], account['trade_count']), (today, 2))
+
+    def test_read_transactions_pages_by_id_and_time(self):
+        self.db.write_account('alice', {'balance': 100.0, 'strategy': '', 'holdings': {}})
+        for day in range(1, 6):
+            trade = {'symbol': 'AAPL', 'quantity': 1, 'price': 1.0, 'timestamp': f'2025-01-0{day} 10:00:00', 'rationale': str(day)}
+            self.db.write_fill('alice', {'balance': 100.0}, 'AAPL', day, trade)
+        first = self.db.read_transactions('alice', limit=2)
+        self.assertEqual([t['rationale'] for t in first], ['1', '2'])
+        following = self.db.read_transactions('alice', after_id=first[-1]['id'], limit=2)
+        self.assertEqual([t['rationale'] for t in following], ['3', '4'])
+        self.assertEqual([t['rationale'] for t in self.db.read_transactions('alice', since='2025-01-04')], ['4', '5'])
+
+    def test_migrates_legacy_account_blobs(self):
+        path = os.path.join(self.tmp.name, 'legacy.db')
+        legacy = {
+            'name': 'bob',
+            'balance': 50.0,
+            'strategy': 'value',
+            'holdings': {'MSFT': 2},
+            'transactions': [{'symbol': 'MSFT', 'quantity': 2, 'price': 25.0, 'timestamp': '2025-01-01 09:30:00', 'rationale': 'r'}],
+            'portfolio_value_time_series': [['2025-01-01 09:30:00', 100.0]],
+        }
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE accounts (name TEXT PRIMARY KEY, account TEXT)')
+            conn.execute('INSERT INTO accounts VALUES (?, ?)', ('bob', json.dumps(legacy)))
+
+        self.db = self.open(path)
+        account = self.db.read_account('bob')
+        self.assertEqual(account['holdings'], {'MSFT': 2})
+        self.assertEqual(account['average_costs'], {'MSFT': 25.0})
+        self.assertEqual(account['net_invested'], 50.0)
+        self.assertEqual(self.db.read_transactions('bob'), [{'id': 1, **legacy['transactions'][0]}])
+        self.assertEqual(self.db.read_portfolio_values('bob'), [(1, '2025-01-01 09:30:00', 100.0)])
+        tables = {row[0] for row in self.db.connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn('accounts_blob', tables)
+        self.assertEqual(self.db.read_account_snapshot('bob')[1]['holdings'], {'MSFT': 2})
+
+    def test_claim_account_version_is_compare_and_swap(self):
+        self.db.write_account('alice', {'balance': 1.0, 'strategy': '', 'holdings': {}})
+        with self.db.transaction():
+            self.db.claim_account_version('alice', 0)
+        with self.assertRaises(database.VersionConflictError):
+            with self.db.transaction():
+                self.db.claim_account_version('alice', 0)
+        self.assertEqual(self.db.read_account('alice')['version'], 1)
+
+    def test_market_prices_by_symbol(self):
+        self.db.write_market('2025-01-02', {'AAPL': 190.5, 'MSFT': 410.0, 'BAD': None})
+        self.assertTrue(self.db.has_market('2025-01-02'))
+        self.assertFalse(self.db.has_market('2025-01-03'))
+        self.assertEqual(self.db.read_market_price('2025-01-02', 'MSFT'), 410.0)
+        self.assertIsNone(self.db.read_market_price('2025-01-02', 'BAD'))
+        self.assertEqual(self.db.read_market_prices('2025-01-02', ['AAPL', 'MSFT', 'NOPE']), {'AAPL': 190.5, 'MSFT': 410.0})
+        self.assertEqual(self.db.read_market('2025-01-02'), {'AAPL': 190.5, 'MSFT': 410.0})
+
+        self.db.write_market('2025-01-02', {'AAPL': 191.0})
+        self.assertEqual(self.db.read_market('2025-01-02'), {'AAPL': 191.0})
+
+    def test_migrates_legacy_market_blobs(self):
+        path = os.path.join(self.tmp.name, 'legacy_market.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE market (date TEXT PRIMARY KEY, data TEXT)')
+            conn.execute('INSERT INTO market VALUES (?, ?)', ('2025-01-02', json.dumps({'SPY': 590.25})))
+
+        self.db = self.open(path)
+        self.assertEqual(self.db.read_market_price('2025-01-02', 'SPY'), 590.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
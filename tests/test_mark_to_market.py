@@ -0,0 +1,34 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import mark_to_market
+from storage import InMemoryStorage, use_storage
+
+
+class MarkToMarketTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = self.enterContext(use_storage(InMemoryStorage()))
+
+    def test_values_every_account_from_one_snapshot(self):
+        self.storage.write_account('alice', {'balance': 100.0, 'strategy': '', 'holdings': {'AAPL': 2, 'MSFT': 1}})
+        self.storage.write_account('bob', {'balance': 50.0, 'strategy': '', 'holdings': {'AAPL': 1}})
+        self.storage.write_account('carol', {'balance': 10.0, 'strategy': '', 'holdings': {}})
+
+        prices = {'AAPL': 10.0, 'MSFT': 20.0}
+        with patch('mark_to_market.get_share_prices', side_effect=lambda symbols: {s: prices[s] for s in symbols}) as fetch:
+            values = mark_to_market.mark_to_market()
+        fetch.assert_called_once_with(['AAPL', 'MSFT'])
+        self.assertEqual(values, {'alice': 140.0, 'bob': 60.0, 'carol': 10.0})
+        self.assertEqual([value for _, _, value in self.storage.read_portfolio_values('alice')], [140.0])
+        self.assertEqual([value for _, _, value in self.storage.read_portfolio_values('carol')], [10.0])
+
+    def test_unknown_prices_value_holdings_at_zero(self):
+        positions = [('alice', 100.0, 'AAPL', 2), ('alice', 100.0, 'NOPE', 5), ('bob', 5.0, None, None)]
+        self.assertEqual(mark_to_market.value_accounts(positions, {'AAPL': 10.0}), {'alice': 120.0, 'bob': 5.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,27 +1,166 @@
 import sys
 import os
+import asyncio
+import time
 import unittest
 from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath('3_trading_floor'))
 import market
+from price_snapshot import PriceSnapshot
+from simulator import MarketSimulator
+from storage import InMemoryStorage, use_storage
 
 class MarketIntegrationTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = self.enterContext(use_storage(InMemoryStorage()))
+        self.enterContext(patch.dict(market.price_cache, clear=True))
+        self.enterContext(patch.object(market, 'shared_prices', PriceSnapshot(None)))
+
     def test_get_share_price_no_key(self):
         with patch.object(market, 'polygon_api_key', None), \
-             patch('market.read_market', return_value=None):
-            price = market.get_share_price('AAPL')
-            self.assertEqual(price, 0.0)
+             patch.object(self.storage, 'read_market_price', return_value=None), \
+             patch.object(self.storage, 'read_market_prices', return_value={}):
+            self.assertIsNone(market.get_price_provider())
+            self.assertEqual(market.get_share_price('AAPL'), 0.0)
+            self.assertEqual(market.get_share_prices(['AAPL']), {'AAPL': 0.0})
+
+    def test_simulator_is_used_only_when_configured(self):
+        with patch.object(market, 'polygon_api_key', None), patch.object(market, 'PRICE_PROVIDER', 'simulated'):
+            self.assertIsInstance(market.get_price_provider(), MarketSimulator)
 
     def test_get_share_price_api_error(self):
         with patch.object(market, 'polygon_api_key', 'key'), \
              patch.object(market, 'get_share_price_polygon', side_effect=RuntimeError('fail')) as func, \
-             patch('market.read_market', return_value=None), \
+             patch.object(self.storage, 'read_market_price', return_value=None), \
              patch('market.log_exception') as log_exc:
             price = market.get_share_price('AAPL', retries=1)
             self.assertEqual(price, 0.0)
             self.assertEqual(func.call_count, 2)
             self.assertTrue(log_exc.called)
 
+    def test_get_share_prices_single_batched_request(self):
+        with patch.object(market, 'polygon_api_key', 'key'), \
+             patch.object(market, 'get_share_prices_polygon', return_value={'AAPL': 1.0, 'MSFT': 2.0}) as func:
+            prices = market.get_share_prices(['AAPL', 'MSFT', 'AAPL', 'NOPE'])
+            self.assertEqual(prices, {'AAPL': 1.0, 'MSFT': 2.0, 'NOPE': 0.0})
+            func.assert_called_once_with(['AAPL', 'MSFT', 'NOPE'])
+
+    def test_get_share_prices_api_error_uses_cache(self):
+        with patch.object(market, 'polygon_api_key', 'key'), \
+             patch.dict(market.price_cache, {'AAPL': 5.0}, clear=True), \
+             patch.object(market, 'get_share_prices_polygon', side_effect=RuntimeError('fail')), \
+             patch.object(self.storage, 'read_market_prices', return_value={'MSFT': 6.0}) as read, \
+             patch('market.log_exception'), patch('market.time.sleep'):
+            prices = market.get_share_prices(['AAPL', 'MSFT', 'NOPE'])
+            self.assertEqual(prices, {'AAPL': 5.0, 'MSFT': 6.0, 'NOPE': 0.0})
+            read.assert_called_once()
+            self.assertEqual(read.call_args[0][1], ['MSFT', 'NOPE'])
+
+    def test_fresh_price_batches_are_published_to_listeners(self):
+        batches = []
+        with patch.object(market, 'polygon_api_key', 'key'), \
+             patch.object(market, 'price_listeners', []), \
+             patch.dict(market.price_cache, clear=True), \
+             patch.object(market, 'get_share_prices_polygon', return_value={'AAPL': 1.0}):
+            market.add_price_listener(batches.append)
+            market.add_price_listener(batches.append)
+            market.get_share_prices(['AAPL'])
+            with patch.object(market, 'polygon_api_key', None), patch.object(self.storage, 'read_market_prices', return_value={}):
+                market.get_share_prices(['AAPL'])
+        self.assertEqual(batches, [{'AAPL': 1.0}])
+
+    def test_price_snapshot_id_matches_how_often_prices_move(self):
+        def snapshot_id(plan, paid=False, stream=False):
+            with patch.object(market, 'price_plan', plan), patch.object(market, 'is_paid_polygon', paid), \
+                 patch.object(market, 'PRICE_STREAM', stream):
+                return market.price_snapshot_id()
+        self.assertEqual(len(snapshot_id('eod')), len('2025-01-02'))
+        self.assertEqual(len(snapshot_id('paid', paid=True)), len('2025-01-02 10:00'))
+        self.assertEqual(len(snapshot_id('realtime')), len('2025-01-02 10:00:00'))
+        self.assertEqual(len(snapshot_id('paid', paid=True, stream=True)), len('2025-01-02 10:00:00'))
+
+
+class PriceCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = self.enterContext(use_storage(InMemoryStorage()))
+        self.now = 0.0
+        self.cache = market.PriceCache(maxsize=2, ttl=60, max_stale=300, clock=lambda: self.now)
+        self.enterContext(patch.object(market, 'price_cache', self.cache))
+        self.enterContext(patch.object(market, 'shared_prices', PriceSnapshot(None)))
+        self.enterContext(patch.object(market, 'polygon_api_key', 'key'))
+        self.enterContext(patch('market.log_exception'))
+        self.enterContext(patch('market.time.sleep'))
+
+    def test_fresh_prices_are_served_without_fetching(self):
+        with patch.object(market, 'get_share_prices_polygon', side_effect=lambda symbols: {s: 1.0 for s in symbols}) as fetch:
+            market.get_share_prices(['AAPL', 'MSFT'])
+            self.now = 30
+            self.assertEqual(market.get_share_prices(['AAPL', 'MSFT']), {'AAPL': 1.0, 'MSFT': 1.0})
+            self.assertEqual(fetch.call_count, 1)
+            self.now = 61
+            market.get_share_prices(['MSFT'])
+            fetch.assert_called_with(['MSFT'])
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['max_age_served']), (2, 3, 30))
+
+    def test_stale_prices_are_served_on_error_within_limit(self):
+        self.cache['AAPL'] = 5.0
+        self.now = 200
+        with patch.object(market, 'get_share_price_polygon', side_effect=RuntimeError('fail')):
+            self.assertEqual(market.get_share_price('AAPL'), 5.0)
+            self.now = 301
+            self.assertEqual(market.get_share_price('AAPL'), 0.0)
+        self.assertEqual(self.cache.stats()['stale_hits'], 1)
+
+    def test_least_recently_used_price_is_evicted(self):
+        self.cache['AAPL'] = 1.0
+        self.cache['MSFT'] = 2.0
+        self.cache.fresh(['AAPL'])
+        self.cache['GOOG'] = 3.0
+        self.assertEqual(sorted(self.cache), ['AAPL', 'GOOG'])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+
+class AsyncPriceServiceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.enterContext(use_storage(InMemoryStorage()))
+        self.enterContext(patch.object(market, 'price_cache', market.PriceCache()))
+        self.enterContext(patch.object(market, 'shared_prices', PriceSnapshot(None)))
+        self.enterContext(patch.object(market, 'polygon_api_key', 'key'))
+        self.enterContext(patch('market.log_exception'))
+        self.requests = []
+
+    def slow_fetch(self, symbols):
+        self.requests.append(list(symbols))
+        time.sleep(0.05)
+        return {symbol: 1.0 for symbol in symbols}
+
+    async def test_concurrent_requests_share_one_fetch(self):
+        with patch.object(market, 'get_share_prices_polygon', side_effect=self.slow_fetch):
+            results = await asyncio.gather(
+                *(market.get_share_price_async('AAPL') for _ in range(5)),
+                market.get_share_prices_async(['AAPL', 'MSFT']),
+            )
+        self.assertEqual(results[:5], [1.0] * 5)
+        self.assertEqual(results[5], {'AAPL': 1.0, 'MSFT': 1.0})
+        self.assertEqual(self.requests, [['AAPL'], ['MSFT']])
+        self.assertEqual(market._in_flight, {})
+
+    async def test_retries_back_off_without_blocking(self):
+        fetch = patch.object(market, 'get_share_prices_polygon', side_effect=[RuntimeError('fail'), RuntimeError('fail'), {'AAPL': 2.0}])
+        with fetch, patch('market.asyncio.sleep', wraps=asyncio.sleep) as sleep, patch('market.time.sleep') as blocking:
+            self.assertEqual(await market.get_share_price_async('AAPL'), 2.0)
+        self.assertEqual(sleep.await_count, 2)
+        blocking.assert_not_called()
+
+    async def test_failures_fall_back_to_cached_prices(self):
+        market.price_cache['AAPL'] = 5.0
+        market.price_cache.ttl = 0
+        with patch.object(market, 'get_share_prices_polygon', side_effect=RuntimeError('fail')), \
+             patch.object(market, 'PRICE_RETRY_BACKOFF', 0):
+            self.assertEqual(await market.get_share_prices_async(['AAPL', 'NOPE'], retries=1), {'AAPL': 5.0, 'NOPE': 0.0})
+
+
 if __name__ == '__main__':
     unittest.main()
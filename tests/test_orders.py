@@ -0,0 +1,115 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import accounts
+import orders
+from database import VersionConflictError
+from storage import InMemoryStorage, use_storage
+
+
+class OrderBookTest(unittest.TestCase):
+    def order(self, id, order_type, side, trigger):
+        return orders.RestingOrder(id=id, name='alice', side=side, symbol='AAPL', quantity=1,
+                                   order_type=order_type, trigger_price=trigger, rationale='')
+
+    def test_pops_only_crossed_triggers(self):
+        book = orders.OrderBook()
+        book.add(self.order(1, 'limit', 'buy', 90.0))
+        book.add(self.order(2, 'stop_loss', 'sell', 95.0))
+        book.add(self.order(3, 'take_profit', 'sell', 120.0))
+        book.add(self.order(4, 'limit', 'sell', 110.0))
+
+        self.assertEqual(book.triggered({'AAPL': 100.0, 'MSFT': 1.0}), [])
+        self.assertEqual([o.id for o in book.triggered({'AAPL': 94.0})], [2])
+        self.assertEqual([o.id for o in book.triggered({'AAPL': 125.0})], [3, 4])
+        book.remove(1)
+        self.assertEqual(book.triggered({'AAPL': 80.0}), [])
+        self.assertEqual(book.orders, {})
+
+
+class RestingOrdersTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = self.enterContext(use_storage(InMemoryStorage()))
+
+        self.prices = {'AAPL': 100.0}
+        for target in ('accounts.get_share_prices', 'orders.get_share_prices'):
+            prices = patch(target, side_effect=lambda symbols: {s: self.prices[s] for s in symbols})
+            prices.start()
+            self.addCleanup(prices.stop)
+        for target, value in (('orders.order_book', orders.OrderBook()), ('accounts._report_cache', {})):
+            replaced = patch(target, value)
+            replaced.start()
+            self.addCleanup(replaced.stop)
+        self.account = accounts.Account.get('Dave')
+        self.account.buy_shares('AAPL', 10, 'open')
+
+    def test_stop_loss_fills_once_when_crossed(self):
+        stop = orders.place_order('Dave', 'sell', 'AAPL', 10, 'stop_loss', 90.0, 'cut losses')
+        self.assertEqual(orders.list_orders('dave'), [stop])
+
+        self.assertEqual(orders.check_resting_orders(), 0)
+        self.prices['AAPL'] = 89.0
+        self.assertEqual(orders.check_resting_orders(), 1)
+        self.assertEqual(orders.check_resting_orders(), 0)
+
+        account = accounts.Account.get('Dave')
+        self.assertEqual(account.holdings, {})
+        self.assertIn('stop loss at 90.0', account.transactions[-1].rationale)
+        self.assertEqual(orders.list_orders('dave'), [])
+
+    def test_orders_placed_elsewhere_are_synced_and_cancel_is_respected(self):
+        other_process = orders.OrderBook()
+        first = orders.place_order('Dave', 'buy', 'AAPL', 5, 'limit', 95.0, 'dip')
+        second = orders.place_order('Dave', 'buy', 'AAPL', 5, 'limit', 96.0, 'dip')
+        self.assertFalse(orders.cancel_order('someone else', first.id))
+        self.assertTrue(orders.cancel_order('Dave', first.id))
+
+        other_process.on_prices({'AAPL': 94.0})
+        self.assertEqual(accounts.Account.get('Dave').holdings, {'AAPL': 15})
+        self.assertEqual(orders.order_book.triggered({'AAPL': 94.0}), [second])
+        self.assertFalse(orders.fill_order(second, {'AAPL': 94.0}))
+        self.assertEqual(accounts.Account.get('Dave').holdings, {'AAPL': 15})
+
+    def test_unfillable_order_is_dropped_with_risk_log(self):
+        orders.place_order('Dave', 'sell', 'AAPL', 10, 'take_profit', 110.0, 'exit')
+        self.account.sell_shares('AAPL', 10, 'sold early')
+        self.prices['AAPL'] = 111.0
+        with patch('orders.log_risk') as log_risk:
+            self.assertEqual(orders.check_resting_orders(), 0)
+        self.assertIn('cancelled', log_risk.call_args[0][1])
+        self.assertEqual(orders.list_orders('dave'), [])
+
+    def test_order_losing_a_version_race_fires_on_a_later_batch(self):
+        stop = orders.place_order('Dave', 'sell', 'AAPL', 10, 'stop_loss', 90.0, 'cut losses')
+        other = orders.place_order('Dave', 'buy', 'AAPL', 1, 'limit', 95.0, 'dip')
+        self.prices['AAPL'] = 89.0
+        with patch.object(accounts.Account, 'fill_orders', side_effect=VersionConflictError('dave')), \
+             patch('orders.log_exception') as log:
+            self.assertEqual(orders.check_resting_orders(), 0)
+        self.assertEqual(log.call_count, 2)
+        self.assertEqual(orders.list_orders('dave'), [stop, other])
+        self.assertEqual(orders.check_resting_orders(), 2)
+        self.assertEqual(orders.list_orders('dave'), [])
+
+    def test_prices_are_fetched_before_the_fill_transaction(self):
+        self.prices['MSFT'] = 400.0
+        self.account.buy_shares('MSFT', 1, 'open')
+        orders.place_order('Dave', 'sell', 'AAPL', 10, 'stop_loss', 90.0, 'cut losses')
+        with patch('accounts.get_share_prices', side_effect=AssertionError('fetched under the write lock')), \
+             patch('orders.get_share_prices', return_value={'MSFT': 401.0}) as fetch:
+            orders.order_book.on_prices({'AAPL': 89.0})
+        fetch.assert_called_once_with(['MSFT'])
+        self.assertEqual(accounts.Account.get('Dave').holdings, {'MSFT': 1})
+
+    def test_validates_order(self):
+        with self.assertRaisesRegex(ValueError, 'must be sells'):
+            orders.place_order('Dave', 'buy', 'AAPL', 1, 'stop_loss', 90.0, '')
+        with self.assertRaisesRegex(ValueError, 'Not enough shares'):
+            orders.place_order('Dave', 'sell', 'AAPL', 11, 'limit', 120.0, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
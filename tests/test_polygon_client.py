@@ -0,0 +1,78 @@
+import sys
+import os
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import market
+from storage import InMemoryStorage, use_storage
+
+
+class PolygonStub(BaseHTTPRequestHandler):
+    """Answers the Polygon endpoints the market module uses, over keep-alive HTTP/1.1."""
+
+    protocol_version = 'HTTP/1.1'
+    responses = {
+        '/v1/marketstatus/now': {'market': 'open'},
+        '/v2/aggs/ticker/SPY/prev': {'results': [{'T': 'SPY', 'c': 590.0, 't': 1735851600000}]},
+        '/v2/snapshot/locale/us/markets/stocks/tickers/AAPL': {'ticker': {'ticker': 'AAPL', 'min': {'c': 190.5}}},
+        # Only AAPL has traded this minute; MSFT has a trade but no minute bar, QUIET nothing yet
+        '/v2/snapshot/locale/us/markets/stocks/tickers': {'tickers': [
+            {'ticker': 'AAPL', 'min': {'c': 190.5}},
+            {'ticker': 'MSFT', 'lastTrade': {'p': 410.25}},
+            {'ticker': 'QUIET', 'day': {'c': 0}},
+        ]},
+    }
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.startswith('/v2/aggs/grouped/locale/us/market/stocks/'):
+            body = {'results': [{'T': 'AAPL', 'c': 190.0}, {'T': 'MSFT', 'c': 410.0}]}
+        else:
+            body = self.responses.get(path)
+        payload = json.dumps(body or {}).encode()
+        self.send_response(200 if body else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PolygonClientTest(unittest.TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PolygonStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.enterContext(use_storage(InMemoryStorage()))
+        self.enterContext(patch.object(market, 'polygon_api_key', 'key'))
+        self.enterContext(patch.object(market, 'POLYGON_BASE_URL', f'http://127.0.0.1:{server.server_port}'))
+        self.enterContext(patch.object(market, '_polygon_client', None))
+        self.addCleanup(market.close_polygon_client)
+
+    def test_client_is_shared_and_connections_reused(self):
+        self.assertIs(market.get_polygon_client(), market.get_polygon_client())
+        self.assertTrue(market.is_market_open())
+        self.assertEqual(market.get_all_share_prices_polygon_eod(), {'AAPL': 190.0, 'MSFT': 410.0})
+        self.assertEqual(market.get_share_price_polygon_min('AAPL'), 190.5)
+        self.assertEqual(market.polygon_client_stats(), {'connections': 1, 'requests': 4, 'reused': 3})
+
+    def test_snapshot_batch_skips_tickers_without_a_minute_bar(self):
+        self.assertEqual(market.get_share_prices_polygon_min(['AAPL', 'MSFT', 'QUIET']), {'AAPL': 190.5, 'MSFT': 410.25})
+
+    def test_close_drops_the_client(self):
+        client = market.get_polygon_client()
+        market.close_polygon_client()
+        self.assertIsNot(market.get_polygon_client(), client)
+        self.assertEqual(market.polygon_client_stats()['requests'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import sys
+import os
+import json
+import threading
+import time
+import unittest
+from functools import partial
+from unittest.mock import patch
+
+from websockets.sync.server import serve
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import market
+from price_bus import PriceBus, PolygonTradeFeed
+from price_snapshot import PriceSnapshot
+from storage import InMemoryStorage, use_storage
+
+
+class PolygonStreamStub:
+    """A local stand-in for Polygon's websocket: authenticates, then answers each subscription with one trade per symbol."""
+
+    def __init__(self, prices: dict[str, float]):
+        self.prices = prices
+        self.server = serve(self.handle, '127.0.0.1', 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.host = f'127.0.0.1:{self.server.socket.getsockname()[1]}'
+
+    def handle(self, websocket):
+        websocket.send(json.dumps([{'ev': 'status', 'status': 'connected', 'message': 'Connected'}]))
+        websocket.recv()
+        websocket.send(json.dumps([{'ev': 'status', 'status': 'auth_success', 'message': 'authenticated'}]))
+        for message in websocket:
+            request = json.loads(message)
+            if request['action'] != 'subscribe':
+                continue
+            symbols = [topic.removeprefix('T.') for topic in request['params'].split(',')]
+            trades = [{'ev': 'T', 'sym': s, 'p': self.prices[s], 's': 100, 't': 1735851600000} for s in symbols]
+            websocket.send(json.dumps(trades))
+
+    def close(self):
+        self.server.shutdown()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out waiting for the price stream')
+        time.sleep(0.01)
+
+
+class PriceBusTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.bus = PriceBus(clock=lambda: self.now)
+
+    def test_publish_updates_last_trades(self):
+        self.bus.publish({'AAPL': 190.0, 'MSFT': 410.0})
+        self.bus.publish({'AAPL': 191.0})
+        self.assertEqual(self.bus.last(['AAPL', 'MSFT', 'TSLA']), {'AAPL': 191.0, 'MSFT': 410.0})
+        self.assertEqual(self.bus.symbols(), ['AAPL', 'MSFT'])
+        self.assertEqual(self.bus.ticks, 3)
+
+    def test_last_skips_old_trades(self):
+        self.bus.publish({'AAPL': 190.0})
+        self.now += 120
+        self.assertEqual(self.bus.last(['AAPL'], max_age=60), {})
+        self.assertEqual(self.bus.last(['AAPL'], max_age=300), {'AAPL': 190.0})
+
+    def test_subscribers_get_their_symbols(self):
+        everything, apple = [], []
+        self.bus.subscribe(everything.append)
+        unsubscribe = self.bus.subscribe(apple.append, symbols=['AAPL'])
+        self.bus.publish({'AAPL': 190.0, 'MSFT': 410.0})
+        self.bus.publish({'MSFT': 411.0})
+        unsubscribe()
+        self.bus.publish({'AAPL': 192.0})
+        self.assertEqual(everything, [{'AAPL': 190.0, 'MSFT': 410.0}, {'MSFT': 411.0}, {'AAPL': 192.0}])
+        self.assertEqual(apple, [{'AAPL': 190.0}])
+
+    def test_failing_subscriber_does_not_stop_others(self):
+        received = []
+        self.bus.subscribe(lambda prices: 1 / 0)
+        self.bus.subscribe(received.append)
+        with patch('price_bus.log_exception') as log:
+            self.bus.publish({'AAPL': 190.0})
+        log.assert_called_once()
+        self.assertEqual(received, [{'AAPL': 190.0}])
+
+
+class PolygonTradeFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = PolygonStreamStub({'AAPL': 190.5, 'MSFT': 410.25})
+        self.addCleanup(self.stub.close)
+        self.bus = PriceBus()
+
+    def test_trades_stream_into_bus(self):
+        feed = PolygonTradeFeed('key', self.bus, self.stub.host, secure=False, symbols=['AAPL']).start()
+        self.addCleanup(feed.stop)
+        wait_for(lambda: self.bus.last(['AAPL']))
+        feed.watch(['MSFT', 'AAPL'])
+        wait_for(lambda: self.bus.last(['MSFT']))
+        self.assertEqual(self.bus.last(['AAPL', 'MSFT']), {'AAPL': 190.5, 'MSFT': 410.25})
+        feed.stop()
+        self.assertFalse(feed.running)
+
+
+class StreamedPricesMarketTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = PolygonStreamStub({'AAPL': 190.5})
+        self.addCleanup(self.stub.close)
+        self.bus = PriceBus()
+        self.enterContext(use_storage(InMemoryStorage()))
+        self.enterContext(patch.object(market, 'price_bus', self.bus))
+        self.enterContext(patch.object(market, 'price_cache', market.PriceCache()))
+        self.enterContext(patch.object(market, 'shared_prices', PriceSnapshot(None)))
+        self.enterContext(patch.object(market, 'price_listeners', []))
+        self.enterContext(patch.object(market, 'polygon_api_key', 'key'))
+        self.enterContext(patch.object(market, 'POLYGON_STREAM_HOST', self.stub.host))
+        self.enterContext(patch.object(market, 'PolygonTradeFeed', partial(PolygonTradeFeed, secure=False)))
+        self.addCleanup(market.stop_price_stream)
+
+    def test_streamed_trades_are_served_without_fetching(self):
+        self.bus.publish({'AAPL': 190.5})
+        with patch('market.get_share_prices_polygon') as fetch:
+            self.assertEqual(market.get_share_prices(['AAPL']), {'AAPL': 190.5})
+        fetch.assert_not_called()
+
+    def test_stream_pushes_to_price_listeners(self):
+        batches = []
+        market.add_price_listener(batches.append)
+        market.start_price_stream(['AAPL'])
+        wait_for(lambda: batches)
+        self.assertEqual(batches, [{'AAPL': 190.5}])
+        market.stop_price_stream()
+        self.assertIsNone(market.price_stream)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import sys
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import market
+from price_snapshot import PriceSnapshot, snapshot_path
+from simulator import MarketSimulator
+from storage import InMemoryStorage, use_storage
+
+
+class PriceSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'prices.snap')
+        self.snapshot = PriceSnapshot(self.path, check_interval=0)
+        self.addCleanup(self.snapshot.close)
+
+    def test_missing_file_finds_nothing(self):
+        self.assertEqual(self.snapshot.lookup(['AAPL']), {})
+        self.assertIsNone(self.snapshot.get('AAPL'))
+
+    def test_unreadable_file_finds_nothing_and_is_replaced_on_publish(self):
+        for content in (b'', b'PXSNAP', b'not a price snapshot at all'):
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            with patch('price_snapshot.log_exception') as log:
+                self.snapshot.close()
+                self.assertEqual(self.snapshot.lookup(['AAPL']), {})
+            log.assert_called_once()
+        with patch('price_snapshot.log_exception'):
+            self.snapshot.publish({'AAPL': 190.0})
+        self.assertEqual(self.snapshot.get('AAPL'), 190.0)
+
+    def test_publish_merges_into_snapshot(self):
+        self.snapshot.publish({'MSFT': 410.0, 'AAPL': 190.0})
+        self.snapshot.publish({'AAPL': 191.0, 'BRK.B': 450.0})
+        self.assertEqual(self.snapshot.get('AAPL'), 191.0)
+        self.assertEqual(self.snapshot.get('MSFT'), 410.0)
+        self.assertEqual(self.snapshot.fresh(['BRK.B', 'TSLA', 'AAPLX', 'A'], 60), {'BRK.B': 450.0})
+
+    def test_fresh_skips_old_prices(self):
+        self.snapshot.publish({'AAPL': 190.0})
+        with patch('price_snapshot.time.time', return_value=time.time() + 120):
+            self.assertEqual(self.snapshot.fresh(['AAPL'], 60), {})
+            self.assertEqual(self.snapshot.fresh(['AAPL'], 300), {'AAPL': 190.0})
+
+    def test_reader_sees_later_snapshot(self):
+        reader = PriceSnapshot(self.path, check_interval=0)
+        self.addCleanup(reader.close)
+        self.snapshot.publish({'AAPL': 190.0})
+        self.assertEqual(reader.get('AAPL'), 190.0)
+        self.snapshot.publish({'AAPL': 192.0})
+        self.assertEqual(reader.get('AAPL'), 192.0)
+
+    def test_other_process_reads_published_prices(self):
+        self.snapshot.publish({'AAPL': 190.0, 'MSFT': 410.0})
+        code = (
+            "import sys; sys.path.insert(0, '3_trading_floor');"
+            "from price_snapshot import PriceSnapshot;"
+            f"print(PriceSnapshot({self.path!r}).fresh(['AAPL', 'MSFT', 'TSLA'], 60))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "{'AAPL': 190.0, 'MSFT': 410.0}")
+
+    def test_disabled_snapshot(self):
+        snapshot = PriceSnapshot(None)
+        snapshot.publish({'AAPL': 190.0})
+        self.assertEqual(snapshot.lookup(['AAPL']), {})
+
+
+class SharedPricesMarketTest(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'prices.snap')
+        self.snapshot = PriceSnapshot(path, check_interval=0)
+        self.addCleanup(self.snapshot.close)
+        self.enterContext(use_storage(InMemoryStorage()))
+        self.enterContext(patch.object(market, 'shared_prices', self.snapshot))
+        self.enterContext(patch.object(market, 'price_cache', market.PriceCache()))
+        self.enterContext(patch.object(market, 'polygon_api_key', 'key'))
+
+    def test_fetched_prices_are_shared(self):
+        with patch('market.get_share_prices_polygon', return_value={'AAPL': 190.0}):
+            market.get_share_prices(['AAPL'])
+        self.assertEqual(self.snapshot.get('AAPL'), 190.0)
+
+    def test_prices_another_process_fetched_are_served(self):
+        self.snapshot.publish({'AAPL': 190.0})
+        with patch('market.get_share_prices_polygon', return_value={'MSFT': 410.0}) as fetch:
+            self.assertEqual(market.get_share_prices(['AAPL', 'MSFT']), {'AAPL': 190.0, 'MSFT': 410.0})
+        fetch.assert_called_once_with(['MSFT'])
+        with patch('market.get_share_price_polygon') as fetch:
+            self.assertEqual(market.get_share_price('AAPL'), 190.0)
+        fetch.assert_not_called()
+
+    def test_prices_from_a_provider_set_in_process_are_not_shared(self):
+        with market.use_price_provider(MarketSimulator(seed=3)):
+            market.get_share_prices(['AAPL'])
+        self.assertIsNone(self.snapshot.get('AAPL'))
+
+    def test_each_source_has_its_own_snapshot(self):
+        paths = {snapshot_path(market.price_source(kind)) for kind in ('polygon', 'simulated')}
+        self.assertEqual(len(paths), 2)
+        with patch.object(market, 'SIMULATOR_SEED', 1):
+            self.assertNotIn(snapshot_path(market.price_source('simulated')), paths)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import accounts
+import market
+from price_snapshot import PriceSnapshot
+from simulator import MarketSimulator, SECONDS_PER_YEAR
+from storage import InMemoryStorage, use_storage
+
+NOW = 1_760_000_000.0  # 2025-10-09 08:53:20 UTC
+
+
+class MarketSimulatorTest(unittest.TestCase):
+    def setUp(self):
+        self.now = NOW
+        self.clock = lambda: self.now
+
+    def test_prices_depend_only_on_seed_symbol_and_time(self):
+        first = MarketSimulator(seed=7, clock=self.clock)
+        first.get_prices(['AAPL'])
+        self.now += 600
+        prices = first.get_prices(['AAPL', 'MSFT'])
+        second = MarketSimulator(seed=7, clock=self.clock)
+        self.assertEqual(second.get_prices(['MSFT', 'AAPL']), prices)
+        self.assertNotEqual(MarketSimulator(seed=8, clock=self.clock).get_prices(['AAPL', 'MSFT']), prices)
+        self.assertTrue(all(price > 0 for price in prices.values()))
+
+    def test_prices_move_with_the_tick(self):
+        simulator = MarketSimulator(clock=self.clock)
+        before = simulator.get_price('AAPL')
+        self.now += 0.5
+        self.assertEqual(simulator.get_price('AAPL'), before)
+        self.now += 3600
+        self.assertNotEqual(simulator.get_price('AAPL'), before)
+
+    def test_simulate_matches_served_prices(self):
+        simulator = MarketSimulator(seed=3, tick_rate=10, clock=self.clock)
+        day, tick = simulator._today(self.now)
+        paths = simulator.simulate(['AAPL', 'MSFT'], tick + 1, day)
+        self.assertEqual(paths.shape, (tick + 1, 2))
+        served = simulator.get_prices(['AAPL', 'MSFT'])
+        self.assertAlmostEqual(served['AAPL'], paths[-1, 0], places=2)
+        self.assertAlmostEqual(served['MSFT'], paths[-1, 1], places=2)
+
+    def test_symbols_outside_the_universe_have_no_price(self):
+        simulator = MarketSimulator(clock=self.clock, symbols=['AAPL', 'MSFT'])
+        self.assertEqual(list(simulator.get_prices(['AAPL', 'MADEUP', 'MSFT'])), ['AAPL', 'MSFT'])
+        self.assertEqual(simulator.get_price('MADEUP'), 0.0)
+
+    def test_returns_have_configured_volatility_and_correlation(self):
+        simulator = MarketSimulator(seed=1, volatility=0.3, correlation=0.6, jump_rate=0.0, clock=self.clock)
+        paths = simulator.simulate(['AAPL', 'MSFT'], 200_000)
+        returns = np.diff(np.log(paths), axis=0)
+        self.assertAlmostEqual(np.corrcoef(returns.T)[0, 1], 0.6, delta=0.02)
+        annualized = returns.std(axis=0) * np.sqrt(SECONDS_PER_YEAR)
+        self.assertTrue(np.all((annualized > 0.15) & (annualized < 0.45)))
+
+
+class SimulatedProviderTest(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(use_storage(InMemoryStorage()))
+        self.enterContext(patch.object(market, 'price_cache', market.PriceCache()))
+        self.enterContext(patch.object(market, 'shared_prices', PriceSnapshot(None)))
+        self.simulator = self.enterContext(market.use_price_provider(MarketSimulator(seed=5, clock=lambda: NOW)))
+
+    def test_get_share_prices_uses_provider(self):
+        prices = market.get_share_prices(['AAPL', 'MSFT'])
+        self.assertEqual(prices, MarketSimulator(seed=5, clock=lambda: NOW).get_prices(['AAPL', 'MSFT']))
+        self.assertEqual(market.get_share_price('AAPL'), prices['AAPL'])
+
+    def test_made_up_symbols_cannot_be_bought(self):
+        self.enterContext(market.use_price_provider(MarketSimulator(seed=5, clock=lambda: NOW, symbols=['AAPL'])))
+        self.assertEqual(market.get_share_prices(['AAPL', 'MADEUP'])['MADEUP'], 0.0)
+        account = accounts.Account.get('Dave')
+        with patch('accounts.log_risk'), self.assertRaisesRegex(ValueError, 'Unrecognized symbol'):
+            account.buy_shares('MADEUP', 1, 'invented')
+
+    def test_create_price_provider(self):
+        self.assertIsInstance(market.create_price_provider('polygon'), market.PolygonProvider)
+        self.assertIsInstance(market.create_price_provider('simulated'), MarketSimulator)
+        with self.assertRaises(ValueError):
+            market.create_price_provider('nope')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import sys
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('3_trading_floor'))
+import accounts
+import database
+import storage
+from storage import InMemoryStorage, use_storage
+
+
+class StorageContract:
+    """Behaviour every backend must share; subclasses provide make_storage."""
+
+    def setUp(self):
+        self.storage = self.make_storage()
+
+    def test_nested_transaction_rolls_back_only_the_inner_block(self):
+        self.storage.write_account('alice', {'balance': 1.0, 'strategy': '', 'holdings': {'AAPL': 1}})
+        with self.storage.transaction():
+            self.storage.write_portfolio_value('alice', '2025-01-02 16:00:00', 10.0)
+            with self.assertRaises(RuntimeError):
+                with self.storage.transaction():
+                    self.storage.write_account('alice', {'balance': 2.0, 'strategy': '', 'holdings': {}})
+                    self.storage.write_resting_order({'name': 'alice', 'side': 'sell', 'symbol': 'AAPL', 'quantity': 1,
+                                                      'order_type': 'limit', 'trigger_price': 5.0, 'rationale': '',
+                                                      'created': '2025-01-02 10:00:00'})
+                    raise RuntimeError('boom')
+        account = self.storage.read_account('alice')
+        self.assertEqual((account['balance'], account['holdings']), (1.0, {'AAPL': 1}))
+        self.assertEqual([value for _, _, value in self.storage.read_portfolio_values('alice')], [10.0])
+        self.assertEqual(self.storage.read_resting_orders('alice'), [])
+
+    def test_claim_account_version_is_compare_and_swap(self):
+        self.storage.write_account('alice', {'balance': 1.0, 'strategy': '', 'holdings': {}})
+        self.storage.claim_account_version('alice', 0)
+        with self.assertRaises(database.VersionConflictError):
+            self.storage.claim_account_version('alice', 0)
+        self.assertEqual(self.storage.read_account('alice')['version'], 1)
+
+    def test_ledger_pages_and_positions(self):
+        self.storage.write_account('alice', {'balance': 100.0, 'strategy': '', 'holdings': {}})
+        self.storage.write_account('bob', {'balance': 5.0, 'strategy': '', 'holdings': {}})
+        for day in range(1, 6):
+            trade = {'symbol': 'AAPL', 'quantity': 1, 'price': 1.0, 'timestamp': f'2025-01-0{day} 10:00:00', 'rationale': str(day)}
+            self.storage.write_fill('alice', {'balance': 100.0 - day}, 'AAPL', day, trade, avg_cost=1.0)
+        first = self.storage.read_transactions('alice', limit=2)
+        following = self.storage.read_transactions('alice', after_id=first[-1]['id'], limit=2)
+        self.assertEqual([t['rationale'] for t in first + following], ['1', '2', '3', '4'])
+        self.assertEqual([t['rationale'] for t in self.storage.read_transactions('alice', since='2025-01-04')], ['4', '5'])
+        self.assertEqual(self.storage.read_account('alice')['average_costs'], {'AAPL': 1.0})
+        self.assertCountEqual(self.storage.read_positions(), [('alice', 95.0, 'AAPL', 5), ('bob', 5.0, None, None)])
+
+    def test_logs_and_market(self):
+        for i in range(4):
+            self.storage.write_log('alice', 'account', f'a{i}')
+        self.storage.flush_logs()
+        self.assertEqual([message for _, _, message in self.storage.read_log('alice', last_n=2)], ['a2', 'a3'])
+        rows = self.storage.read_log_since('alice', 0, limit=1)
+        self.assertEqual([row[3] for row in rows], ['a3'])
+        self.assertEqual(self.storage.read_log_since('alice', rows[-1][0]), [])
+
+        self.storage.write_market('2025-01-02', {'AAPL': 190.5, 'BAD': None})
+        self.storage.write_market('2025-01-03', {'AAPL': 191.0})
+        self.assertEqual(self.storage.read_market_dates(start='2025-01-03'), ['2025-01-03'])
+        self.assertEqual(self.storage.read_market_prices('2025-01-02', ['AAPL', 'BAD']), {'AAPL': 190.5})
+        self.assertIsNone(self.storage.read_market('2025-01-04'))
+
+    def test_events_are_snapshotted_every_interval(self):
+        self.storage.start_epoch('alice', {'balance': 10.0, 'strategy': 'hold', 'holdings': {}}, 'open', '2025-01-01 09:00:00')
+        with patch('database.SNAPSHOT_INTERVAL', 3), patch('storage.SNAPSHOT_INTERVAL', 3):
+            for day in range(1, 8):
+                self.storage.write_event('alice', {'balance': 10.0 + day, 'strategy': 'hold'}, 'deposit', {'amount': 1.0},
+                                         f'2025-01-0{day} 10:00:00')
+        events = self.storage.read_account_events('alice')
+        self.assertEqual([event['type'] for event in events], ['open'] + ['deposit'] * 7)
+        snapshot_id, state = self.storage.read_account_snapshot('alice')
+        self.assertEqual((snapshot_id, state['balance']), (events[6]['id'], 16.0))
+        self.assertEqual(self.storage.read_account_snapshot('alice', until='2025-01-05 12:00:00')[1]['balance'], 13.0)
+        self.assertEqual(len(self.storage.read_account_events('alice', after_id=events[3]['id'], until_id=events[5]['id'])), 2)
+
+    def test_new_epoch_hides_earlier_history(self):
+        self.storage.start_epoch('alice', {'balance': 10.0, 'strategy': '', 'holdings': {}}, 'open', '2025-01-01 09:00:00')
+        trade = {'symbol': 'AAPL', 'quantity': 1, 'price': 1.0, 'timestamp': '2025-01-02 10:00:00', 'rationale': 'old'}
+        self.storage.write_fill('alice', {'balance': 9.0, 'strategy': ''}, 'AAPL', 1, trade)
+        self.storage.write_portfolio_value('alice', '2025-01-02 16:00:00', 10.0)
+
+        self.storage.start_epoch('alice', {'balance': 10.0, 'strategy': 'new', 'holdings': {}, 'epoch': 1}, 'reset', '2025-01-03 09:00:00')
+        self.assertEqual(self.storage.read_transactions('alice'), [])
+        self.assertEqual(self.storage.read_portfolio_values('alice'), [])
+        self.assertEqual(self.storage.read_account('alice')['holdings'], {})
+        self.assertEqual([event['epoch'] for event in self.storage.read_account_events('alice')], [0, 0, 1])
+
+
+class InMemoryStorageTest(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        return InMemoryStorage()
+
+    def test_accounts_use_the_injected_storage(self):
+        self.enterContext(use_storage(InMemoryStorage()))
+        accounts.Account.get('Erin', self.storage)
+        self.assertIsNotNone(self.storage.read_account('erin'))
+        self.assertIsNone(storage.get_storage().read_account('erin'))
+
+
+class SQLiteStorageTest(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        storage = database.SQLiteStorage(os.path.join(tmp.name, 'test.db'))
+        self.addCleanup(storage.close)
+        return storage
+
+
+class StorageConfigurationTest(unittest.TestCase):
+    def test_importing_opens_no_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            code = 'import sys; sys.path.insert(0, sys.argv[1]); import database, storage, accounts, orders, analytics'
+            subprocess.run([sys.executable, '-c', code, os.path.abspath('3_trading_floor')], cwd=tmp, check=True,
+                           env={**os.environ, 'ACCOUNTS_DB': 'accounts.db'})
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_backend_is_chosen_by_name(self):
+        self.assertIsInstance(storage.create_storage('memory'), InMemoryStorage)
+        with self.assertRaises(ValueError):
+            storage.create_storage('postgres')
+
+
+if __name__ == '__main__':
+    unittest.main()